@@ -17,6 +17,13 @@ if config.config_file_name is not None:
 
 target_metadata = GenerationRecord.metadata
 
+
+def include_name(name, type_, parent_names):
+    """full text index and its shadow tables are managed by hand, not by autogenerate"""
+    if type_ == "table":
+        return not name.startswith("generation_record_fts")
+    return True
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -41,6 +48,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_name=include_name,
     )
 
     with context.begin_transaction():
@@ -62,7 +70,9 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            include_name=include_name,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,44 @@
+"""listing previews
+
+Revision ID: 5b1e0c7a9d42
+Revises: d2b4d596e904
+Create Date: 2026-10-19 13:25:01.118250
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b1e0c7a9d42'
+down_revision: Union[str, None] = 'd2b4d596e904'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('generation_record', sa.Column('query_preview', sa.String(length=60), nullable=True))
+    op.add_column('generation_record', sa.Column('response_preview', sa.String(length=60), nullable=True))
+    # backfill previews of existing records
+    op.execute(
+        """
+        UPDATE generation_record
+        SET query_preview = substr(query_text, 1, 60),
+            response_preview = substr(response_text, 1, 60)
+        """
+    )
+    op.create_index(
+        'ix_generation_record_listing',
+        'generation_record',
+        ['created_at', 'id', 'hash', 'updated_at', 'query_preview', 'response_preview'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_generation_record_listing', table_name='generation_record')
+    with op.batch_alter_table('generation_record') as batch_op:
+        batch_op.drop_column('response_preview')
+        batch_op.drop_column('query_preview')
@@ -0,0 +1,70 @@
+"""full text search
+
+Revision ID: 9c3f2a61e8b7
+Revises: 5b1e0c7a9d42
+Create Date: 2026-10-19 14:03:12.540918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c3f2a61e8b7'
+down_revision: Union[str, None] = '5b1e0c7a9d42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # external content table, texts are kept only once in generation_record
+    op.execute(
+        """
+        CREATE VIRTUAL TABLE generation_record_fts USING fts5(
+            query_text,
+            response_text,
+            content='generation_record',
+            content_rowid='id',
+            tokenize='porter unicode61'
+        )
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER generation_record_fts_insert AFTER INSERT ON generation_record BEGIN
+            INSERT INTO generation_record_fts (rowid, query_text, response_text)
+            VALUES (new.id, new.query_text, new.response_text);
+        END
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER generation_record_fts_delete AFTER DELETE ON generation_record BEGIN
+            INSERT INTO generation_record_fts (generation_record_fts, rowid, query_text, response_text)
+            VALUES ('delete', old.id, old.query_text, old.response_text);
+        END
+        """
+    )
+    # only texts are indexed, access time bumps must not churn the index
+    op.execute(
+        """
+        CREATE TRIGGER generation_record_fts_update
+        AFTER UPDATE OF query_text, response_text ON generation_record BEGIN
+            INSERT INTO generation_record_fts (generation_record_fts, rowid, query_text, response_text)
+            VALUES ('delete', old.id, old.query_text, old.response_text);
+            INSERT INTO generation_record_fts (rowid, query_text, response_text)
+            VALUES (new.id, new.query_text, new.response_text);
+        END
+        """
+    )
+    # index existing records
+    op.execute("INSERT INTO generation_record_fts (generation_record_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS generation_record_fts_update")
+    op.execute("DROP TRIGGER IF EXISTS generation_record_fts_delete")
+    op.execute("DROP TRIGGER IF EXISTS generation_record_fts_insert")
+    op.execute("DROP TABLE IF EXISTS generation_record_fts")
@@ -0,0 +1,51 @@
+"""conversation threads
+
+Revision ID: e41d7b02c6f5
+Revises: 9c3f2a61e8b7
+Create Date: 2026-10-19 15:18:40.207615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e41d7b02c6f5'
+down_revision: Union[str, None] = '9c3f2a61e8b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('generation_record', sa.Column('parent_id', sa.Integer(), nullable=True))
+    op.add_column('generation_record', sa.Column('conversation_id', sa.Integer(), nullable=True))
+    op.add_column('generation_record', sa.Column('context', sa.LargeBinary(), nullable=True))
+    op.create_index(op.f('ix_generation_record_conversation_id'), 'generation_record', ['conversation_id'], unique=False)
+    # follow ups are looked up by parent, retention checks every candidate for them
+    op.create_index(op.f('ix_generation_record_parent_id'), 'generation_record', ['parent_id'], unique=False)
+    # listing shows thread links, keep it covered
+    op.drop_index('ix_generation_record_listing', table_name='generation_record')
+    op.create_index(
+        'ix_generation_record_listing',
+        'generation_record',
+        ['created_at', 'id', 'hash', 'updated_at', 'query_preview', 'response_preview', 'parent_id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_generation_record_listing', table_name='generation_record')
+    op.create_index(
+        'ix_generation_record_listing',
+        'generation_record',
+        ['created_at', 'id', 'hash', 'updated_at', 'query_preview', 'response_preview'],
+        unique=False,
+    )
+    op.drop_index(op.f('ix_generation_record_conversation_id'), table_name='generation_record')
+    op.drop_index(op.f('ix_generation_record_parent_id'), table_name='generation_record')
+    # native drop, batch mode would recreate the table and lose full text triggers
+    op.execute("ALTER TABLE generation_record DROP COLUMN context")
+    op.execute("ALTER TABLE generation_record DROP COLUMN conversation_id")
+    op.execute("ALTER TABLE generation_record DROP COLUMN parent_id")
@@ -0,0 +1,49 @@
+"""stable query digest
+
+Revision ID: 3a8f5d1c7e20
+Revises: e41d7b02c6f5
+Create Date: 2026-10-19 16:33:55.871402
+
+"""
+import hashlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3a8f5d1c7e20'
+down_revision: Union[str, None] = 'e41d7b02c6f5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+
+def digest(query: str) -> int:
+    """frozen copy of generation_record.query_digest"""
+    return int.from_bytes(hashlib.blake2b(query.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+
+
+def upgrade() -> None:
+    # hash column was filled with builtin hash, which is salted per process
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.text("SELECT id, query_text FROM generation_record WHERE id > :last ORDER BY id LIMIT :n"),
+            {"last": last_id, "n": BATCH_SIZE},
+        ).all()
+        if len(rows) == 0:
+            break
+        conn.execute(
+            sa.text("UPDATE generation_record SET hash = :hash WHERE id = :id"),
+            [{"hash": digest(query), "id": row_id} for row_id, query in rows],
+        )
+        last_id = rows[-1][0]
+
+
+def downgrade() -> None:
+    # builtin hash values were never stable, nothing to restore
+    pass
@@ -0,0 +1,28 @@
+"""answering model
+
+Revision ID: b7e2c94d1a36
+Revises: 3a8f5d1c7e20
+Create Date: 2026-10-19 17:12:04.518230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2c94d1a36'
+down_revision: Union[str, None] = '3a8f5d1c7e20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # older records stay unknown, they were all answered by whatever MODEL_NAME was then
+    op.add_column('generation_record', sa.Column('model', sa.String(length=50), nullable=True))
+
+
+def downgrade() -> None:
+    # native drop, batch mode would recreate the table and lose full text triggers
+    op.execute("ALTER TABLE generation_record DROP COLUMN model")
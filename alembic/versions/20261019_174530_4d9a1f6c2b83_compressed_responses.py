@@ -0,0 +1,182 @@
+"""compressed responses
+
+Revision ID: 4d9a1f6c2b83
+Revises: b7e2c94d1a36
+Create Date: 2026-10-19 17:45:30.207614
+
+"""
+import zlib
+from typing import Optional, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4d9a1f6c2b83'
+down_revision: Union[str, None] = 'b7e2c94d1a36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# rows rewritten per statement, keeps memory flat on large tables
+BATCH: int = 500
+
+# helpers below are frozen copies, later changes to the app must not change what this revision does
+# chars from which responses are compressed, the COMPRESS_MIN_LEN default
+MIN_LEN: int = 256
+
+
+def compress(text: str) -> bytes:
+    """frozen copy of compression.compress"""
+    return zlib.compress(text.encode("utf-8"), 6)
+
+
+def decompress(packed: bytes) -> str:
+    """frozen copy of compression.decompress"""
+    return zlib.decompress(packed).decode("utf-8")
+
+
+def pack(text: str) -> Optional[bytes]:
+    """frozen copy of compression.pack_response, compressed text or None when it stays plain"""
+    if len(text) < MIN_LEN:
+        return None
+    packed = compress(text)
+    return None if len(packed) >= len(text.encode("utf-8")) else packed
+
+
+def drop_index() -> None:
+    op.execute("DROP TRIGGER IF EXISTS generation_record_fts_update")
+    op.execute("DROP TRIGGER IF EXISTS generation_record_fts_delete")
+    op.execute("DROP TRIGGER IF EXISTS generation_record_fts_insert")
+    op.execute("DROP TABLE IF EXISTS generation_record_fts")
+
+
+def rewrite(select: str, update: str, convert) -> None:
+    """Converts rows selected by select in batches of BATCH, in id order"""
+
+    bind = op.get_bind()
+    after = 0
+    while True:
+        rows = bind.execute(sa.text(select), {"after": after, "batch": BATCH}).all()
+        if len(rows) == 0:
+            return
+        values = [value for value in (convert(row) for row in rows) if value is not None]
+        if len(values) > 0:
+            bind.execute(sa.text(update), values)
+        after = rows[-1].id
+
+
+def compress_row(row) -> dict | None:
+    packed = pack(row.response_text)
+    return None if packed is None else {"id": row.id, "packed": packed}
+
+
+def upgrade() -> None:
+    op.add_column('generation_record', sa.Column('response_zlib', sa.LargeBinary(), nullable=True))
+    # the external content index of 9c3f2a61e8b7 reads texts from generation_record, compressed ones it can not
+    drop_index()
+    rewrite(
+        "SELECT id, response_text FROM generation_record "
+        "WHERE id > :after AND response_text IS NOT NULL ORDER BY id LIMIT :batch",
+        "UPDATE generation_record SET response_zlib = :packed, response_text = NULL WHERE id = :id",
+        compress_row,
+    )
+    # keeps its own copy of the texts, triggers index plain responses, the app indexes compressed ones,
+    # so any sqlite client can write the table
+    op.execute(
+        """
+        CREATE VIRTUAL TABLE generation_record_fts USING fts5(
+            query_text,
+            response_text,
+            tokenize='porter unicode61'
+        )
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER generation_record_fts_insert AFTER INSERT ON generation_record BEGIN
+            INSERT INTO generation_record_fts (rowid, query_text, response_text)
+            VALUES (new.id, new.query_text, new.response_text);
+        END
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER generation_record_fts_delete AFTER DELETE ON generation_record BEGIN
+            DELETE FROM generation_record_fts WHERE rowid = old.id;
+        END
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER generation_record_fts_update
+        AFTER UPDATE OF query_text, response_text, response_zlib ON generation_record BEGIN
+            UPDATE generation_record_fts SET query_text = new.query_text
+            WHERE rowid = new.id AND new.query_text IS NOT old.query_text;
+            UPDATE generation_record_fts SET response_text = new.response_text
+            WHERE rowid = new.id AND (new.response_text IS NOT old.response_text OR new.response_zlib IS NOT old.response_zlib);
+        END
+        """
+    )
+    op.execute(
+        "INSERT INTO generation_record_fts (rowid, query_text, response_text) "
+        "SELECT id, query_text, response_text FROM generation_record"
+    )
+    rewrite(
+        "SELECT id, response_zlib FROM generation_record "
+        "WHERE id > :after AND response_zlib IS NOT NULL ORDER BY id LIMIT :batch",
+        "UPDATE generation_record_fts SET response_text = :text WHERE rowid = :id",
+        lambda row: {"id": row.id, "text": decompress(row.response_zlib)},
+    )
+
+
+def downgrade() -> None:
+    drop_index()
+    rewrite(
+        "SELECT id, response_zlib FROM generation_record "
+        "WHERE id > :after AND response_zlib IS NOT NULL ORDER BY id LIMIT :batch",
+        "UPDATE generation_record SET response_text = :plain, response_zlib = NULL WHERE id = :id",
+        lambda row: {"id": row.id, "plain": decompress(row.response_zlib)},
+    )
+    # native drop, batch mode would recreate the table
+    op.execute("ALTER TABLE generation_record DROP COLUMN response_zlib")
+    # back to the external content index of 9c3f2a61e8b7
+    op.execute(
+        """
+        CREATE VIRTUAL TABLE generation_record_fts USING fts5(
+            query_text,
+            response_text,
+            content='generation_record',
+            content_rowid='id',
+            tokenize='porter unicode61'
+        )
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER generation_record_fts_insert AFTER INSERT ON generation_record BEGIN
+            INSERT INTO generation_record_fts (rowid, query_text, response_text)
+            VALUES (new.id, new.query_text, new.response_text);
+        END
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER generation_record_fts_delete AFTER DELETE ON generation_record BEGIN
+            INSERT INTO generation_record_fts (generation_record_fts, rowid, query_text, response_text)
+            VALUES ('delete', old.id, old.query_text, old.response_text);
+        END
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER generation_record_fts_update
+        AFTER UPDATE OF query_text, response_text ON generation_record BEGIN
+            INSERT INTO generation_record_fts (generation_record_fts, rowid, query_text, response_text)
+            VALUES ('delete', old.id, old.query_text, old.response_text);
+            INSERT INTO generation_record_fts (rowid, query_text, response_text)
+            VALUES (new.id, new.query_text, new.response_text);
+        END
+        """
+    )
+    op.execute("INSERT INTO generation_record_fts (generation_record_fts) VALUES ('rebuild')")
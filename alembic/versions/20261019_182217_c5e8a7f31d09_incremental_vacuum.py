@@ -0,0 +1,31 @@
+"""incremental vacuum
+
+Revision ID: c5e8a7f31d09
+Revises: 4d9a1f6c2b83
+Create Date: 2026-10-19 18:22:17.864102
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e8a7f31d09'
+down_revision: Union[str, None] = '4d9a1f6c2b83'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # existing files only switch mode on a full vacuum, which cannot run in a transaction
+    with op.get_context().autocommit_block():
+        op.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        op.execute("VACUUM")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("PRAGMA auto_vacuum = NONE")
+        op.execute("VACUUM")
@@ -0,0 +1,136 @@
+"""separate reasoning
+
+Revision ID: e9b3d6a0f472
+Revises: c5e8a7f31d09
+Create Date: 2026-10-19 18:51:06.331572
+
+"""
+import zlib
+from typing import Optional, Sequence, Tuple, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9b3d6a0f472'
+down_revision: Union[str, None] = 'c5e8a7f31d09'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# rows rewritten per statement, keeps memory flat on large tables
+BATCH: int = 500
+
+# helpers below are frozen copies, later changes to the app must not change what this revision does
+OPEN: str = "<think>"
+CLOSE: str = "</think>"
+PREVIEW_LEN: int = 60
+# chars from which responses are compressed, the COMPRESS_MIN_LEN default
+MIN_LEN: int = 256
+
+
+def compress(text: str) -> bytes:
+    """frozen copy of compression.compress"""
+    return zlib.compress(text.encode("utf-8"), 6)
+
+
+def decompress(packed: bytes) -> str:
+    """frozen copy of compression.decompress"""
+    return zlib.decompress(packed).decode("utf-8")
+
+
+def pack_response(text: str) -> Tuple[Optional[str], Optional[bytes]]:
+    """frozen copy of compression.pack_response"""
+    if len(text) < MIN_LEN:
+        return text, None
+    packed = compress(text)
+    if len(packed) >= len(text.encode("utf-8")):
+        return text, None
+    return None, packed
+
+
+def preview(text: str) -> str:
+    """frozen copy of generation_record.preview"""
+    return text[:PREVIEW_LEN]
+
+
+def split(response: str) -> Tuple[str, str]:
+    """frozen copy of reasoning.split, on the whole text rather than streamed chunks"""
+    stripped = response.lstrip()
+    if not stripped.startswith(OPEN):
+        return "", response
+    body = stripped[len(OPEN):]
+    end = body.find(CLOSE)
+    if end < 0:
+        return body, ""
+    return body[:end], body[end + len(CLOSE):].lstrip()
+
+
+def rewrite(select: str, update: str, convert) -> None:
+    """Converts rows selected by select in batches of BATCH, in id order"""
+
+    bind = op.get_bind()
+    after = 0
+    while True:
+        rows = bind.execute(sa.text(select), {"after": after, "batch": BATCH}).all()
+        if len(rows) == 0:
+            return
+        values = [value for value in (convert(row) for row in rows) if value is not None]
+        if len(values) > 0:
+            bind.execute(sa.text(update), values)
+            # triggers index plain responses only, see 4d9a1f6c2b83
+            packed = [{"id": value["id"], "text": value["text"]} for value in values if value["packed"] is not None]
+            if len(packed) > 0:
+                bind.execute(sa.text("UPDATE generation_record_fts SET response_text = :text WHERE rowid = :id"), packed)
+        after = rows[-1].id
+
+
+def response_values(response: str) -> dict:
+    plain, packed = pack_response(response)
+    return {"plain": plain, "packed": packed, "preview": preview(response), "text": response}
+
+
+def response_of(row) -> Optional[str]:
+    return row.response_text if row.response_zlib is None else decompress(row.response_zlib)
+
+
+def split_row(row) -> dict | None:
+    response = response_of(row)
+    if response is None or CLOSE not in response:
+        return None
+    reasoning, answer = split(response)
+    reasoning = reasoning.strip()
+    if reasoning == "":
+        return None
+    return {"id": row.id, "reasoning": compress(reasoning), "length": len(reasoning), **response_values(answer)}
+
+
+def join_row(row) -> dict:
+    response = f"{OPEN}\n{decompress(row.reasoning_zlib)}\n{CLOSE}\n\n{response_of(row) or ''}"
+    return {"id": row.id, **response_values(response)}
+
+
+def upgrade() -> None:
+    op.add_column('generation_record', sa.Column('reasoning_zlib', sa.LargeBinary(), nullable=True))
+    op.add_column('generation_record', sa.Column('reasoning_len', sa.Integer(), nullable=True))
+    # answers stored so far carry their reasoning inline
+    rewrite(
+        "SELECT id, response_text, response_zlib FROM generation_record "
+        "WHERE id > :after ORDER BY id LIMIT :batch",
+        "UPDATE generation_record SET response_text = :plain, response_zlib = :packed, response_preview = :preview, "
+        "reasoning_zlib = :reasoning, reasoning_len = :length WHERE id = :id",
+        split_row,
+    )
+
+
+def downgrade() -> None:
+    rewrite(
+        "SELECT id, response_text, response_zlib, reasoning_zlib "
+        "FROM generation_record WHERE id > :after AND reasoning_zlib IS NOT NULL ORDER BY id LIMIT :batch",
+        "UPDATE generation_record SET response_text = :plain, response_zlib = :packed, response_preview = :preview "
+        "WHERE id = :id",
+        join_row,
+    )
+    # native drop, batch mode would recreate the table and lose full text triggers
+    op.execute("ALTER TABLE generation_record DROP COLUMN reasoning_len")
+    op.execute("ALTER TABLE generation_record DROP COLUMN reasoning_zlib")
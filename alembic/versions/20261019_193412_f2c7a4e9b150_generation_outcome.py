@@ -0,0 +1,28 @@
+"""generation outcome
+
+Revision ID: f2c7a4e9b150
+Revises: e9b3d6a0f472
+Create Date: 2026-10-19 19:34:12.207641
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c7a4e9b150'
+down_revision: Union[str, None] = 'e9b3d6a0f472'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # older records stay unknown and keep being served, as they were
+    op.add_column('generation_record', sa.Column('outcome', sa.String(length=16), nullable=True))
+
+
+def downgrade() -> None:
+    # native drop, batch mode would recreate the table and lose full text triggers
+    op.execute("ALTER TABLE generation_record DROP COLUMN outcome")
@@ -0,0 +1,28 @@
+"""pregenerated answers
+
+Revision ID: a84d2e6c1f37
+Revises: f2c7a4e9b150
+Create Date: 2026-10-19 20:17:45.880163
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a84d2e6c1f37'
+down_revision: Union[str, None] = 'f2c7a4e9b150'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # users waited for all older answers
+    op.add_column('generation_record', sa.Column('pregenerated', sa.Boolean(), nullable=True))
+
+
+def downgrade() -> None:
+    # native drop, batch mode would recreate the table and lose full text triggers
+    op.execute("ALTER TABLE generation_record DROP COLUMN pregenerated")
@@ -0,0 +1,51 @@
+"""
+Compares throughput of the html and JSON routes on cache hits, against a running server.
+Usage: python bench/api_throughput.py [base url] [requests] [concurrency]
+"""
+import asyncio
+import sys
+import time
+
+import httpx
+
+BASE_URL: str = sys.argv[1] if len(sys.argv) > 1 else "http://127.0.0.1:7654"
+REQUESTS: int = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+CONCURRENCY: int = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+QUERY: str = "throughput benchmark query"
+
+
+async def html_query(client: httpx.AsyncClient) -> httpx.Response:
+    return await client.post("/query", data={"query_text": QUERY})
+
+
+async def json_query(client: httpx.AsyncClient) -> httpx.Response:
+    return await client.post("/api/v1/query", json={"query": QUERY})
+
+
+async def run(name: str, call) -> None:
+    remaining = iter(range(REQUESTS))
+    received = 0
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal received
+        for _ in remaining:
+            response = await call(client)
+            response.raise_for_status()
+            received += len(response.content)
+
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=30) as client:
+        # warm up, the first call may generate and store the answer
+        await call(client)
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(CONCURRENCY)))
+        elapsed = time.perf_counter() - started
+    print(f"{name:5} {REQUESTS / elapsed:8.0f} req/s  {received / REQUESTS:6.0f} bytes/response")
+
+
+async def main() -> None:
+    await run("html", html_query)
+    await run("json", json_query)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
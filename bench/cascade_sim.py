@@ -0,0 +1,104 @@
+"""
+Offline simulation of the model cascade against the fake ollama, in process, no server or model needed.
+Sends a Poisson stream of short and long prompts with the cascade off, then on,
+and compares latency percentiles and how many prompts the fallback answered.
+Usage: python -m bench.cascade_sim [--rate 15] [--requests 300]
+"""
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from bench import fake_ollama
+from src.llm.cascade import Cascade
+from src.llm.models import GenerationResponseComplete
+from src.llm.ollama import parse_generation_line
+
+PRIMARY: str = "deepseek-r1:1.5b"
+FALLBACK: str = "qwen2.5:0.5b"
+SHORT_PROMPTS: List[str] = ["why is the sky blue?", "what is rust?", "capital of france?", "define latency"]
+LONG_PROMPTS: List[str] = [
+    "compare rayleigh and mie scattering, and explain which one colours sunsets and which one clouds",
+    "explain how a write ahead log keeps a database consistent after a crash in the middle of a commit",
+]
+
+
+async def ask(client: httpx.AsyncClient, prompt: str, model: str, cascade: Optional[Cascade]) -> None:
+    async with client.stream("POST", "/api/generate", json={"model": model, "prompt": prompt, "keep_alive": -1}) as response:
+        async for raw_line in response.aiter_lines():
+            if raw_line.strip() == "":
+                continue
+            part = parse_generation_line(raw_line)
+            if cascade is not None and isinstance(part, GenerationResponseComplete):
+                cascade.record(part)
+
+
+async def run(cascade: Optional[Cascade], rate: float, requests: int, seed: int) -> Dict[str, List[float]]:
+    """Latencies by prompt kind and model"""
+
+    rng = random.Random(seed)
+    latencies: Dict[str, List[float]] = {"short": [], "long": [], PRIMARY: [], FALLBACK: []}
+    transport = httpx.ASGITransport(app=fake_ollama.app)
+
+    async def one(prompt: str, kind: str) -> None:
+        started = time.perf_counter()
+        model = PRIMARY if cascade is None else cascade.choose(prompt)
+        if cascade is None:
+            await ask(client, prompt, model, None)
+        else:
+            with cascade.track(model):
+                await ask(client, prompt, model, cascade)
+        latencies[kind].append(time.perf_counter() - started)
+        latencies[model].append(time.perf_counter() - started)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://fake", timeout=600) as client:
+        # load both models, cold start is not what is compared
+        await asyncio.gather(ask(client, "warm up", PRIMARY, None), ask(client, "warm up", FALLBACK, None))
+        tasks = []
+        for _ in range(requests):
+            long = rng.random() < 0.3
+            prompt = rng.choice(LONG_PROMPTS if long else SHORT_PROMPTS)
+            tasks.append(asyncio.create_task(one(prompt, "long" if long else "short")))
+            await asyncio.sleep(rng.expovariate(rate))
+        await asyncio.gather(*tasks)
+    return latencies
+
+
+def percentiles(values: List[float]) -> str:
+    if len(values) < 2:
+        return "n/a"
+    cuts = statistics.quantiles(values, n=100)
+    return f"p50 {cuts[49]:6.2f}s  p95 {cuts[94]:6.2f}s  p99 {cuts[98]:6.2f}s"
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rate", type=float, default=15, help="arrivals per second")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--max-queue", type=int, default=4)
+    parser.add_argument("--min-tps", type=float, default=0)
+    parser.add_argument("--prompt-len", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    fake_ollama.PARALLEL = 4
+    # every switch is logged, too many to follow here
+    logging.getLogger("src.llm.cascade").setLevel(logging.ERROR)
+
+    for name in ("off", "on"):
+        cascade = None
+        if name == "on":
+            cascade = Cascade(PRIMARY, FALLBACK, args.max_queue, args.min_tps, args.prompt_len)
+        latencies = await run(cascade, args.rate, args.requests, args.seed)
+        print(f"cascade {name}")
+        for kind in ("short", "long"):
+            print(f"  {kind:5}  {percentiles(latencies[kind])}")
+        print(f"  answered by {FALLBACK}: {len(latencies[FALLBACK])}/{args.requests}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+"""
+Size on disk and read latency of stored responses, before and after the compression migration.
+Fills a scratch db migrated up to plain texts with reasoning-like answers, measures,
+migrates to head, vacuums and measures again.
+Usage: python bench/compression_report.py [records] [chars per response]
+"""
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alembic import command  # noqa: E402
+from alembic.config import Config  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from src.db import generation_record  # noqa: E402
+
+RECORDS: int = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+CHARS: int = int(sys.argv[2]) if len(sys.argv) > 2 else 6000
+READS: int = 2000
+# last revision storing plain texts
+PLAIN_REVISION: str = "b7e2c94d1a36"
+
+WORDS: List[str] = (
+    "the a of to and is in that it for so we this answer model light think wait let me check first "
+    "because which means scattering wavelength blue sky shorter molecules air sun rayleigh okay "
+    "actually hmm right question user asks about why how explain step then next consider also"
+).split()
+
+
+def response(rng: random.Random) -> str:
+    """Rambling text with the word frequencies of reasoning output, roughly"""
+
+    words = []
+    length = 0
+    while length < CHARS:
+        word = WORDS[min(int(rng.paretovariate(1.2)) - 1, len(WORDS) - 1)] if rng.random() < 0.8 else rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words).replace(" okay ", ". Okay, ").replace(" wait ", "\n\nWait, ")
+
+
+def timed(read: Callable[[int], object], ids: List[int]) -> str:
+    latencies = []
+    for record_id in ids:
+        started = time.perf_counter()
+        read(record_id)
+        latencies.append((time.perf_counter() - started) * 1e6)
+    cuts = statistics.quantiles(latencies, n=100)
+    return f"p50 {cuts[49]:7.1f}us  p99 {cuts[98]:7.1f}us"
+
+
+def report(name: str, path: str, url: str, ids: List[int]) -> None:
+    engine = create_engine(url)
+    with engine.connect() as connection:
+        connection.exec_driver_sql("VACUUM")
+    db = sessionmaker(bind=engine)()
+    # plain revision has no response_zlib, read through the columns there are
+    columns = [row[1] for row in db.connection().exec_driver_sql("PRAGMA table_info(generation_record)")]
+    select = "SELECT response_text, response_zlib" if "response_zlib" in columns else "SELECT response_text, NULL"
+
+    def read(record_id: int) -> str:
+        plain, packed = db.connection().exec_driver_sql(
+            f"{select} FROM generation_record WHERE id = ?", (record_id,)).one()
+        return generation_record.unpack_response(plain, packed)
+
+    def scan(_) -> int:
+        # model lies after the texts, reaching it walks their overflow pages
+        return db.connection().exec_driver_sql(
+            "SELECT count(*) FROM generation_record WHERE model LIKE '%never%'").scalar()
+
+    def pages(like: str) -> str:
+        size = db.connection().exec_driver_sql(
+            "SELECT sum(pgsize) FROM dbstat WHERE name LIKE ?", (like,)).scalar()
+        return f"{size / 2 ** 20:8.1f} MiB"
+
+    print(name)
+    print(f"  file           {os.path.getsize(path) / 2 ** 20:8.1f} MiB")
+    print(f"  table          {pages('generation_record')}")
+    print(f"  search index   {pages('generation_record_fts%')}")
+    print(f"  read by id     {timed(read, ids)}")
+    print(f"  search         {timed(lambda _: generation_record.search_query_logs(db, 'rayleigh'), ids[:200])}")
+    print(f"  table scan     {timed(scan, ids[:20])}")
+    db.close()
+    engine.dispose()
+
+
+def main() -> None:
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = f"{tmp}/report.db"
+        url = f"sqlite:///{path}"
+        alembic_cfg = Config(f"{os.getcwd()}/alembic.ini")
+        alembic_cfg.set_main_option("sqlalchemy.url", url)
+        command.upgrade(alembic_cfg, PLAIN_REVISION)
+        connection = sqlite3.connect(path)
+        connection.executemany(
+            "INSERT INTO generation_record (hash, query_text, response_text, created_at) VALUES (?, ?, ?, ?)",
+            ((n, f"question number {n}", response(rng), "2026-10-19 12:00:00") for n in range(RECORDS)),
+        )
+        connection.commit()
+        connection.close()
+        ids = [rng.randint(1, RECORDS) for _ in range(READS)]
+
+        report("plain", path, url, ids)
+        started = time.perf_counter()
+        command.upgrade(alembic_cfg, "head")
+        print(f"migration        {time.perf_counter() - started:8.1f}s for {RECORDS} records")
+        report("compressed", path, url, ids)
+
+
+if __name__ == "__main__":
+    main()
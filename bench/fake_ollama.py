@@ -0,0 +1,104 @@
+"""
+Stand-in for Ollama /api/generate, streams a canned answer word by word.
+Like ollama, it unloads a model once keep_alive runs out, and the next request waits LOAD seconds.
+Each model answers PARALLEL requests at once, the rest queue up, small models are faster.
+Other models think aloud first, in a <think> block with tags split across tokens like real ones.
+Prompts containing "[empty]" get no answer, those containing "[length]" stop at the token limit.
+Lets benchmarks run without a model: python bench/fake_ollama.py --port 11555
+"""
+import argparse
+import asyncio
+import collections
+import datetime
+import json
+import re
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# seconds per token of the main model
+DELAY: float = 0.01
+LOAD: float = 1.0
+PARALLEL: int = 1
+# models that generate SPEEDUP times faster
+SMALL_MODELS: set[str] = {"qwen2.5:0.5b"}
+SPEEDUP: float = 4
+UNITS: dict[str, int] = {"s": 1, "m": 60, "h": 3600}
+REASONING: list[str] = ["<th", "ink>", "\n", "okay, ", "the ", "user ", "asks ", "something. ", "</", "think>", "\n\n"]
+
+app = FastAPI()
+# monotonic time each loaded model is unloaded at
+loaded_until: dict[str, float] = collections.defaultdict(float)
+slots: dict[str, asyncio.Semaphore] = {}
+
+
+def seconds(keep_alive: str | int) -> float:
+    """Ollama default is 5m, negative keeps the model loaded forever"""
+
+    if isinstance(keep_alive, int):
+        return float("inf") if keep_alive < 0 else keep_alive
+    match = re.fullmatch(r"(-?\d+)([smh])", keep_alive)
+    return float("inf") if match[1].startswith("-") else int(match[1]) * UNITS[match[2]]
+
+
+async def load(body: dict) -> int:
+    """Nanoseconds spent loading, as reported in load_duration"""
+
+    model = body["model"]
+    load_duration = 0.001
+    if time.monotonic() > loaded_until[model]:
+        await asyncio.sleep(LOAD)
+        load_duration = LOAD
+    loaded_until[model] = time.monotonic() + seconds(body.get("keep_alive", "5m"))
+    return int(load_duration * 1e9)
+
+
+def line(body: dict, **fields) -> str:
+    now = datetime.datetime.now(datetime.UTC).isoformat()
+    return json.dumps({"model": body["model"], "created_at": now, **fields}) + "\n"
+
+
+@app.post("/api/generate")
+async def generate(request: Request) -> StreamingResponse:
+    body = await request.json()
+    load_duration = await load(body)
+    if "prompt" not in body:
+        return JSONResponse({"model": body["model"], "response": "", "done": True, "done_reason": "load"})
+    context = body.get("context", [])
+    # longer prompts get longer answers
+    words = f"answer to {body['prompt']} is {body['prompt']} forty two".split(" ")
+    tokens = ([] if body["model"] in SMALL_MODELS else REASONING) + [word + " " for word in words]
+    if "[empty]" in body["prompt"]:
+        tokens = []
+    done_reason = "length" if "[length]" in body["prompt"] else "stop"
+    delay = DELAY / SPEEDUP if body["model"] in SMALL_MODELS else DELAY
+    slot = slots.setdefault(body["model"], asyncio.Semaphore(PARALLEL))
+
+    async def stream():
+        async with slot:
+            started = time.perf_counter()
+            for token in tokens:
+                await asyncio.sleep(delay)
+                yield line(body, response=token, done=False)
+            eval_duration = int((time.perf_counter() - started) * 1e9)
+        yield line(
+            body, response="", done=True, done_reason=done_reason,
+            context=context + list(range(len(tokens))),
+            total_duration=load_duration + eval_duration, load_duration=load_duration,
+            prompt_eval_count=1, prompt_eval_duration=1,
+            eval_count=len(tokens), eval_duration=eval_duration,
+        )
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--delay", type=float, default=DELAY, help="seconds per token")
+    parser.add_argument("--parallel", type=int, default=PARALLEL, help="requests answered at once per model")
+    args = parser.parse_args()
+    DELAY, PARALLEL = args.delay, args.parallel
+    uvicorn.run(app, port=args.port, log_level="warning")
@@ -0,0 +1,83 @@
+"""
+Time logging costs the request handling thread, per request, for each logging setup.
+Output goes to /dev/null, so only formatting and handler overhead is compared.
+Usage: python bench/logging_overhead.py [requests]
+"""
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils import logmod  # noqa: E402
+
+REQUESTS: int = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+QUERY: str = "why is the sky blue on a clear day?"
+RESPONSE: str = "rayleigh scattering of sunlight by the molecules of the air, " * 40
+
+api = logging.getLogger("src.api.answers")
+access = logging.getLogger("uvicorn.access")
+
+
+def one_request() -> None:
+    """Log lines of a typical /query served from history"""
+
+    api.info("Received query from %s: %s", ("127.0.0.1", 52884), QUERY)
+    api.debug("Serving from cache, query:'%s', response:'%s'", QUERY, RESPONSE)
+    api.info("Serving stored response: %s: %s", QUERY, RESPONSE)
+    access.info('%s - "%s %s HTTP/%s" %d', "127.0.0.1:52884", "POST", "/query", "1.1", 200)
+
+
+def measure(name: str, setup: Callable[[logging.Logger], Callable[[], None]]) -> None:
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.setLevel(logging.INFO)
+    teardown = setup(root)
+    for _ in range(100):
+        one_request()
+    started = time.perf_counter()
+    for _ in range(REQUESTS):
+        one_request()
+    elapsed = time.perf_counter() - started
+    drain_started = time.perf_counter()
+    teardown()
+    drained = time.perf_counter() - drain_started
+    print(f"{name:28} {elapsed / REQUESTS * 1e6:8.1f} us/request on caller, {drained:6.2f}s left to drain")
+
+
+def direct(log_format: str) -> Callable[[logging.Logger], Callable[[], None]]:
+    def setup(root: logging.Logger) -> Callable[[], None]:
+        root.addHandler(logmod.output_handler(log_format, devnull))
+        return lambda: None
+    return setup
+
+
+def queued(log_format: str, filters: List[logging.Filter]) -> Callable[[logging.Logger], Callable[[], None]]:
+    def setup(root: logging.Logger) -> Callable[[], None]:
+        records: queue.SimpleQueue = queue.SimpleQueue()
+        handler = logging.handlers.QueueHandler(records)
+        for log_filter in filters:
+            handler.addFilter(log_filter)
+        root.addHandler(handler)
+        listener = logging.handlers.QueueListener(records, logmod.output_handler(log_format, devnull))
+        listener.start()
+        return listener.stop
+    return setup
+
+
+if __name__ == "__main__":
+    with open(os.devnull, "w") as devnull:
+        measure("rich, direct", direct("rich"))
+        measure("json, direct", direct("json"))
+        measure("rich, queued", queued("rich", []))
+        measure("json, queued", queued("json", []))
+        measure("json, queued, capped", queued("json", [logmod.PayloadCap(200)]))
+        measure(
+            "json, queued, capped, 10%",
+            queued("json", [logmod.Sampler({"uvicorn.access": 0.1, "src.api": 0.1}), logmod.PayloadCap(200)]),
+        )
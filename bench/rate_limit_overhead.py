@@ -0,0 +1,53 @@
+"""
+Overhead the rate limiter adds to a request, measured on a bare ASGI app in process.
+Usage: python bench/rate_limit_overhead.py [requests] [clients]
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.api.middleware.rate_limit import Budget, RateLimiter, RateLimitMiddleware  # noqa: E402
+
+REQUESTS: int = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+CLIENTS: int = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+
+async def app(scope, receive, send) -> None:
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def receive() -> dict:
+    return {"type": "http.request", "body": b""}
+
+
+async def send(message: dict) -> None:
+    pass
+
+
+async def run(name: str, handler) -> float:
+    scopes = [
+        {"type": "http", "path": "/query", "headers": [], "client": (f"10.0.{n // 256}.{n % 256}", 50000)}
+        for n in range(CLIENTS)
+    ]
+    started = time.perf_counter()
+    for n in range(REQUESTS):
+        await handler(dict(scopes[n % CLIENTS]), receive, send)
+    per_request = (time.perf_counter() - started) / REQUESTS * 1e6
+    print(f"{name:24} {per_request:6.2f} us/request")
+    return per_request
+
+
+async def main() -> None:
+    # budgets large enough that every request passes, the hit path
+    limiter = RateLimiter(Budget(1e9, 1_000_000), Budget(1e9, 1_000_000), max_clients=CLIENTS)
+    bare = await run("bare app", app)
+    limited = await run("rate limited", RateLimitMiddleware(app, limiter, ("/query",)))
+    print(f"{'overhead':24} {limited - bare:6.2f} us/request, {len(limiter.clients)} clients tracked")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
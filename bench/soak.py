@@ -0,0 +1,271 @@
+"""
+Soak test, drives mixed traffic at a running server for hours and watches it for slow leaks.
+Every interval it samples the worker through the admin API: RSS, open files, db pool checkouts,
+asyncio tasks, and with TRACEMALLOC the traced bytes and the top allocation sites.
+Fails when one of them clearly keeps growing after the warmup faster than its limit per hour,
+or when tasks and pool checkouts are not back to where they started once traffic stopped.
+
+Meant for the offline harness, with MODEL_URL pointing at bench/fake_ollama.py, ADMIN_TOKEN set,
+and a single worker, `python server.py` or WORKERS=1, samples of other workers are kept apart otherwise:
+    python bench/fake_ollama.py --port 11555 --parallel 4
+    python bench/soak.py --hours 4 --interval 60
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import math
+import os
+import random
+import re
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.env_config import read_env  # noqa: E402
+
+MB: int = 2 ** 20
+# answered over and over, more of them than the cache holds, so entries keep being replaced
+HOT: List[str] = [f"soak hot query number {n}" for n in range(64)]
+# sampled metrics, their scale, and the default growth allowed per hour after the warmup
+METRICS: Dict[str, Tuple[float, float]] = {
+    "rss": (MB, 16),
+    "fds": (1, 4),
+    "pool_checked_out": (1, 1),
+    "tasks": (1, 10),
+    "traced": (MB, 8),
+}
+GENERATION_ID = re.compile(r'data-generation="([^"]+)"')
+
+ids: collections.deque = collections.deque(maxlen=1000)
+statuses: Dict[str, collections.Counter] = collections.defaultdict(collections.Counter)
+serial = itertools.count()
+
+
+def fresh(marker: str = "") -> str:
+    """Query never asked before, it has to be generated"""
+
+    return f"soak fresh {os.getpid()} {next(serial)} {marker}".strip()
+
+
+def remember(response: httpx.Response) -> None:
+    if response.status_code == 200 and response.headers.get("content-type", "").startswith("application/json"):
+        ids.append(response.json()["id"])
+
+
+async def home(client: httpx.AsyncClient) -> httpx.Response:
+    return await client.get("/")
+
+
+async def hit(client: httpx.AsyncClient) -> httpx.Response:
+    response = await client.post("/api/v1/query", json={"query": random.choice(HOT)})
+    remember(response)
+    return response
+
+
+async def html_hit(client: httpx.AsyncClient) -> httpx.Response:
+    return await client.post("/query", data={"query_text": random.choice(HOT)})
+
+
+async def generated(client: httpx.AsyncClient) -> httpx.Response:
+    response = await client.post("/api/v1/query", json={"query": fresh()})
+    remember(response)
+    return response
+
+
+async def streamed(client: httpx.AsyncClient) -> httpx.Response:
+    async with client.stream("POST", "/api/v1/query", json={"query": fresh(), "stream": True}) as response:
+        async for line in response.aiter_lines():
+            if '"id"' in line:
+                ids.append(json.loads(line)["id"])
+    return response
+
+
+async def server_sent(client: httpx.AsyncClient) -> httpx.Response:
+    """Some listeners go away early, the generation runs on without them until its grace is over"""
+
+    response = await client.post("/query", data={"query_text": fresh()})
+    found = GENERATION_ID.search(response.text)
+    if found is None:
+        return response
+    abandon = random.random() < 0.3
+    async with client.stream("GET", f"/query/{found.group(1)}/events") as events:
+        async for line in events.aiter_lines():
+            if abandon and line.startswith("id:"):
+                break
+            if line.startswith("event: done") or line.startswith("event: failed"):
+                break
+    return events
+
+
+async def follow_up(client: httpx.AsyncClient) -> httpx.Response:
+    if len(ids) == 0:
+        return await generated(client)
+    response = await client.post("/api/v1/query", json={"query": fresh("and then?"), "parent_id": random.choice(ids)})
+    remember(response)
+    return response
+
+
+async def batch(client: httpx.AsyncClient) -> httpx.Response:
+    queries = random.sample(HOT, 4) + [fresh(), fresh()]
+    async with client.stream("POST", "/batch", json={"queries": queries}) as response:
+        async for _ in response.aiter_lines():
+            pass
+    return response
+
+
+async def read(client: httpx.AsyncClient) -> httpx.Response:
+    if len(ids) == 0:
+        return await client.get("/search", params={"q": "soak"})
+    record_id = random.choice(ids)
+    return await random.choice((
+        lambda: client.get(f"/api/v1/log/{record_id}"),
+        lambda: client.get("/log", params={"id": record_id}),
+        lambda: client.get("/search", params={"q": "answer soak"}),
+    ))()
+
+
+async def failing(client: httpx.AsyncClient) -> httpx.Response:
+    """Prompts the fake answers with nothing or cuts short, a real model answers them as usual"""
+
+    query = fresh("[empty]") if random.random() < 0.5 else random.choice(HOT[:4]) + " [length]"
+    return await client.post("/api/v1/query", json={"query": query})
+
+
+# scenario and its share of traffic
+MIX: List[Tuple[Callable, float]] = [
+    (home, 10), (hit, 30), (html_hit, 10), (generated, 8), (streamed, 5),
+    (server_sent, 8), (follow_up, 4), (batch, 3), (read, 17), (failing, 5),
+]
+
+
+async def drive(client: httpx.AsyncClient, until: float) -> None:
+    scenarios, weights = zip(*MIX)
+    while time.monotonic() < until:
+        scenario = random.choices(scenarios, weights)[0]
+        try:
+            response = await scenario(client)
+            statuses[scenario.__name__][response.status_code] += 1
+        except httpx.HTTPError as e:
+            statuses[scenario.__name__][type(e).__name__] += 1
+
+
+async def sample(client: httpx.AsyncClient, token: str, top: int) -> dict:
+    response = await client.get(
+        "/api/v1/admin/process", params={"top": top}, headers={"Authorization": f"Bearer {token}"},
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def report(elapsed: float, stats: dict) -> None:
+    traced = "-" if stats["traced"] is None else f"{stats['traced'] / MB:.1f}"
+    print(
+        f"{elapsed / 60:7.1f}m pid {stats['pid']} rss {stats['rss'] / MB:7.1f}MB fds {stats['fds']:4} "
+        f"pool {stats['pool_checked_out']} tasks {stats['tasks']:4} generations {stats['generations']:3} "
+        f"cache {stats['cache_entries']:3} traced {traced}MB requests {sum(sum(counts.values()) for counts in statuses.values())}",
+        flush=True,
+    )
+
+
+def trends(samples: List[Tuple[float, dict]], limits: Dict[str, float]) -> List[str]:
+    """
+    Metrics growing faster than their limit per hour, by least squares over the samples.
+    Gauges sampled under load are noisy, a slope counts once it is two standard errors over the limit.
+    """
+
+    failed: List[str] = []
+    for name, (scale, _) in METRICS.items():
+        points = [(elapsed / 3600, stats[name] / scale) for elapsed, stats in samples if stats[name] is not None]
+        if len(points) < 3:
+            continue
+        hours, values = zip(*points)
+        slope, intercept = statistics.linear_regression(hours, values)
+        residuals = sum((value - intercept - slope * hour) ** 2 for hour, value in points) / (len(points) - 2)
+        spread = sum((hour - statistics.fmean(hours)) ** 2 for hour in hours)
+        error = 2 * math.sqrt(residuals / spread)
+        verdict = "FAIL" if slope - error > limits[name] else "ok"
+        print(f"{name:17} {slope:+9.2f}/h ±{error:<8.2f} (limit {limits[name]:g}) {verdict}")
+        if verdict == "FAIL":
+            failed.append(name)
+    return failed
+
+
+def site_growth(first: dict, last: dict, count: int = 10) -> None:
+    """Allocation sites that grew the most between two samples"""
+
+    before = {site["site"]: site["size"] for site in first["top"]}
+    growth = sorted(((site["size"] - before.get(site["site"], 0), site["site"]) for site in last["top"]), reverse=True)
+    for grown, site in growth[:count]:
+        if grown > 0:
+            print(f"  {grown / 1024:+10.1f}KiB {site}")
+
+
+async def main(args: argparse.Namespace) -> int:
+    limits = {name: getattr(args, name) for name in METRICS}
+    async with httpx.AsyncClient(base_url=args.url, timeout=120) as client:
+        baseline = await sample(client, args.token, 0)
+        started = time.monotonic()
+        until = started + args.hours * 3600
+        warmup = args.warmup if args.warmup is not None else min(600.0, args.hours * 900)
+        drivers = [asyncio.create_task(drive(client, until)) for _ in range(args.concurrency)]
+        by_pid: Dict[int, List[Tuple[float, dict]]] = collections.defaultdict(list)
+        while time.monotonic() < until:
+            await asyncio.sleep(min(args.interval, max(0.0, until - time.monotonic())))
+            elapsed = time.monotonic() - started
+            stats = await sample(client, args.token, args.top)
+            report(elapsed, stats)
+            if elapsed >= warmup:
+                by_pid[stats["pid"]].append((elapsed, stats))
+        await asyncio.gather(*drivers)
+
+        # listeners gone, generations without them are reaped after their grace
+        await asyncio.sleep(args.settle)
+        idle = await sample(client, args.token, 0)
+
+    print("\nresponses by scenario")
+    for name, counts in sorted(statuses.items()):
+        print(f"  {name:12} {dict(counts)}")
+    failed: List[str] = []
+    for pid, samples in by_pid.items():
+        print(f"\npid {pid}, {len(samples)} samples after {warmup / 60:.0f}m warmup")
+        failed += trends(samples, limits)
+        if samples[0][1]["top"]:
+            print("top allocation growth")
+            site_growth(samples[0][1], samples[-1][1])
+    print(f"\nidle after {args.settle:.0f}s: tasks {baseline['tasks']} -> {idle['tasks']}, "
+          f"pool {baseline['pool_checked_out']} -> {idle['pool_checked_out']}, generations {idle['generations']}")
+    if idle["pid"] == baseline["pid"]:
+        if idle["tasks"] > baseline["tasks"] + args.idle_tasks:
+            failed.append("idle tasks")
+        if (idle["pool_checked_out"] or 0) > (baseline["pool_checked_out"] or 0):
+            failed.append("idle pool checkouts")
+    if failed:
+        print(f"FAIL, growing: {', '.join(failed)}")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    conf = read_env()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default=f"http://127.0.0.1:{conf.port}")
+    parser.add_argument("--token", default=conf.admin_token, help="ADMIN_TOKEN by default")
+    parser.add_argument("--hours", type=float, default=2)
+    parser.add_argument("--interval", type=float, default=60, help="seconds between samples")
+    parser.add_argument("--warmup", type=float, default=None, help="seconds before samples count, caches fill meanwhile")
+    parser.add_argument("--settle", type=float, default=conf.stream_grace + 15, help="seconds idle before the last sample")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--top", type=int, default=25, help="allocation sites sampled, with TRACEMALLOC on")
+    parser.add_argument("--idle-tasks", type=int, default=2, help="tasks left over once idle, on top of the baseline")
+    for metric, (scale, limit) in METRICS.items():
+        unit = "MB" if scale == MB else "count"
+        parser.add_argument(f"--{metric.replace('_', '-')}", dest=metric, type=float, default=limit, help=f"{unit} per hour")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,97 @@
+"""
+Import time of the server module, broken down by package from `-X importtime`,
+and time from launching `python server.py` to the first served request.
+Fails when either one is over its budget, so it can guard startup in CI.
+Run from the repo root with the server stopped, it listens on HOST and PORT of .env.
+Usage: python bench/startup_time.py [import budget ms] [startup budget ms]
+"""
+import collections
+import http.client
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.env_config import read_env  # noqa: E402
+
+IMPORT_BUDGET_MS: float = float(sys.argv[1]) if len(sys.argv) > 1 else 1500
+STARTUP_BUDGET_MS: float = float(sys.argv[2]) if len(sys.argv) > 2 else 5000
+RUNS: int = 5
+TOP: int = 15
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def import_times() -> Tuple[float, Dict[str, float]]:
+    """Cumulative ms of importing server, and self ms by top level package, of the fastest run"""
+
+    best: Tuple[float, Dict[str, float]] = (float("inf"), {})
+    for _ in range(RUNS):
+        done = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import server"],
+            capture_output=True, text=True, check=True,
+        )
+        total = 0.0
+        packages: Dict[str, float] = collections.defaultdict(float)
+        for match in LINE.finditer(done.stderr):
+            own, cumulative, _, name = match.groups()
+            packages[name.split(".")[0]] += int(own) / 1000
+            if name == "server":
+                total = int(cumulative) / 1000
+        if total < best[0]:
+            best = (total, packages)
+    return best
+
+
+def first_request(host: str, port: int, timeout: float = 30) -> float:
+    """Ms from launching the server until it answers the home page"""
+
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "server.py"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                connection = http.client.HTTPConnection(host, port, timeout=timeout)
+                connection.request("GET", "/")
+                if connection.getresponse().status == 200:
+                    return (time.perf_counter() - started) * 1000
+            except OSError:
+                time.sleep(0.01)
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited with {server.returncode}")
+        raise TimeoutError(f"no response within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    conf = read_env()
+    host = "127.0.0.1" if conf.host == "0.0.0.0" else conf.host
+    probe = http.client.HTTPConnection(host, conf.port, timeout=1)
+    try:
+        probe.request("GET", "/favicon.ico")
+        sys.exit(f"something already listens on {host}:{conf.port}, stop it first")
+    except OSError:
+        pass
+
+    total, packages = import_times()
+    ranked: List[Tuple[str, float]] = sorted(packages.items(), key=lambda item: -item[1])
+    print(f"import server    {total:8.0f} ms, fastest of {RUNS}, budget {IMPORT_BUDGET_MS:.0f} ms")
+    for name, own in ranked[:TOP]:
+        print(f"  {name:<22} {own:8.1f} ms")
+    startup = first_request(host, conf.port)
+    print(f"first request    {startup:8.0f} ms, budget {STARTUP_BUDGET_MS:.0f} ms")
+
+    over = [name for name, ms, budget in (("import", total, IMPORT_BUDGET_MS), ("startup", startup, STARTUP_BUDGET_MS))
+            if ms > budget]
+    if len(over) > 0:
+        sys.exit(f"over budget: {', '.join(over)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Production entry point. Migrates and precompresses static assets once,
+then forks WORKERS uvicorn processes accepting on one shared socket.
+Each worker also listens on a unix socket of its own, for relaying events of generations it runs.
+On SIGTERM or SIGINT workers stop taking generations and report not ready, running generations get
+DRAIN_TIMEOUT seconds to finish and store their answers, then workers close their connections and exit.
+Workers that die while running are replaced.
+Usage: python launcher.py [workers]
+"""
+import asyncio
+import logging
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from logging import Logger
+from types import FrameType
+from typing import Dict, Optional, Tuple
+
+import uvicorn
+
+import src.api.static as static
+import src.db.database as db
+import src.utils.logmod
+from src.utils.env_config import read_env, EnvConfig
+
+runtime_config: EnvConfig = read_env()
+logger: Logger = logging.getLogger(__name__)
+
+# on top of the drain deadline, for closing connections and lifespan shutdown
+EXIT_GRACE: float = 10
+
+
+class DrainingServer(uvicorn.Server):
+    """Uvicorn server that keeps accepting while running generations finish, only refusing new ones"""
+
+    # the loop only keeps a weak reference to tasks
+    draining: Optional[asyncio.Task] = None
+
+    def handle_exit(self, sig: int, frame: Optional[FrameType]) -> None:
+        # imported by the worker with the app
+        import src.api.lifecycle as lifecycle
+
+        if lifecycle.state == lifecycle.DRAINING and sig == signal.SIGTERM:
+            # forwarded by the launcher after ctrl-c reached the whole process group
+            return
+        if lifecycle.state == lifecycle.DRAINING or not self.started:
+            # another ctrl-c stops waiting
+            return super().handle_exit(sig, frame)
+        lifecycle.begin_drain(runtime_config.drain_timeout)
+        asyncio.get_running_loop().call_soon_threadsafe(self.start_draining)
+
+    def start_draining(self) -> None:
+        self.draining = asyncio.get_running_loop().create_task(self.drain_and_exit())
+
+    async def drain_and_exit(self) -> None:
+        import src.api.lifecycle as lifecycle
+
+        still_running = await lifecycle.wait_running()
+        logger.info("worker %d drained, %d generations still running", os.getpid(), still_running)
+        # listeners of finished generations get their last events within what is left
+        self.config.timeout_graceful_shutdown = max(1, int(lifecycle.remaining()))
+        self.should_exit = True
+
+
+def listen(host: str, port: int) -> socket.socket:
+    sock = socket.create_server((host, port), backlog=2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def listen_private(path: str) -> socket.socket:
+    if os.path.exists(path):
+        # left by the worker this one replaces
+        os.unlink(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    sock.listen(128)
+    return sock
+
+
+def run_worker(sock: socket.socket, slot: int, socket_dir: str) -> None:
+    """Runs in the forked child, never returns"""
+
+    # handlers of the launcher came along with the fork
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    code = 0
+    try:
+        import src.api.peers as peers
+        peers.configure(slot, socket_dir)
+        private = listen_private(peers.socket_path(slot))
+        config = uvicorn.Config(
+            "server:app",
+            proxy_headers=True,
+            # uvicorn logs go through the root queue as well
+            log_config=None,
+        )
+        DrainingServer(config).run(sockets=[sock, private])
+    except BaseException as e:
+        logger.exception("worker %d failed, %s", os.getpid(), e)
+        code = 1
+    finally:
+        # queued records would be lost, os._exit skips atexit
+        src.utils.logmod.stop()
+        os._exit(code)
+
+
+def spawn(sock: socket.socket, slot: int, socket_dir: str) -> int:
+    pid = os.fork()
+    if pid == 0:
+        run_worker(sock, slot, socket_dir)
+    return pid
+
+
+def main(workers: int) -> None:
+    src.utils.logmod.init(runtime_config.log_level, log_format=runtime_config.log_format)
+    db.run_migrations()
+    # served as is when the client takes gzip, streamed files are not compressed on the fly
+    written = static.precompress()
+    logger.info("precompressed %d static assets", len(written))
+    # children open their own connections
+    db.engine.dispose()
+    sock = listen(runtime_config.host, runtime_config.port)
+    socket_dir = tempfile.mkdtemp(prefix="llm-query-workers-")
+    logger.info("listening on %s:%d with %d workers", runtime_config.host, runtime_config.port, workers)
+
+    # slot and start time by pid, a replaced worker takes over the slot
+    children: Dict[int, Tuple[int, float]] = {
+        spawn(sock, slot, socket_dir): (slot, time.monotonic()) for slot in range(workers)
+    }
+    stopping: Optional[float] = None
+    killed = False
+
+    def stop(sig: int, _: Optional[FrameType]) -> None:
+        nonlocal stopping
+        if stopping is None:
+            stopping = time.monotonic()
+            logger.info("received %s, draining %d workers", signal.Signals(sig).name, len(children))
+        for pid in list(children):
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    deadline = runtime_config.drain_timeout + EXIT_GRACE
+    while len(children) > 0:
+        if not killed and stopping is not None and time.monotonic() - stopping > deadline:
+            killed = True
+            logger.error("killing %d workers past the drain deadline", len(children))
+            for pid in list(children):
+                os.kill(pid, signal.SIGKILL)
+        pid, status = os.waitpid(-1, os.WNOHANG)
+        if pid == 0:
+            time.sleep(0.1)
+            continue
+        slot, started = children.pop(pid)
+        if stopping is not None:
+            continue
+        logger.error("worker %d exited with %d after %.0fs, replacing it", pid, os.waitstatus_to_exitcode(status),
+                     time.monotonic() - started)
+        # crashing right away would otherwise spin
+        if time.monotonic() - started < 1:
+            time.sleep(1)
+        children[spawn(sock, slot, socket_dir)] = (slot, time.monotonic())
+    sock.close()
+    shutil.rmtree(socket_dir, ignore_errors=True)
+    logger.info("all workers exited")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else runtime_config.workers)
@@ -1,3 +1,4 @@
 source .venv/bin/activate &&
 alembic upgrade head &&
+python -m src.api.static &&
 python server.py
\ No newline at end of file
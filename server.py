@@ -1,37 +1,146 @@
 """Web server exposing cached queries"""
 
+import asyncio
+import contextlib
 import datetime
 import logging
 import os
+import tracemalloc
 from logging import Logger
 from typing import List, Optional
 
+import httpx
 import uvicorn
-from fastapi import FastAPI, Request, Depends, APIRouter, Query, HTTPException
-from fastapi.responses import HTMLResponse, FileResponse, StreamingResponse
-from fastapi.templating import Jinja2Templates
+from fastapi import FastAPI, Request, Depends, APIRouter, Query, Header, HTTPException, status
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 
+from src.schemas.batch import BatchRequest, BatchResult, BatchStored
 from src.schemas.gen_req import GenerationRequest
+import src.api.admin as admin
+import src.api.answers as answers
+import src.api.batch as batch
+import src.api.conditional as conditional
+import src.api.failures as failures
 import src.api.generate as llm_api_generate
+import src.api.lifecycle as lifecycle
+import src.api.peers as peers
+import src.api.pregen as pregen
+import src.api.render as render
+import src.api.static as static
+import src.api.streams as streams
+import src.api.v1 as api_v1
 import src.api.middleware.db_session as db_middleware
+import src.api.middleware.gzip as gzip_middleware
+import src.api.middleware.rate_limit as rate_limit
 import src.api.middleware.validate_query as query_middleware
 import src.db.database as db
-from src.db import generation_record
+from src.db import generation_record, retention
+from src.db.generation_record import ERRORED
+from src.llm import keep_alive
+from src.llm.resilience import OllamaUnavailable
 import src.utils.logmod
 from src.utils.env_config import read_env, EnvConfig
-from src.utils.lru_cache import LRUCache
 
 runtime_config: EnvConfig = read_env()
-templates = Jinja2Templates(directory="src/template")
-query_cache = LRUCache(size=runtime_config.cache_size)
-src.utils.logmod.init(runtime_config.log_level)
+src.utils.logmod.init(
+    runtime_config.log_level,
+    log_format=runtime_config.log_format,
+    max_payload=runtime_config.log_payload,
+    sample=runtime_config.log_sample,
+)
+if runtime_config.tracemalloc > 0:
+    tracemalloc.start(runtime_config.tracemalloc)
 
 logger: Logger = logging.getLogger(__name__)
 
-app = FastAPI(title="LLM Query API", version="1.0")
+@contextlib.asynccontextmanager
+async def lifespan(_: FastAPI):
+    """Warms the model before the first query, and keeps it warm while running"""
+
+    await keep_alive.preload()
+    heartbeat: Optional[asyncio.Task] = None
+    if runtime_config.heartbeat_interval > 0:
+        heartbeat = asyncio.create_task(
+            keep_alive.heartbeat(runtime_config.heartbeat_interval, keep_alive.parse_hours(runtime_config.warm_hours))
+        )
+    # background work on the shared db and model, one worker is enough
+    first = peers.slot in (None, 0)
+    retain: Optional[asyncio.Task] = None
+    if runtime_config.retention_days > 0 and first:
+        retain = asyncio.create_task(retention.retain(
+            db.engine,
+            runtime_config.archive_db,
+            datetime.timedelta(days=runtime_config.retention_days),
+            runtime_config.retention_batch,
+            runtime_config.retention_interval,
+        ))
+    pregenerate: Optional[asyncio.Task] = None
+    announcements: Optional[asyncio.Task] = None
+    if runtime_config.pregen_daily > 0 and first:
+        pregenerate = asyncio.create_task(pregen.run())
+        if peers.slot is not None:
+            announcements = asyncio.create_task(peers.listen_traffic(llm_api_generate.traffic.announced))
+    lifecycle.ready()
+    yield
+    for task in (heartbeat, retain, pregenerate, announcements):
+        if task is not None:
+            task.cancel()
+    # running generations get to store their answers, unless the launcher waited for them already
+    lifecycle.begin_drain(runtime_config.drain_timeout)
+    await lifecycle.drain()
+
+app = FastAPI(title="LLM Query API", version="1.0", lifespan=lifespan)
 router = APIRouter()
 
+if runtime_config.rate_hit_per_min > 0:
+    app.add_middleware(
+        rate_limit.RateLimitMiddleware,
+        limiter=rate_limit.RateLimiter(
+            hits=rate_limit.Budget(runtime_config.rate_hit_per_min, runtime_config.rate_hit_burst),
+            misses=rate_limit.Budget(runtime_config.rate_miss_per_min, runtime_config.rate_miss_burst),
+            max_clients=runtime_config.rate_clients,
+        ),
+        paths=("/query", "/api/v1/query", "/batch"),
+        key_header=runtime_config.rate_key_header,
+    )
+
+if runtime_config.gzip_min_size > 0:
+    # added last, so rate limit headers are in place before it looks at the response
+    app.add_middleware(gzip_middleware.GZipMiddleware, min_size=runtime_config.gzip_min_size)
+
+@app.exception_handler(OllamaUnavailable)
+async def ollama_unavailable(request: Request, e: OllamaUnavailable) -> JSONResponse:
+    """Model is down or too slow, clients should come back later"""
+
+    logger.warning("ollama unavailable for %s, %s", request.url.path, e)
+    return JSONResponse(
+        {"detail": str(e)},
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+@app.exception_handler(httpx.HTTPError)
+async def ollama_failed(request: Request, e: httpx.HTTPError) -> JSONResponse:
+    """Model answered with an error, or the connection broke"""
+
+    logger.error("ollama failed for %s, %s", request.url.path, e)
+    return JSONResponse({"detail": "model request failed"}, status_code=status.HTTP_502_BAD_GATEWAY)
+
+@app.exception_handler(answers.UnusableAnswer)
+async def unusable_answer(request: Request, e: answers.UnusableAnswer) -> JSONResponse:
+    """Model answered, but with nothing worth storing"""
+
+    return JSONResponse({"detail": str(e)}, status_code=status.HTTP_502_BAD_GATEWAY)
+
+def entry_response(record: generation_record.GenerationRecord) -> HTMLResponse:
+    """Pre-rendered log entry along with its validators"""
+
+    return HTMLResponse(
+        render.render_entry(record),
+        headers=conditional.validator_headers(record.id, record.created_at),
+    )
+
 @router.get("/favicon.ico", response_class=FileResponse)
 async def favicon() -> FileResponse:
     """favicon"""
@@ -39,6 +148,12 @@ async def favicon() -> FileResponse:
     logger.debug("serving favicon...")
     return FileResponse(f"{os.getcwd()}/src/img/scarab-bnw.svg", media_type="image/svg+xml")
 
+@router.get("/static/{name:path}", response_class=FileResponse)
+async def static_asset(name: str, accept_encoding: Optional[str] = Header(None)) -> FileResponse:
+    """Vendored frontend assets, precompressed variants when accepted"""
+
+    return static.static_response(name, accept_encoding)
+
 @router.get("/", response_class=HTMLResponse)
 async def read_home(
         request: Request,
@@ -47,6 +162,12 @@ async def read_home(
     """Home page, displaying past queries"""
 
     logger.info("Serving home to %s", request.client)
+    # other workers store records too, the newest id tells if the cached page is still current
+    latest_id = generation_record.latest_id(db_session)
+    content: Optional[bytes] = render.cached_home(latest_id)
+    if content is not None:
+        return HTMLResponse(content)
+
     logs: List[generation_record.GenerationRecord] = generation_record.get_query_logs(
         db_session,
         offset=0,
@@ -56,7 +177,7 @@ async def read_home(
         logs[0] = generation_record.get_query_log(db_session, logs[0].id)
         logs[0].clickable = False
 
-    return templates.TemplateResponse("home.html", {"request": request, "logs": logs})
+    return HTMLResponse(render.render_home(logs, latest_id))
 
 @router.post("/query", response_class=StreamingResponse)
 async def generation_request(
@@ -66,57 +187,126 @@ async def generation_request(
 ) -> HTMLResponse:
     """Makes requests to Ollama API Generate"""
     logger.info("Received query from %s: %s", request.client, prompt.query)
-    user_query: str = f"{prompt.query}"
-    # maybe we already cached response for this query
-    query_log_record: Optional[generation_record.GenerationRecord] = query_cache.get(user_query)
-    if query_log_record is not None:
-        logger.debug("Serving from cache, query:'%s', response:'%s'",
-                     prompt.query, query_log_record.response_text)
-        query_log_record.clickable = False
-        return templates.TemplateResponse(
-            "log_entry.html", {
-                "request": request,
-                "entry": query_log_record
-            })
-
-    # still, maybe we already answered this query previously
-    query_hash = hash(user_query)
-    query_log_record = generation_record.get_query_log(db_session, query_hash)
-    if query_log_record is not None and query_log_record.query_text == user_query:
-        logger.info("Serving stored response: %s: %s", user_query, query_log_record.response_text)
-        query_cache.put(user_query, query_log_record)
-        query_log_record.updated_at = datetime.datetime.now()
-        generation_record.update_query_record(db_session, query_log_record)
-        query_log_record.clickable = False
-        return templates.TemplateResponse(
-            "log_entry.html",{
-                "request": request,
-                "entry": query_log_record,
-            })
-
-    logger.info("Making generation request: %s", )
-    responses: [str] = []
-    async for part in llm_api_generate.generate(prompt.query):
-        # TODO send chunks as they arrive
-        responses.append(part)
-
-    # store and cache for reuse
-    query_log_record = generation_record.create_query_log(
-        db_session,
-        prompt.query,
-        response_text="".join(responses),
+    found = await answers.lookup(db_session, prompt.query, parent_id=prompt.parent_id)
+    if found.record is not None:
+        found.record.clickable = False
+        return entry_response(found.record)
+
+    failures.check(found.cache_key)
+    try:
+        lifecycle.check_accepting()
+        rate_limit.charge_miss(request)
+    except HTTPException:
+        # answered ahead of the next ask, once there is capacity
+        pregen.note(found.query, rate_limit.client_key(request), found.parent_id)
+        raise
+    logger.info("Making generation request: %s", prompt.query)
+    generation = streams.Generation(runtime_config.stream_ring, prefix=peers.prefix())
+    outcome = llm_api_generate.GenerationOutcome()
+    parts = llm_api_generate.generate(prompt.query, context=found.context, outcome=outcome, model=found.model)
+
+    async def produce() -> None:
+        async for part in parts:
+            generation.push(part)
+        # request session is closed by now
+        with db.SessionLocal() as session:
+            record = await answers.store(session, found, generation.text(), outcome)
+        generation.finish(record.id)
+
+    streams.start(generation, produce(), runtime_config.stream_grace)
+    return HTMLResponse(render.render_generation(generation.id, prompt.query))
+
+@router.get("/query/{generation_id}/events", response_class=StreamingResponse)
+async def generation_events(
+    request: Request,
+    generation_id: str,
+    last_event_id: int = Header(0, ge=0),
+) -> StreamingResponse:
+    """
+    Server sent events of a running generation, chunks with ids, then done
+    with the stored record id. Browsers reconnect with Last-Event-ID and resume.
+    """
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    generation = streams.get(generation_id)
+    if generation is None:
+        # started by another worker
+        owner = peers.owner(generation_id)
+        relayed = None if owner is None else await peers.relay(owner, request.url.path, last_event_id)
+        if relayed is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Generation not found")
+        logger.debug("relaying generation %s from worker %d", generation_id, owner)
+        return StreamingResponse(relayed, media_type="text/event-stream", headers=headers)
+    logger.debug("streaming generation %s after event %d", generation_id, last_event_id)
+    return StreamingResponse(generation.events(last_event_id), media_type="text/event-stream", headers=headers)
+
+@router.post("/batch", response_class=StreamingResponse)
+async def batch_request(
+    request: Request,
+    body: BatchRequest,
+    db_session: Session = Depends(db_middleware.get_db),
+) -> StreamingResponse:
+    """
+    Answers many queries, streaming NDJSON lines as each one is resolved.
+    Cached and stored answers come first, the rest is generated in parallel,
+    stored with a single bulk insert, and reported in the last line.
+    """
+
+    logger.info("Received batch of %d queries from %s", len(body.queries), request.client)
+    found, misses = answers.lookup_many(db_session, body.queries)
+    if len(misses) > 0:
+        try:
+            lifecycle.check_accepting()
+        except HTTPException:
+            for query in misses:
+                pregen.note(query, rate_limit.client_key(request))
+            raise
+    lines: List[bytes] = [
+        BatchResult(query=query, response=record.response_text, id=record.id, source=source, model=record.model)
+        .model_dump_json().encode("utf-8") + b"\n"
+        for query, (record, source) in found.items()
+    ]
+    # queries that keep failing are not generated until their backoff is over
+    lines.extend(
+        BatchResult(query=query, source="backoff").model_dump_json().encode("utf-8") + b"\n"
+        for query in misses if failures.remaining(query) > 0
     )
-    if query_log_record is None:
-        logger.error('Failed to save new query record for "%s"', prompt.query)
-        raise RuntimeError("failed to persist query for later")
-    query_cache.put(user_query, query_log_record)
-    query_log_record.clickable = False
-
-    return templates.TemplateResponse(
-        "log_entry.html", {
-            "request": request,
-            "entry": query_log_record,
-        })
+    misses = [query for query in misses if failures.remaining(query) == 0]
+    # generates what the client's budget allows, the rest may be sent again later
+    granted = rate_limit.charge_misses(request, len(misses))
+    for query in misses[granted:]:
+        pregen.note(query, rate_limit.client_key(request))
+        lines.append(BatchResult(query=query, source="limited").model_dump_json().encode("utf-8") + b"\n")
+    misses = misses[:granted]
+
+    async def results():
+        for line in lines:
+            yield line
+        generated: List[tuple[str, str, Optional[str], Optional[str], str]] = []
+        try:
+            generating = batch.generate_all(misses, runtime_config.batch_parallelism)
+            async for query, response, model, reasoning, outcome in generating:
+                if response is not None:
+                    generated.append((query, response, model, reasoning, outcome))
+                if response is None or outcome == ERRORED:
+                    result = BatchResult(query=query, source="failed", model=model)
+                else:
+                    result = BatchResult(query=query, response=response, source="generated", model=model, outcome=outcome)
+                yield result.model_dump_json().encode("utf-8") + b"\n"
+        finally:
+            # keep what was generated, even if the client went away
+            with db.SessionLocal() as session:
+                records = answers.store_many(session, generated)
+        yield BatchStored(stored={record.query_text: record.id for record in records}).model_dump_json().encode("utf-8") + b"\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@router.get("/ready", response_class=JSONResponse)
+async def readiness() -> JSONResponse:
+    """200 once started and until draining, load balancers stop sending work on 503"""
+
+    code = status.HTTP_200_OK if lifecycle.state == lifecycle.READY else status.HTTP_503_SERVICE_UNAVAILABLE
+    return JSONResponse({"status": lifecycle.state}, status_code=code, headers={"Cache-Control": "no-store"})
 
 @router.get("/log", response_class=HTMLResponse)
 async def read_log(
@@ -131,30 +321,76 @@ async def read_log(
         raise ValueError("query_id is required")
     if isinstance(query_id, int) is False or query_id < 1:
         raise ValueError("query_id must be positive integer")
-    query_log_record = generation_record.get_query_log(db_session, query_id=query_id)
-    if query_log_record is None:
+    # records are immutable, so id and creation time are enough to validate
+    version = generation_record.get_query_log_version(db_session, query_id=query_id)
+    if version is None:
+        archived = retention.get_archived_log(query_id)
+        if archived is not None:
+            logger.info("query id=%s served from archive", query_id)
+            return entry_response(archived)
         raise HTTPException(
             status_code=555,
             detail="Query not found",
             headers={"Retry-After": "30"},
         )
 
-    return templates.TemplateResponse(
-        "log_entry.html", {
-            "request": request,
-            "entry": query_log_record,
-        })
+    headers = conditional.validator_headers(version.id, version.created_at)
+    headers["Cache-Control"] = conditional.RECORD_CACHE_CONTROL
+    if conditional.is_not_modified(request, version.id, version.created_at):
+        logger.debug("query id=%s not modified", query_id)
+        return conditional.not_modified(headers)
+
+    content: Optional[bytes] = render.cached_entry(version.id, version.created_at, clickable=True)
+    if content is None:
+        query_log_record = generation_record.get_query_log(db_session, query_id=query_id)
+        content = render.render_entry(query_log_record)
+    return HTMLResponse(content, headers=headers)
+
+@router.get("/reasoning", response_class=HTMLResponse)
+async def read_reasoning(
+    db_session: Session = Depends(db_middleware.get_db),
+    query_id: int = Query(..., alias="id", ge=1),
+) -> HTMLResponse:
+    """Reasoning of one record, fetched only when the user asks to see it"""
+
+    reasoning = generation_record.get_reasoning(db_session, query_id)
+    if reasoning is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reasoning not found")
+    return HTMLResponse(
+        render.render_reasoning(reasoning),
+        headers={"Cache-Control": conditional.RECORD_CACHE_CONTROL},
+    )
+
+@router.get("/search", response_class=HTMLResponse)
+async def search_logs(
+    request: Request,
+    db_session: Session = Depends(db_middleware.get_db),
+    search: str = Query("", alias="q", max_length=128),
+    limit: int = Query(10, ge=1, le=100),
+) -> HTMLResponse:
+    """Full text search over previous queries and responses"""
+
+    logger.info("Searching '%s' for %s", search, request.client)
+    if search.strip() == "":
+        return HTMLResponse('<div id="search_results"></div>')
+    hits = generation_record.search_query_logs(db_session, search, limit=limit)
+    return HTMLResponse(render.render_search(search, hits))
 
 app.include_router(router)
+app.include_router(api_v1.router)
+app.include_router(admin.router)
 
 # api/middleware/todo.py
 
 if __name__ == "__main__":
     db.run_migrations()
     uvicorn.run(
-        "server:app",
+        # the reloader imports the app again in a child process, otherwise this one is served as is
+        "server:app" if runtime_config.reload else app,
         host=runtime_config.host,
         port=runtime_config.port,
         proxy_headers=True,
-        reload=True,
+        reload=runtime_config.reload,
+        # uvicorn logs go through the root queue as well
+        log_config=None,
     )
@@ -0,0 +1,140 @@
+"""
+Answer cache introspection and control, and process diagnostics, for operators behind a bearer token.
+Every worker process has its own cache, requests reach whichever one accepts them.
+"""
+import logging
+import os
+import secrets
+from logging import Logger
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from sqlalchemy.orm import Session
+
+import src.api.answers as answers
+import src.api.conversation as conversation
+import src.api.diagnostics as diagnostics
+import src.api.middleware.db_session as db_middleware
+from src.db import generation_record
+from src.db.generation_record import GenerationRecord
+from src.schemas.cache_admin import (
+    CacheEvicted,
+    CacheKey,
+    CachePreload,
+    CachePreloaded,
+    CacheResize,
+    CacheStats,
+)
+from src.schemas.process_stats import ProcessStats
+from src.utils.env_config import read_env, EnvConfig
+
+runtime_config: EnvConfig = read_env()
+logger: Logger = logging.getLogger(__name__)
+
+
+def require_admin(authorization: Optional[str] = Header(None)) -> None:
+    """
+    Checks the bearer token against ADMIN_TOKEN
+
+    :raises HTTPException: 404 while no token is configured, 401 for a missing or wrong one
+    """
+
+    if runtime_config.admin_token == "":
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), runtime_config.admin_token.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Admin token required",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+router = APIRouter(prefix="/api/v1/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+def record_bytes(record: GenerationRecord) -> int:
+    """Stored size of query and response, without loading deferred columns"""
+
+    loaded = record.__dict__
+    return sum(
+        len(value.encode("utf-8")) if isinstance(value, str) else len(value)
+        for value in (loaded.get("query_text"), loaded.get("response_plain"), loaded.get("response_zlib"))
+        if value is not None
+    )
+
+
+def stats(top: int) -> CacheStats:
+    cache = answers.query_cache
+    looked_up = cache.hits + cache.misses
+    return CacheStats(
+        pid=os.getpid(),
+        size=cache.size,
+        entries=cache.len,
+        bytes=cache.nbytes(record_bytes),
+        hits=cache.hits,
+        misses=cache.misses,
+        hit_ratio=None if looked_up == 0 else cache.hits / looked_up,
+        top=[CacheKey(key=key, hits=hits) for key, hits in cache.top(top)],
+    )
+
+
+def json_response(model) -> Response:
+    return Response(model.model_dump_json(), media_type="application/json", headers={"Cache-Control": "no-store"})
+
+
+@router.get("/cache", response_model=CacheStats)
+async def cache_stats(top: int = Query(20, ge=0, le=1000)) -> Response:
+    """Capacity, entries, bytes, hit and miss counts, and the most hit keys"""
+
+    return json_response(stats(top))
+
+
+@router.delete("/cache", response_model=CacheEvicted)
+async def cache_evict(
+    key: Optional[str] = Query(None, min_length=1),
+    prefix: Optional[str] = Query(None, min_length=1),
+) -> Response:
+    """Drops a key, or keys starting with prefix, like "42>" for follow ups of record 42"""
+
+    if (key is None) == (prefix is None):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Give either key or prefix")
+    evicted = int(answers.query_cache.remove(key)) if key is not None else answers.query_cache.remove_prefix(prefix)
+    logger.info("admin evicted %d cache entries, key=%s prefix=%s", evicted, key, prefix)
+    return json_response(CacheEvicted(evicted=evicted))
+
+
+@router.put("/cache/size", response_model=CacheStats)
+async def cache_resize(body: CacheResize) -> Response:
+    """Changes capacity until restart, least recently used entries over it are dropped"""
+
+    dropped = answers.query_cache.resize(body.size)
+    logger.info("admin resized cache to %d, dropped %d", body.size, dropped)
+    return json_response(stats(0))
+
+
+@router.post("/cache/preload", response_model=CachePreloaded)
+async def cache_preload(
+    body: CachePreload,
+    db_session: Session = Depends(db_middleware.get_db),
+) -> Response:
+    """Caches stored records under the key their query is looked up by, truncated ones count as missing"""
+
+    loaded: List[int] = []
+    missing: List[int] = []
+    for record_id in dict.fromkeys(body.ids):
+        record = generation_record.get_query_log(db_session, record_id)
+        if record is None or not record.servable:
+            missing.append(record_id)
+            continue
+        answers.query_cache.put(conversation.cache_key(record.query_text, record.parent_id), record)
+        loaded.append(record_id)
+    logger.info("admin preloaded %d records, %d missing", len(loaded), len(missing))
+    return json_response(CachePreloaded(loaded=loaded, missing=missing))
+
+
+@router.get("/process", response_model=ProcessStats)
+async def process_stats(top: int = Query(0, ge=0, le=100)) -> Response:
+    """RSS, open files, pool checkouts, tasks, and with TRACEMALLOC the top allocation sites"""
+
+    return json_response(diagnostics.process_stats(top))
@@ -0,0 +1,245 @@
+"""Answer tiers shared by all query routes: cache, stored, similar, then generated"""
+import asyncio
+import datetime
+import logging
+from logging import Logger
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+import src.api.conversation as conversation
+import src.api.failures as failures
+import src.api.generate as llm_api_generate
+import src.api.render as render
+import src.api.semantic_cache as semantic_cache
+from src.api.generate import GenerationOutcome
+from src.db import generation_record
+from src.db.generation_record import COMPLETE, ERRORED, GenerationRecord
+from src.llm.context import pack_context
+from src.utils.env_config import read_env, EnvConfig
+from src.utils.lru_cache import LRUCache
+
+runtime_config: EnvConfig = read_env()
+logger: Logger = logging.getLogger(__name__)
+
+query_cache = LRUCache(size=runtime_config.cache_size)
+
+# cache hits are written down as accesses at most this often per record, retention goes by them
+TOUCH_INTERVAL: datetime.timedelta = datetime.timedelta(hours=1)
+
+
+class UnusableAnswer(Exception):
+    """Generation ended without an answer worth storing"""
+
+
+class Lookup:
+    """Outcome of looking for an existing answer, carries what generation and storing need"""
+
+    def __init__(self, query: str, parent: Optional[GenerationRecord]) -> None:
+        self.query = query
+        self.parent = parent
+        self.cache_key: str = conversation.cache_key(query, None if parent is None else parent.id)
+        self.record: Optional[GenerationRecord] = None
+        # cache, stored or similar, once found
+        self.source: Optional[str] = None
+        self.vector: Optional[List[float]] = None
+
+    @property
+    def parent_id(self) -> Optional[int]:
+        return None if self.parent is None else self.parent.id
+
+    @property
+    def context(self) -> Optional[List[int]]:
+        """Model context to continue from, when following up"""
+        return None if self.parent is None else conversation.load_context(self.parent)
+
+    @property
+    def model(self) -> Optional[str]:
+        """Follow ups continue on the model that produced their context"""
+        return None if self.parent is None else self.parent.model
+
+
+def find_parent(db: Session, parent_id: Optional[int]) -> Optional[GenerationRecord]:
+    """
+    Previous conversation turn, none for standalone queries
+
+    :raises HTTPException: 400 if there is no such turn
+    """
+
+    if parent_id is None:
+        return None
+    parent = generation_record.get_query_log(db, parent_id)
+    if parent is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown conversation turn {parent_id}",
+        )
+    return parent
+
+
+def superseded(record: GenerationRecord) -> bool:
+    """
+    Standalone answer of the fallback model, while the main one is back to answering all prompts.
+    Asked again, the main model answers, and its answer is the latest for the query from then on.
+    Follow ups are not, they continue on the model of their conversation.
+    """
+
+    cascade = llm_api_generate.cascade
+    return (
+        cascade is not None
+        and record.parent_id is None
+        and record.model == cascade.fallback
+        and not cascade.degrading()
+    )
+
+
+def touch(db: Session, records: Iterable[GenerationRecord]) -> None:
+    """Notes records served without update_query_record as accessed, at most once per TOUCH_INTERVAL"""
+
+    now = generation_record.utcnow()
+    stale = [record for record in records if record.updated_at is None or now - record.updated_at >= TOUCH_INTERVAL]
+    if len(stale) == 0:
+        return
+    generation_record.touch_query_records(db, [record.id for record in stale], now)
+    for record in stale:
+        record.updated_at = now
+
+
+async def lookup(db: Session, query: str, parent_id: Optional[int] = None) -> Lookup:
+    """
+    Looks for an answer in cache, then stored answers, then answers to similar queries.
+    Answers of the fallback model are only served while load lasts.
+    """
+
+    found = Lookup(query, find_parent(db, parent_id))
+    # maybe we already cached response for this query
+    found.record = query_cache.get(found.cache_key)
+    if found.record is not None and superseded(found.record):
+        found.record = None
+    if found.record is not None:
+        logger.debug("Serving from cache, query:'%s', response:'%s'", query, found.record.response_text)
+        touch(db, [found.record])
+        found.source = "cache"
+        return found
+
+    # still, maybe we already answered this query previously
+    found.record = generation_record.find_query_log(db, query, parent_id=parent_id)
+    if found.record is not None and superseded(found.record):
+        found.record = None
+    if found.record is not None:
+        logger.info("Serving stored response %d: %s", found.record.id, query)
+        query_cache.put(found.cache_key, found.record)
+        found.record.updated_at = generation_record.utcnow()
+        generation_record.update_query_record(db, found.record)
+        found.source = "stored"
+        return found
+
+    # or answered a query similar enough, follow ups depend on their conversation
+    if found.parent is None:
+        found.vector = await semantic_cache.embed(query)
+    # scans the index under a file lock, off the event loop
+    for record_id in await asyncio.to_thread(semantic_cache.nearest, found.vector):
+        found.record = generation_record.get_query_log(db, record_id)
+        if found.record is None or not found.record.servable or superseded(found.record):
+            found.record = None
+            continue
+        logger.info("Serving response of similar query %d: %s", record_id, query)
+        query_cache.put(found.cache_key, found.record)
+        found.source = "similar"
+        return found
+    return found
+
+
+def settle(key: str, outcome_status: str) -> None:
+    """Counts failed generations of the query cached under key towards its backoff, complete ones reset it"""
+
+    if outcome_status == COMPLETE:
+        failures.clear(key)
+    else:
+        failures.record(key)
+
+
+async def store(
+        db: Session,
+        found: Lookup,
+        response_text: str,
+        outcome: GenerationOutcome,
+        pregenerated: bool = False,
+) -> GenerationRecord:
+    """
+    Stores generated answer, complete ones are cached for reuse,
+    truncated ones are kept for the record and generated again next time
+
+    :raises UnusableAnswer: if the generation errored, nothing is stored then
+    """
+
+    outcome_status = outcome.status
+    settle(found.cache_key, outcome_status)
+    if outcome_status == ERRORED:
+        logger.warning('Generation errored for "%s", %d chars, not storing', found.query, outcome.answer_len)
+        raise UnusableAnswer("model returned no usable answer")
+    record = generation_record.create_query_log(
+        db,
+        found.query,
+        response_text=response_text,
+        parent=found.parent,
+        context=pack_context(outcome.context),
+        model=outcome.model,
+        reasoning=outcome.reasoning,
+        outcome=outcome_status,
+        pregenerated=pregenerated,
+    )
+    if record is None:
+        logger.error('Failed to save new query record for "%s"', found.query)
+        raise RuntimeError("failed to persist query for later")
+    render.invalidate_home()
+    conversation.keep_context(record)
+    if record.servable:
+        await asyncio.to_thread(semantic_cache.add, record.id, found.vector)
+        query_cache.put(found.cache_key, record)
+    return record
+
+
+def lookup_many(db: Session, queries: Iterable[str]) -> Tuple[Dict[str, Tuple[GenerationRecord, str]], List[str]]:
+    """
+    Resolves standalone queries from cache, then stored answers with a single lookup.
+    Returns found records with their source by query, and queries left unanswered.
+    """
+
+    found: Dict[str, Tuple[GenerationRecord, str]] = {}
+    misses: List[str] = []
+    for query in dict.fromkeys(queries):
+        record = query_cache.get(query)
+        if record is None or superseded(record):
+            misses.append(query)
+        else:
+            found[query] = (record, "cache")
+
+    for query, record in generation_record.find_query_logs(db, misses).items():
+        if superseded(record):
+            continue
+        query_cache.put(query, record)
+        found[query] = (record, "stored")
+    touch(db, [record for record, _ in found.values()])
+    return found, [query for query in misses if query not in found]
+
+
+def store_many(
+        db: Session,
+        answers: List[Tuple[str, str, Optional[str], Optional[str], str]],
+) -> List[GenerationRecord]:
+    """
+    Stores generated standalone answers with a single bulk insert, and caches the complete ones.
+    Errored answers only count towards the backoff of their query.
+    """
+
+    for query, _, _, _, outcome_status in answers:
+        settle(query, outcome_status)
+    records = generation_record.create_query_logs(db, [answer for answer in answers if answer[-1] != ERRORED])
+    if len(records) > 0:
+        render.invalidate_home()
+    for record in records:
+        if record.servable:
+            query_cache.put(record.query_text, record)
+    return records
@@ -0,0 +1,47 @@
+"""Runs many generations at once, under a parallelism limit"""
+import asyncio
+import logging
+from logging import Logger
+from typing import AsyncGenerator, Iterable, Optional, Tuple
+
+import httpx
+
+import src.api.generate as llm_api_generate
+from src.llm.resilience import OllamaUnavailable
+
+logger: Logger = logging.getLogger(__name__)
+
+# query, response, answering model, its reasoning and how the generation ended
+Generated = Tuple[str, Optional[str], Optional[str], Optional[str], Optional[str]]
+
+
+async def _generate_one(query: str, limit: asyncio.Semaphore) -> Generated:
+    async with limit:
+        logger.debug("batch generating '%s'", query)
+        outcome = llm_api_generate.GenerationOutcome()
+        try:
+            parts = [part async for part in llm_api_generate.generate(query, outcome=outcome)]
+        except (httpx.HTTPError, OllamaUnavailable) as e:
+            logger.error("batch generation failed for '%s', %s", query, e)
+            return query, None, None, None, None
+    return query, "".join(parts), outcome.model, outcome.reasoning, outcome.status
+
+
+async def generate_all(
+        queries: Iterable[str],
+        parallelism: int,
+) -> AsyncGenerator[Generated, None]:
+    """
+    Yields query, response, answering model, its reasoning and outcome in order of completion,
+    response and outcome are None when the model could not be reached.
+    Pending generations are cancelled when the consumer stops early.
+    """
+
+    limit = asyncio.Semaphore(parallelism)
+    pending = [asyncio.create_task(_generate_one(query, limit)) for query in queries]
+    try:
+        for next_done in asyncio.as_completed(pending):
+            yield await next_done
+    finally:
+        for task in pending:
+            task.cancel()
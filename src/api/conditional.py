@@ -0,0 +1,76 @@
+"""HTTP validators for immutable records, see RFC 9110 section 13"""
+import datetime
+import logging
+from email.utils import format_datetime, parsedate_to_datetime
+from logging import Logger
+from typing import Dict, Optional
+
+from fastapi import Request, Response, status
+
+logger: Logger = logging.getLogger(__name__)
+
+# records never change once written, let proxies keep them for a day
+RECORD_CACHE_CONTROL: str = "public, max-age=86400, immutable"
+
+
+def _as_utc(moment: datetime.datetime) -> datetime.datetime:
+    """Naive timestamps from the DB are stored in UTC"""
+
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=datetime.UTC)
+    return moment.astimezone(datetime.UTC)
+
+
+def entity_tag(record_id: int, created_at: Optional[datetime.datetime]) -> str:
+    """
+    Strong validator of a record representation.
+    `updated_at` tracks last access, not content change, so it is not part of the tag.
+    """
+
+    stamp = int(_as_utc(created_at).timestamp() * 1e6) if created_at is not None else 0
+    return f'"{record_id}-{stamp:x}"'
+
+
+def validator_headers(record_id: int, created_at: Optional[datetime.datetime]) -> Dict[str, str]:
+    """ETag and Last-Modified for a record"""
+
+    headers = {"ETag": entity_tag(record_id, created_at)}
+    if created_at is not None:
+        headers["Last-Modified"] = format_datetime(_as_utc(created_at), usegmt=True)
+    return headers
+
+
+def is_not_modified(
+        request: Request,
+        record_id: int,
+        created_at: Optional[datetime.datetime],
+) -> bool:
+    """Evaluates If-None-Match, or If-Modified-Since when the former is absent"""
+
+    if_none_match: Optional[str] = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        etag = entity_tag(record_id, created_at)
+        # weak comparison, as required for If-None-Match
+        candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return etag in candidates
+
+    if_modified_since: Optional[str] = request.headers.get("if-modified-since")
+    if if_modified_since is None or created_at is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        logger.debug("ignoring malformed If-Modified-Since '%s'", if_modified_since)
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=datetime.UTC)
+    # http dates have one second resolution
+    return _as_utc(created_at).replace(microsecond=0) <= since
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    """Empty 304 response carrying the validators"""
+
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
@@ -0,0 +1,37 @@
+"""Conversation threads, continued from the model context of the previous turn"""
+import logging
+from logging import Logger
+from typing import List, Optional
+
+from src.db.generation_record import GenerationRecord
+from src.llm.context import ContextStore, unpack_context
+from src.utils.env_config import read_env, EnvConfig
+
+runtime_config: EnvConfig = read_env()
+logger: Logger = logging.getLogger(__name__)
+
+context_store = ContextStore(runtime_config.context_budget)
+
+
+def cache_key(query: str, parent_id: Optional[int]) -> str:
+    """Same query means something else in another conversation"""
+
+    if parent_id is None:
+        return query
+    return f"{parent_id}>{query}"
+
+
+def load_context(parent: GenerationRecord) -> Optional[List[int]]:
+    """Context to continue the conversation after the parent turn"""
+
+    packed = context_store.get(parent.id)
+    if packed is None:
+        packed = parent.context
+        context_store.put(parent.id, packed)
+    return unpack_context(packed)
+
+
+def keep_context(record: GenerationRecord) -> None:
+    """Keeps context of a new turn, the most likely one to be followed up"""
+
+    context_store.put(record.id, record.context)
@@ -0,0 +1,72 @@
+"""
+Resource usage of this worker process, sampled by bench/soak.py to catch slow leaks.
+Allocation sites are only known with TRACEMALLOC frames configured, tracing costs memory and time.
+"""
+import asyncio
+import os
+import time
+import tracemalloc
+from typing import List, Optional
+
+import src.api.answers as answers
+import src.api.streams as streams
+import src.db.database as db
+from src.schemas.process_stats import AllocationSite, ProcessStats
+
+started: float = time.monotonic()
+
+
+def rss() -> Optional[int]:
+    """Resident bytes, None where /proc is missing"""
+
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return None
+
+
+def open_fds() -> Optional[int]:
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+
+def pool_checked_out() -> Optional[int]:
+    """Connections out of the pool, none for pools that do not count them"""
+
+    checked_out = getattr(db.engine.pool, "checkedout", None)
+    return None if checked_out is None else checked_out()
+
+
+def allocation_sites(top: int) -> List[AllocationSite]:
+    """Lines holding the most traced memory, largest first"""
+
+    if not tracemalloc.is_tracing() or top == 0:
+        return []
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ))
+    return [
+        AllocationSite(site=f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", size=stat.size, count=stat.count)
+        for stat in snapshot.statistics("lineno")[:top]
+    ]
+
+
+def process_stats(top: int) -> ProcessStats:
+    """Must be called on the event loop, tasks are counted on the running one"""
+
+    return ProcessStats(
+        pid=os.getpid(),
+        uptime=time.monotonic() - started,
+        rss=rss(),
+        fds=open_fds(),
+        pool_checked_out=pool_checked_out(),
+        tasks=len(asyncio.all_tasks()),
+        generations=len(streams.generations),
+        cache_entries=answers.query_cache.len,
+        traced=tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None,
+        top=allocation_sites(top),
+    )
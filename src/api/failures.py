@@ -0,0 +1,92 @@
+"""
+Negative cache of queries whose generations keep failing. From the second failure in a row
+a query is refused for a backoff that doubles with every further failure, so bad prompts
+stop taking model time. Each worker process keeps its own, like the answer cache.
+"""
+import collections
+import logging
+import math
+import time
+from dataclasses import dataclass
+from logging import Logger
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+from src.utils.env_config import read_env, EnvConfig
+
+runtime_config: EnvConfig = read_env()
+logger: Logger = logging.getLogger(__name__)
+
+# failures in a row before a query is refused, a single one may be bad luck
+REPEATS: int = 2
+# queries tracked at most, least recently failed are forgotten
+MAX_KEYS: int = 10000
+
+
+@dataclass
+class Failures:
+    count: int
+    # monotonic time until which the query is refused
+    until: float
+
+
+failed: collections.OrderedDict[str, Failures] = collections.OrderedDict()
+
+
+def backoff(count: int) -> float:
+    """Seconds a query failed count times in a row is refused for"""
+
+    if count < REPEATS:
+        return 0
+    return min(runtime_config.failure_backoff * 2 ** (count - REPEATS), runtime_config.failure_backoff_max)
+
+
+def record(key: str, now: Optional[float] = None) -> float:
+    """Counts a failed generation of the query cached under key, returns seconds it is refused for"""
+
+    if runtime_config.failure_backoff == 0:
+        return 0
+    now = time.monotonic() if now is None else now
+    previous = failed.pop(key, None)
+    # failures long after the last backoff ended do not add up
+    recent = previous is not None and now - previous.until < runtime_config.failure_backoff_max
+    count = previous.count + 1 if recent else 1
+    seconds = backoff(count)
+    failed[key] = Failures(count=count, until=now + seconds)
+    while len(failed) > MAX_KEYS:
+        failed.popitem(last=False)
+    if seconds > 0:
+        logger.warning("query %s failed %d times in a row, refused for %.0fs", key, count, seconds)
+    return seconds
+
+
+def clear(key: str) -> None:
+    """Forgets failures of the query once it was answered"""
+
+    failed.pop(key, None)
+
+
+def remaining(key: str, now: Optional[float] = None) -> float:
+    """Seconds the query is still refused for, 0 if it is not"""
+
+    failures = failed.get(key)
+    if failures is None:
+        return 0
+    return max(0.0, failures.until - (time.monotonic() if now is None else now))
+
+
+def check(key: str) -> None:
+    """
+    Call before generating the query cached under key
+
+    :raises HTTPException: 503 while the query is backing off
+    """
+
+    seconds = remaining(key)
+    if seconds > 0:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Query keeps failing, try again later",
+            headers={"Retry-After": str(math.ceil(seconds))},
+        )
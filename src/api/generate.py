@@ -1,37 +1,223 @@
 """Wrapper for the Ollama API Generate"""
+import asyncio
+import contextlib
 import logging
+import os
+import time
 from logging import Logger
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Dict, Iterator, List, Optional
 
-from src.llm import ollama
+from pydantic import BaseModel
+
+import src.api.lifecycle as lifecycle
+import src.api.peers as peers
+from src.db.generation_record import COMPLETE, ERRORED, TRUNCATED
+from src.llm import keep_alive, ollama
+from src.llm.cascade import Cascade
+from src.llm.models import GenerationResponseComplete
+from src.llm.reasoning import ThinkSplitter
 from src.utils.env_config import read_env, EnvConfig
-from src.utils.logmod import init as init_log
-from src.utils.lru_cache import LRUCache
 
 runtime_config: EnvConfig = read_env()
-query_cache = LRUCache(size=runtime_config.cache_size)
-init_log(runtime_config.log_level)
 
 logger: Logger = logging.getLogger(__name__)
 
-async def generate(query: str) -> AsyncGenerator[str, None]:
-    """Generates response to user query"""
+# routes short prompts to the fallback model under load, when configured
+cascade: Optional[Cascade] = None
+if runtime_config.fallback_model != "":
+    cascade = Cascade(
+        primary=runtime_config.model_name,
+        fallback=runtime_config.fallback_model,
+        max_queue=runtime_config.cascade_queue,
+        min_tps=runtime_config.cascade_min_tps,
+        max_prompt_len=runtime_config.cascade_prompt_len,
+    )
+
+
+class Traffic:
+    """
+    Generations users wait for in this process, and in the other workers as they announce them.
+    Work done ahead of demand yields to them.
+    """
+
+    def __init__(self, announce: bool = False) -> None:
+        self.in_flight: int = 0
+        # running on other workers by pid, as last announced
+        self.remote: Dict[int, int] = {}
+        # monotonic time the last one ended, none before the first
+        self.last_done: Optional[float] = None
+        # tell the first worker of generations here
+        self.announce = announce
+        self._arrived = asyncio.Event()
+
+    def _wake(self) -> None:
+        self._arrived.set()
+        self._arrived = asyncio.Event()
+
+    @contextlib.contextmanager
+    def track(self) -> Iterator[None]:
+        self.in_flight += 1
+        self._wake()
+        if self.announce:
+            peers.announce(self.in_flight)
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.last_done = time.monotonic()
+            if self.announce:
+                peers.announce(self.in_flight)
+
+    def announced(self, pid: int, running: int) -> None:
+        """Another worker runs this many generations now"""
+
+        if running > self.remote.get(pid, 0):
+            self._wake()
+        elif pid in self.remote:
+            self.last_done = time.monotonic()
+        if running > 0:
+            self.remote[pid] = running
+        else:
+            self.remote.pop(pid, None)
+
+    def running(self) -> int:
+        """Generations for users here and on other workers, workers gone since are not counted"""
+
+        for pid in list(self.remote):
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                del self.remote[pid]
+        return self.in_flight + sum(self.remote.values())
+
+    def idle_for(self) -> float:
+        """Seconds without generations for users, infinite if there was none yet"""
+
+        if self.running() > 0:
+            return 0
+        return float("inf") if self.last_done is None else time.monotonic() - self.last_done
+
+    async def arrival(self) -> None:
+        """Returns once the next generation for a user starts"""
+
+        await self._arrived.wait()
+
 
+traffic = Traffic(announce=runtime_config.pregen_daily > 0)
+
+
+class GenerationOutcome(BaseModel):
+    """Filled in while generating, read once the stream is over"""
+
+    complete: Optional[GenerationResponseComplete] = None
+    # reasoning block of thinking models, kept apart from the answer
+    reasoning_parts: List[str] = []
+    # chars of answer yielded, and whether they were cut at the max length
+    answer_len: int = 0
+    cut_short: bool = False
+    # stream lines that failed to parse, their text is missing from the answer
+    skipped: int = 0
+
+    def skip(self, line: str) -> None:
+        self.skipped += 1
+
+    @property
+    def context(self) -> Optional[List[int]]:
+        """Tokens to continue the conversation from"""
+        return None if self.complete is None else self.complete.context
+
+    @property
+    def model(self) -> Optional[str]:
+        """Model that answered"""
+        return None if self.complete is None else self.complete.model
+
+    @property
+    def reasoning(self) -> Optional[str]:
+        """Reasoning text, none for models that do not think aloud"""
+        reasoning = "".join(self.reasoning_parts).strip()
+        return reasoning if reasoning != "" else None
+
+    @property
+    def status(self) -> str:
+        """
+        COMPLETE when the model stopped on its own, TRUNCATED when cut at a length limit,
+        ERRORED when there is no answer, the stream lost lines, or ended without its final stats
+        """
+        if self.skipped > 0:
+            return ERRORED
+        if self.cut_short or (self.complete is not None and self.complete.done_reason == "length"):
+            return TRUNCATED if self.answer_len > 0 else ERRORED
+        if self.complete is None or self.answer_len == 0:
+            return ERRORED
+        return COMPLETE if self.complete.done_reason == "stop" else ERRORED
+
+
+async def generate(
+        query: str,
+        context: Optional[List[int]] = None,
+        outcome: Optional[GenerationOutcome] = None,
+        model: Optional[str] = None,
+        background: bool = False,
+) -> AsyncGenerator[str, None]:
+    """
+    Generates response to user query, yields the answer only,
+    the reasoning block of thinking models goes to outcome
+
+    :param query: user query
+    :param context: of the previous turn, when following up
+    :param outcome: receives final stats and context of this turn
+    :param model: pinned model, context only makes sense to the model that produced it,
+        chosen by the cascade when not given
+    :param background: ahead of demand, neither counted as traffic nor routed by the cascade
+    :raises OllamaUnavailable: if ollama fails, times out, or keeps failing
+    :raises httpx.HTTPError: if the request fails
+    """
+
+    if model is None:
+        routed = cascade is not None and context is None and not background
+        model = cascade.choose(query) if routed else runtime_config.model_name
+    # answer chars, and reasoning chars kept, the model may think on past the latter
     max_acc_len: int = 10000
+    max_reasoning_len: int = 100000
     acc_len: int = 0
-    async for part in ollama.generate(query):
-        if part is None:
-            logger.warning("error occurred while generating response for '%s'", query)
-            continue
-
-        if part is ValueError:
-            logger.error("error occurred while generating response for '%s', %s", query, part)
-            continue
-
-        if hasattr(part, "response"):
-            acc_len += len(part.response)
-            yield part.response
-
-        if acc_len >= max_acc_len:
-            logger.info("response reached max len for query '%s'", query)
-            return
+    reasoning_len: int = 0
+    splitter = ThinkSplitter()
+    with contextlib.ExitStack() as tracking:
+        # shutdown waits for it, whichever route started it
+        tracking.enter_context(lifecycle.generating())
+        if not background:
+            tracking.enter_context(traffic.track())
+            if cascade is not None:
+                tracking.enter_context(cascade.track(model))
+        # closed as soon as the answer is cut short rather than once collected, its client holds a connection
+        async with contextlib.aclosing(ollama.generate(
+            query, context=context, model=model, on_skip=None if outcome is None else outcome.skip,
+        )) as upstream:
+            async for part in upstream:
+                if isinstance(part, GenerationResponseComplete):
+                    keep_alive.stats.record(part.load_duration)
+                    if cascade is not None:
+                        cascade.record(part)
+                    if outcome is not None:
+                        outcome.complete = part
+
+                reasoning, answer = splitter.feed(part.response)
+                if isinstance(part, GenerationResponseComplete):
+                    rest_reasoning, rest_answer = splitter.close()
+                    reasoning, answer = reasoning + rest_reasoning, answer + rest_answer
+                if reasoning != "" and outcome is not None and reasoning_len < max_reasoning_len:
+                    outcome.reasoning_parts.append(reasoning[:max_reasoning_len - reasoning_len])
+                reasoning_len += len(reasoning)
+                if answer == "":
+                    continue
+
+                acc_len += len(answer)
+                if outcome is not None:
+                    outcome.answer_len = acc_len
+                yield answer
+
+                if acc_len >= max_acc_len:
+                    logger.info("response reached max len for query '%s'", query)
+                    if outcome is not None:
+                        outcome.cut_short = True
+                    return
@@ -0,0 +1,108 @@
+"""
+Readiness of this worker. Once draining, new generations are refused while running ones
+get until the deadline to finish and store their answer, the rest is cancelled.
+"""
+import asyncio
+import contextlib
+import logging
+import time
+from logging import Logger
+from typing import Dict, Iterator, List, Optional
+
+from fastapi import HTTPException, status
+
+import src.api.streams as streams
+
+logger: Logger = logging.getLogger(__name__)
+
+STARTING: str = "starting"
+READY: str = "ready"
+DRAINING: str = "draining"
+
+state: str = STARTING
+_deadline: Optional[float] = None
+
+# tasks running generations, with how many they run, streamed ones and the ones of /api/v1 and /batch alike
+_generating: Dict[asyncio.Task, int] = {}
+
+
+def ready() -> None:
+    global state
+    if state == STARTING:
+        state = READY
+
+
+@contextlib.contextmanager
+def generating() -> Iterator[None]:
+    """Counts the current task as running a generation while inside, drain waits for it"""
+
+    task = asyncio.current_task()
+    _generating[task] = _generating.get(task, 0) + 1
+    try:
+        yield
+    finally:
+        _generating[task] -= 1
+        if _generating[task] == 0:
+            del _generating[task]
+
+
+def running() -> List[asyncio.Task]:
+    """Tasks running generations, or streaming ones that still have to store their answer"""
+
+    tasks = streams.running() + [task for task in _generating if not task.done()]
+    return list(dict.fromkeys(tasks))
+
+
+def begin_drain(timeout: float) -> None:
+    """Stops taking generations, running ones have timeout seconds left, later calls change nothing"""
+
+    global state, _deadline
+    if state == DRAINING:
+        return
+    state = DRAINING
+    _deadline = time.monotonic() + timeout
+    logger.info("draining, %d generations running, %.0fs to finish", len(running()), timeout)
+
+
+def remaining() -> float:
+    """Seconds left until the drain deadline"""
+
+    return 0 if _deadline is None else max(0.0, _deadline - time.monotonic())
+
+
+def check_accepting() -> None:
+    """
+    Call before starting a generation
+
+    :raises HTTPException: 503 while draining, other workers or the next deploy take it
+    """
+
+    if state == DRAINING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is shutting down",
+            headers={"Retry-After": "5", "Connection": "close"},
+        )
+
+
+async def wait_running() -> int:
+    """Waits for running generations until the deadline, returns how many are still running"""
+
+    tasks = running()
+    if len(tasks) == 0:
+        return 0
+    _, pending = await asyncio.wait(tasks, timeout=remaining())
+    return len(pending)
+
+
+async def drain() -> int:
+    """Waits for running generations until the deadline, cancels the rest and returns their count"""
+
+    await wait_running()
+    pending = running()
+    for task in pending:
+        task.cancel()
+    if len(pending) > 0:
+        logger.warning("cancelled %d generations at the drain deadline", len(pending))
+        await asyncio.gather(*pending, return_exceptions=True)
+    return len(pending)
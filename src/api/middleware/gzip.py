@@ -0,0 +1,83 @@
+"""Gzip of dynamic responses sent in one piece, streamed responses pass untouched"""
+import gzip
+import logging
+from typing import Awaitable, Callable, Optional
+
+from src.api.static import accepts_gzip
+
+logger = logging.getLogger(__name__)
+
+# streams are flushed chunk by chunk, compressing them would hold tokens back
+STREAMING_TYPES: tuple[bytes, ...] = (b"text/event-stream", b"application/x-ndjson")
+COMPRESSIBLE_TYPES: tuple[bytes, ...] = (
+    b"text/", b"application/json", b"application/javascript", b"application/xml", b"image/svg+xml",
+)
+
+
+def compressible(headers: list) -> bool:
+    """Textual, not encoded yet, and not a stream"""
+
+    content_type = b""
+    for name, value in headers:
+        if name == b"content-encoding":
+            return False
+        if name == b"content-type":
+            content_type = value.lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES) and not content_type.startswith(STREAMING_TYPES)
+
+
+class GZipMiddleware:
+    """
+    Compresses 200 responses of at least min_size bytes for clients accepting gzip.
+    Only bodies sent as a single message are compressed, a first message announcing more body
+    means a stream, which is passed on as it comes.
+    Strong ETags become weak, the compressed bytes differ but the representation is the same.
+    """
+
+    def __init__(self, app: Callable[..., Awaitable[None]], min_size: int = 1024, level: int = 6) -> None:
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        accept_encoding = next((value for name, value in scope["headers"] if name == b"accept-encoding"), None)
+        if accept_encoding is None or not accepts_gzip(accept_encoding.decode("latin-1")):
+            return await self.app(scope, receive, send)
+
+        start: Optional[dict] = None
+        passing = False
+
+        async def send_compressed(message: dict) -> None:
+            nonlocal start, passing
+            if passing:
+                return await send(message)
+            if message["type"] == "http.response.start":
+                if message["status"] != 200 or not compressible(message.get("headers", [])):
+                    passing = True
+                    return await send(message)
+                # held until the body shows whether it is worth it
+                start = message
+                return
+            body = message.get("body", b"")
+            passing = True
+            if message.get("more_body", False) or len(body) < self.min_size:
+                await send(start)
+                return await send(message)
+
+            packed = gzip.compress(body, compresslevel=self.level)
+            headers = [(name, value) for name, value in start.get("headers", []) if name != b"content-length"]
+            headers = [
+                (name, b"W/" + value if name == b"etag" and value.startswith(b'"') else value)
+                for name, value in headers
+            ]
+            headers.extend((
+                (b"content-encoding", b"gzip"),
+                (b"content-length", str(len(packed)).encode()),
+                (b"vary", b"Accept-Encoding"),
+            ))
+            await send({**start, "headers": headers})
+            await send({**message, "body": packed})
+
+        await self.app(scope, receive, send_compressed)
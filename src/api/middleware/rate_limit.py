@@ -0,0 +1,197 @@
+"""Per-client rate limiting, with separate budgets for answers served from history and generations"""
+import collections
+import logging
+import math
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+
+logger = logging.getLogger(__name__)
+
+HITS: int = 0
+MISSES: int = 1
+
+Headers = List[Tuple[bytes, bytes]]
+
+
+class Budget:
+    """Token bucket parameters, burst tokens refilled at per_minute"""
+
+    __slots__ = ("burst", "rate", "limit_header", "policy_header")
+
+    def __init__(self, per_minute: float, burst: int) -> None:
+        self.burst = burst
+        # tokens per second
+        self.rate = per_minute / 60
+        # same for every response
+        self.limit_header = (b"ratelimit-limit", str(burst).encode())
+        self.policy_header = (b"ratelimit-policy", f"{burst};w={math.ceil(burst / self.rate)}".encode())
+
+    def refill_time(self, tokens: float) -> float:
+        """Seconds until the bucket holds tokens"""
+
+        return 0 if tokens <= 0 else tokens / self.rate
+
+
+class Client:
+    """Both buckets of a client, refilled lazily on access"""
+
+    __slots__ = ("tokens", "updated", "charged")
+
+    def __init__(self, budgets: Tuple[Budget, Budget], now: float) -> None:
+        self.tokens: List[float] = [float(budgets[HITS].burst), float(budgets[MISSES].burst)]
+        self.updated = now
+        # budget reported in headers, the last one charged
+        self.charged = HITS
+
+
+class RateLimiter:
+    """
+    Token buckets by client key, at most max_clients of them, least recently seen evicted first.
+    Clients idle long enough to have refilled both buckets are dropped, which changes nothing for them.
+    """
+
+    def __init__(self, hits: Budget, misses: Budget, max_clients: int) -> None:
+        self.budgets = (hits, misses)
+        self.max_clients = max_clients
+        self.idle = max(hits.refill_time(hits.burst), misses.refill_time(misses.burst))
+        self.clients: collections.OrderedDict[str, Client] = collections.OrderedDict()
+
+    def client(self, key: str, now: float) -> Client:
+        client = self.clients.get(key)
+        if client is None:
+            client = self.clients[key] = Client(self.budgets, now)
+        else:
+            self.clients.move_to_end(key)
+            elapsed = now - client.updated
+            client.updated = now
+            for kind, budget in enumerate(self.budgets):
+                client.tokens[kind] = min(budget.burst, client.tokens[kind] + elapsed * budget.rate)
+        # one eviction per access keeps it bounded without scanning
+        oldest_key, oldest = next(iter(self.clients.items()))
+        if len(self.clients) > self.max_clients or now - oldest.updated > self.idle:
+            if oldest is not client:
+                del self.clients[oldest_key]
+        return client
+
+    def take(self, client: Client, kind: int, wanted: int = 1) -> int:
+        """Takes up to wanted tokens, returns how many were available"""
+
+        client.charged = kind
+        granted = min(wanted, int(client.tokens[kind]))
+        client.tokens[kind] -= granted
+        return granted
+
+    def retry_after(self, client: Client, kind: int) -> int:
+        return math.ceil(self.budgets[kind].refill_time(1 - client.tokens[kind]))
+
+    def headers(self, client: Client) -> Headers:
+        """RateLimit-* of the budget charged last"""
+
+        budget = self.budgets[client.charged]
+        tokens = client.tokens[client.charged]
+        return [
+            budget.limit_header,
+            (b"ratelimit-remaining", b"%d" % tokens),
+            (b"ratelimit-reset", b"%d" % math.ceil(budget.refill_time(budget.burst - tokens))),
+            budget.policy_header,
+        ]
+
+
+class RateLimitMiddleware:
+    """
+    Charges the hit budget of the client for every request to paths,
+    handlers charge the miss budget once they have to generate.
+    Client is the peer address, as rewritten from forwarded headers by uvicorn,
+    or the value of key_header when set.
+    """
+
+    def __init__(
+            self,
+            app: Callable[..., Awaitable[None]],
+            limiter: RateLimiter,
+            paths: Tuple[str, ...],
+            key_header: Optional[str] = None,
+    ) -> None:
+        self.app = app
+        self.limiter = limiter
+        self.paths = frozenset(paths)
+        self.key_header = None if not key_header else key_header.lower().encode("latin-1")
+
+    def key(self, scope: dict) -> str:
+        if self.key_header is not None:
+            for name, value in scope["headers"]:
+                if name == self.key_header:
+                    return value.decode("latin-1")
+        client = scope.get("client")
+        return "" if client is None else client[0]
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+
+        limiter = self.limiter
+        key = self.key(scope)
+        client = limiter.client(key, time.monotonic())
+        if limiter.take(client, HITS) == 0:
+            retry_after = limiter.retry_after(client, HITS)
+            await send({
+                "type": "http.response.start",
+                "status": status.HTTP_429_TOO_MANY_REQUESTS,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"retry-after", str(retry_after).encode()),
+                    *limiter.headers(client),
+                ],
+            })
+            await send({"type": "http.response.body", "body": b'{"detail":"Too many requests"}'})
+            return
+
+        state = scope.setdefault("state", {})
+        state["rate_limit"] = (limiter, client)
+        state["client_key"] = key
+
+        async def send_with_headers(message: dict) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *limiter.headers(client)]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+def client_key(request: Request) -> str:
+    """Client as rate limits tell them apart, the peer address while they are off"""
+
+    key = getattr(request.state, "client_key", None)
+    if key is not None:
+        return key
+    return "" if request.client is None else request.client.host
+
+
+def charge_misses(request: Request, wanted: int) -> int:
+    """Takes generations from the client's miss budget, returns how many it may run"""
+
+    charged = getattr(request.state, "rate_limit", None)
+    if charged is None:
+        return wanted
+    # refilled when the request came in, moments ago
+    limiter, client = charged
+    return limiter.take(client, MISSES, wanted)
+
+
+def charge_miss(request: Request) -> None:
+    """
+    Takes one generation from the client's miss budget
+
+    :raises HTTPException: 429 when it is spent
+    """
+
+    if charge_misses(request, 1) == 1:
+        return
+    limiter, client = request.state.rate_limit
+    raise HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many generations, try again later",
+        headers={"Retry-After": str(limiter.retry_after(client, MISSES))},
+    )
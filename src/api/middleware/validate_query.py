@@ -1,7 +1,7 @@
 """Middleware that validates the input query"""
 
 import logging
-from typing import Generator
+from typing import Generator, Optional
 from fastapi import Form, HTTPException, status
 from pydantic import ValidationError
 
@@ -10,11 +10,20 @@ from src.schemas.gen_req import GenerationRequest
 logger = logging.getLogger(__name__)
 
 
-def validate_query(query_text: str = Form(...)) -> Generator[GenerationRequest, None, None]:
-    """Assigns query text to an object with validation error handling"""
+def validate_query(
+        query_text: str = Form(...),
+        parent_id: Optional[str] = Form(None),
+) -> Generator[GenerationRequest, None, None]:
+    """
+    Assigns query text to an object with validation error handling,
+    empty parent_id comes from the form when not following up
+    """
 
     try:
-        yield GenerationRequest(query=query_text)
+        yield GenerationRequest(
+            query=query_text,
+            parent_id=int(parent_id) if parent_id else None,
+        )
     except (ValueError, ValidationError) as e:
         logger.error("Query validation failed, %s", e)
         raise HTTPException(
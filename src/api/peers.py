@@ -0,0 +1,120 @@
+"""
+Workers forked by launcher.py share one listening socket, so the events of a generation may be
+asked of a worker other than the one running it. Generation ids carry the slot of their worker,
+each worker also listens on a unix socket of its own, and the others relay events from there.
+The first worker pre-generates while the model is idle, the others announce their generations
+for users to it by datagram, so it yields to them at once.
+"""
+import asyncio
+import logging
+import os
+import socket
+from logging import Logger
+from typing import AsyncGenerator, Callable, Optional
+
+import httpx
+
+logger: Logger = logging.getLogger(__name__)
+
+# of this worker, None when serving alone
+slot: Optional[int] = None
+directory: Optional[str] = None
+_announcer: Optional[socket.socket] = None
+
+
+def configure(worker_slot: int, socket_dir: str) -> None:
+    global slot, directory
+    slot = worker_slot
+    directory = socket_dir
+
+
+def socket_path(worker_slot: int) -> str:
+    return f"{directory}/worker-{worker_slot}.sock"
+
+
+def prefix() -> str:
+    """Starts ids of generations run here"""
+
+    return "" if slot is None else f"{slot}."
+
+
+def owner(generation_id: str) -> Optional[int]:
+    """Slot of the other worker running the generation, None if it is not another worker's"""
+
+    head, dot, _ = generation_id.partition(".")
+    if slot is None or dot == "" or not head.isdigit() or int(head) == slot:
+        return None
+    return int(head)
+
+
+async def relay(worker_slot: int, path: str, last_event_id: int) -> Optional[AsyncGenerator[bytes, None]]:
+    """Event stream of path as served by another worker, None if it has no such generation or is gone"""
+
+    client = httpx.AsyncClient(
+        transport=httpx.AsyncHTTPTransport(uds=socket_path(worker_slot)),
+        # events stream as long as the generation runs
+        timeout=httpx.Timeout(5, read=None),
+    )
+    request = client.build_request("GET", f"http://worker{path}", headers={"Last-Event-ID": str(last_event_id)})
+    try:
+        response = await client.send(request, stream=True)
+    except httpx.HTTPError as e:
+        logger.warning("worker %d unreachable for %s, %s", worker_slot, path, e)
+        await client.aclose()
+        return None
+    if response.status_code != 200:
+        await response.aclose()
+        await client.aclose()
+        return None
+
+    async def chunks() -> AsyncGenerator[bytes, None]:
+        try:
+            async for chunk in response.aiter_raw():
+                yield chunk
+        finally:
+            await response.aclose()
+            await client.aclose()
+
+    return chunks()
+
+
+def traffic_path() -> str:
+    return f"{directory}/traffic.sock"
+
+
+def announce(running: int) -> None:
+    """
+    Tells the first worker how many generations for users run here, after each start and end.
+    Counts rather than changes, so one that is lost is made up for by the next.
+    """
+
+    global _announcer
+    if slot is None or slot == 0:
+        return
+    if _announcer is None:
+        _announcer = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        _announcer.setblocking(False)
+    try:
+        _announcer.sendto(f"{os.getpid()} {running}".encode(), traffic_path())
+    except OSError as e:
+        # first worker not listening, being replaced, or behind on reading
+        logger.debug("traffic announcement dropped, %s", e)
+
+
+async def listen_traffic(on_announce: Callable[[int, int], None]) -> None:
+    """Passes pid and running count of announcements of the other workers on, runs until cancelled"""
+
+    path = traffic_path()
+    if os.path.exists(path):
+        # left by the worker this one replaces
+        os.unlink(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    sock.bind(path)
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            pid, running = (await loop.sock_recv(sock, 64)).split()
+            on_announce(int(pid), int(running))
+    finally:
+        sock.close()
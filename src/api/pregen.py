@@ -0,0 +1,233 @@
+"""
+Answers generated ahead of demand while the model sits idle. Candidates are queries users were
+refused for lack of capacity, once several clients asked them, the ones asked most lately first,
+then follow ups asked in many conversations, predicted for answers served lately. One generation runs at a time, once no
+generation for a user ran for PREGEN_IDLE seconds, and it is cancelled as soon as one starts.
+At most PREGEN_DAILY a day. With several workers only the first one pre-generates,
+the others announce their generations to it, see peers.
+"""
+import asyncio
+import collections
+import datetime
+import logging
+import time
+from dataclasses import dataclass, field
+from logging import Logger
+from typing import Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+import src.api.answers as answers
+import src.api.conversation as conversation
+import src.api.failures as failures
+import src.api.generate as llm_api_generate
+import src.api.lifecycle as lifecycle
+import src.api.semantic_cache as semantic_cache
+import src.db.database as db
+from src.db import generation_record
+from src.utils.env_config import read_env, EnvConfig
+
+runtime_config: EnvConfig = read_env()
+logger: Logger = logging.getLogger(__name__)
+
+# seconds after which the score of a refused query halves, unless asked again
+HALF_LIFE: float = 6 * 3600
+# refused queries tracked at most, least recently asked are forgotten
+MAX_DEMAND: int = 1000
+# clients a refused query has to be asked by, a single one can not spend the budget on its own prompts,
+# and refused queries one client adds at most, so it can not push out the ones others asked
+MIN_CLIENTS: int = 2
+MAX_PER_CLIENT: int = 20
+# follow ups mined from this far back, and how many of them are predicted for how many answers
+FOLLOW_UP_WINDOW: datetime.timedelta = datetime.timedelta(days=7)
+PREDICTED_FOLLOW_UPS: int = 3
+PREDICTED_PARENTS: int = 5
+
+
+@dataclass
+class Demand:
+    query: str
+    parent_id: Optional[int]
+    # client that added it, and all that asked, each counts once
+    added_by: str
+    clients: Set[str] = field(default_factory=set)
+    score: float = 0
+    # monotonic time last asked by a new client
+    seen: float = 0
+
+    def decayed(self, now: float) -> float:
+        return self.score * 0.5 ** ((now - self.seen) / HALF_LIFE)
+
+
+demand: collections.OrderedDict[str, Demand] = collections.OrderedDict()
+# refused queries in demand by the client that added them
+added: collections.Counter[str] = collections.Counter()
+# local day the budget is counted for, and generations started on it
+_day: Optional[datetime.date] = None
+spent: int = 0
+
+
+def note(query: str, client: str, parent_id: Optional[int] = None, now: Optional[float] = None) -> None:
+    """Counts a query refused to client for lack of capacity, it is worth answering once there is some"""
+
+    if runtime_config.pregen_daily == 0:
+        return
+    now = time.monotonic() if now is None else now
+    key = conversation.cache_key(query, parent_id)
+    wanted = demand.pop(key, None)
+    if wanted is None:
+        if added[client] >= MAX_PER_CLIENT:
+            return
+        added[client] += 1
+        wanted = Demand(query=query, parent_id=parent_id, added_by=client)
+    if client not in wanted.clients:
+        wanted.clients.add(client)
+        wanted.score = wanted.decayed(now) + 1
+        wanted.seen = now
+    demand[key] = wanted
+    while len(demand) > MAX_DEMAND:
+        forget(next(iter(demand)))
+
+
+def forget(key: str) -> None:
+    wanted = demand.pop(key, None)
+    if wanted is None:
+        return
+    added[wanted.added_by] -= 1
+    if added[wanted.added_by] <= 0:
+        del added[wanted.added_by]
+
+
+def rising(now: Optional[float] = None) -> List[Tuple[str, Optional[int]]]:
+    """
+    Refused queries asked by enough clients, most asked lately first,
+    leaving out ones backing off after failures
+    """
+
+    now = time.monotonic() if now is None else now
+    ranked = sorted(demand.items(), key=lambda item: item[1].decayed(now), reverse=True)
+    return [
+        (wanted.query, wanted.parent_id)
+        for key, wanted in ranked
+        if len(wanted.clients) >= MIN_CLIENTS and failures.remaining(key) == 0
+    ]
+
+
+def predicted(db_session: Session) -> List[Tuple[str, Optional[int]]]:
+    """Follow ups common across conversations, for answers served lately"""
+
+    since = generation_record.utcnow() - FOLLOW_UP_WINDOW
+    follow_ups = generation_record.recurring_follow_ups(db_session, since, PREDICTED_FOLLOW_UPS)
+    if len(follow_ups) == 0:
+        return []
+    return [
+        (follow_up, parent.id)
+        for parent in generation_record.recently_served(db_session, PREDICTED_PARENTS)
+        for follow_up in follow_ups
+        if failures.remaining(conversation.cache_key(follow_up, parent.id)) == 0
+    ]
+
+
+def candidates(db_session: Session) -> Iterator[Tuple[str, Optional[int]]]:
+    yield from rising()
+    yield from predicted(db_session)
+
+
+def pick(db_session: Session) -> Optional[Tuple[str, Optional[int]]]:
+    """Best candidate without a stored answer, refused queries answered meanwhile are forgotten"""
+
+    for query, parent_id in candidates(db_session):
+        if generation_record.find_query_log(db_session, query, parent_id=parent_id) is None:
+            return query, parent_id
+        forget(conversation.cache_key(query, parent_id))
+    return None
+
+
+def quiet(db_session: Session) -> bool:
+    """No generation for a user ran for the idle time, nor was one stored before a restart of this worker"""
+
+    idle = runtime_config.pregen_idle
+    if lifecycle.state != lifecycle.READY or llm_api_generate.traffic.idle_for() < idle:
+        return False
+    latest = generation_record.latest_demand(db_session)
+    return latest is None or (generation_record.utcnow() - latest).total_seconds() >= idle
+
+
+def left(db_session: Session, today: datetime.date) -> int:
+    """Generations left of today's budget, counted from the stored ones after a restart"""
+
+    global _day, spent
+    if _day != today:
+        midnight = datetime.datetime.combine(today, datetime.time()).astimezone(datetime.UTC).replace(tzinfo=None)
+        _day, spent = today, generation_record.count_pregenerated(db_session, midnight)
+    return runtime_config.pregen_daily - spent
+
+
+async def collect(found: answers.Lookup, context: Optional[List[int]], outcome: llm_api_generate.GenerationOutcome) -> str:
+    parts = llm_api_generate.generate(found.query, context=context, outcome=outcome, model=found.model, background=True)
+    return "".join([part async for part in parts])
+
+
+async def step() -> Optional[int]:
+    """
+    Pre-generates one answer if the model is idle and budget is left,
+    returns its record id, None if there was nothing to do or traffic came first
+
+    :raises UnusableAnswer: if the generation errored
+    :raises OllamaUnavailable: if ollama fails, times out, or keeps failing
+    :raises httpx.HTTPError: if the request fails
+    """
+
+    global spent
+    with db.SessionLocal() as session:
+        if not quiet(session) or left(session, datetime.date.today()) <= 0:
+            return None
+        picked = pick(session)
+        if picked is None:
+            return None
+        query, parent_id = picked
+        parent = None if parent_id is None else generation_record.get_query_log(session, parent_id)
+        if parent_id is not None and parent is None:
+            forget(conversation.cache_key(query, parent_id))
+            return None
+        found = answers.Lookup(query, parent)
+        # deferred, loaded while the session is open
+        context = found.context
+    if parent is None:
+        found.vector = await semantic_cache.embed(query)
+    if llm_api_generate.traffic.running() > 0:
+        return None
+
+    logger.info("pre-generating '%s', %d left today", found.cache_key, runtime_config.pregen_daily - spent)
+    outcome = llm_api_generate.GenerationOutcome()
+    generating = asyncio.create_task(collect(found, context, outcome))
+    arrival = asyncio.create_task(llm_api_generate.traffic.arrival())
+    try:
+        await asyncio.wait((generating, arrival), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        arrival.cancel()
+        generating.cancel()
+    if not generating.done():
+        await asyncio.wait((generating,))
+    if generating.cancelled():
+        logger.info("pre-generation of '%s' yields to traffic", found.cache_key)
+        return None
+
+    spent += 1
+    response_text = generating.result()
+    with db.SessionLocal() as session:
+        record = await answers.store(session, found, response_text, outcome, pregenerated=True)
+    forget(found.cache_key)
+    return record.id
+
+
+async def run(interval: float = 30) -> None:
+    """Pre-generates while idle and within budget, checking every interval seconds. Runs until cancelled."""
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            while await step() is not None:
+                pass
+        except Exception as e:
+            logger.warning("pre-generation failed, %s", e)
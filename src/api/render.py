@@ -0,0 +1,111 @@
+"""Renders html pages and fragments, caching the output"""
+import datetime
+import logging
+from logging import Logger
+from typing import List, Optional, Tuple
+
+from fastapi.templating import Jinja2Templates
+from markupsafe import Markup, escape
+from sqlalchemy import Row
+
+from src.db.generation_record import GenerationRecord, MATCH_START, MATCH_END
+from src.utils.lru_cache import LRUCache
+
+logger: Logger = logging.getLogger(__name__)
+
+
+def highlight(snippet: Optional[str]) -> Markup:
+    """Escapes search snippet, then marks matched terms"""
+
+    if snippet is None:
+        return Markup("")
+    return Markup(str(escape(snippet)).replace(MATCH_START, "<mark>").replace(MATCH_END, "</mark>"))
+
+
+templates = Jinja2Templates(directory="src/template")
+templates.env.filters["highlight"] = highlight
+
+# rendered log_entry fragments, by record id and creation time
+fragment_cache = LRUCache(size=512)
+# rendered home page along with the newest record id at the time, dropped on every new record
+home_cache: Optional[Tuple[Optional[int], bytes]] = None
+
+
+def entry_key(record_id: int, created_at: Optional[datetime.datetime], clickable: bool) -> str:
+    """
+    Identifies rendered fragment. Record content does not change once written,
+    while `updated_at` only tracks last access, so it is left out.
+    """
+
+    stamp = created_at.isoformat() if created_at is not None else ""
+    return f"{record_id}:{stamp}:{clickable}"
+
+
+def cached_entry(
+        record_id: int,
+        created_at: Optional[datetime.datetime],
+        clickable: bool,
+) -> Optional[bytes]:
+    """Previously rendered fragment, without loading the record"""
+
+    return fragment_cache.get(entry_key(record_id, created_at, clickable))
+
+
+def render_entry(record: GenerationRecord) -> bytes:
+    """Renders log entry fragment, reusing previous output for the same record"""
+
+    key = entry_key(record.id, record.created_at, record.clickable)
+    content: Optional[bytes] = fragment_cache.get(key)
+    if content is not None:
+        return content
+
+    logger.debug("rendering log entry %s", key)
+    content = templates.get_template("log_entry.html").render(entry=record).encode("utf-8")
+    fragment_cache.put(key, content)
+    return content
+
+
+def render_generation(generation_id: str, query: str) -> bytes:
+    """Renders placeholder entry that follows a running generation, these are not cached"""
+
+    return templates.get_template("generation.html").render(generation_id=generation_id, query=query).encode("utf-8")
+
+
+def render_reasoning(reasoning: str) -> bytes:
+    """Renders reasoning block of a record, these are not cached"""
+
+    return templates.get_template("reasoning.html").render(reasoning=reasoning).encode("utf-8")
+
+
+def render_search(search: str, hits: List[Row]) -> bytes:
+    """Renders search results, these are not cached"""
+
+    return templates.get_template("search_results.html").render(search=search, hits=hits).encode("utf-8")
+
+
+def cached_home(latest_id: Optional[int] = None) -> Optional[bytes]:
+    """
+    Home page rendered since the last write, if any.
+    Writes of other workers do not invalidate it here, a latest_id other than the one rendered at does.
+    """
+
+    if home_cache is None or (latest_id is not None and home_cache[0] != latest_id):
+        return None
+    return home_cache[1]
+
+
+def render_home(logs: List[GenerationRecord], latest_id: Optional[int] = None) -> bytes:
+    """Renders home page and keeps it until invalidated"""
+
+    global home_cache
+    logger.debug("rendering home with %d entries", len(logs))
+    content = templates.get_template("home.html").render(logs=logs).encode("utf-8")
+    home_cache = (latest_id, content)
+    return content
+
+
+def invalidate_home() -> None:
+    """Drops rendered home page, call after new records are committed"""
+
+    global home_cache
+    home_cache = None
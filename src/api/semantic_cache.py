@@ -0,0 +1,68 @@
+"""Near-duplicate answer lookup, by embedding similarity of queries"""
+import logging
+from logging import Logger
+from typing import List, Optional
+
+import httpx
+
+from src.utils.env_config import read_env, EnvConfig
+
+runtime_config: EnvConfig = read_env()
+logger: Logger = logging.getLogger(__name__)
+
+# candidates checked, in case best ones are no longer stored
+TOP_K: int = 3
+
+# numpy comes with the index and embeddings, only imported when the cache is on
+index: Optional["VectorIndex"] = None
+if runtime_config.semantic_threshold > 0:
+    from src.llm import embedding
+    from src.utils.vector_index import VectorIndex
+    index = VectorIndex(runtime_config.semantic_index)
+
+
+def enabled() -> bool:
+    return index is not None
+
+
+async def embed(query: str) -> Optional[List[float]]:
+    """Query embedding, None if semantic cache is off or embedding failed"""
+
+    if index is None:
+        return None
+    try:
+        return await embedding.embed(query)
+    except (httpx.HTTPError, ValueError) as e:
+        logger.error("failed to embed query '%s', %s", query, e)
+        return None
+
+
+def nearest(vector: Optional[List[float]]) -> List[int]:
+    """Ids of records with similar queries, most similar first"""
+
+    if index is None or vector is None:
+        return []
+    try:
+        # other workers append to the same files
+        with index.locked():
+            index.refresh()
+        [matches] = index.search([vector], k=TOP_K)
+    except ValueError as e:
+        logger.error("semantic search failed, %s", e)
+        return []
+    logger.debug("semantic candidates %s", matches)
+    return [record_id for record_id, score in matches if score >= runtime_config.semantic_threshold]
+
+
+def add(record_id: int, vector: Optional[List[float]]) -> None:
+    """Makes record findable by similar queries"""
+
+    if index is None or vector is None:
+        return
+    try:
+        with index.locked():
+            index.refresh()
+            index.add(record_id, vector)
+            index.flush()
+    except ValueError as e:
+        logger.error("failed to index record %d, %s", record_id, e)
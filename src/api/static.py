@@ -0,0 +1,88 @@
+"""
+Vendored frontend assets. File names carry the library version, so responses never change
+and are cached for a year. Gzip variants are written at build time, `python -m src.api.static`,
+or when launcher.py starts, and sent as they are to clients accepting them.
+"""
+import gzip
+import logging
+import mimetypes
+import os
+import sys
+from logging import Logger
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException, status
+from fastapi.responses import FileResponse
+
+logger: Logger = logging.getLogger(__name__)
+
+STATIC_DIR: str = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+IMMUTABLE_CACHE_CONTROL: str = "public, max-age=31536000, immutable"
+# binary formats are compressed already
+COMPRESSIBLE: tuple[str, ...] = (".js", ".css", ".svg", ".html", ".json", ".txt")
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """Whether gzip is acceptable by Accept-Encoding, see RFC 9110 section 12.5.3"""
+
+    if not accept_encoding:
+        return False
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        if coding.strip().lower() not in ("gzip", "*"):
+            continue
+        quality = params.strip().removeprefix("q=").strip()
+        try:
+            return quality == "" or float(quality) > 0
+        except ValueError:
+            return False
+    return False
+
+
+def static_response(name: str, accept_encoding: Optional[str], directory: str = STATIC_DIR) -> FileResponse:
+    """
+    Asset under directory, its gzip variant when there is one and the client accepts it
+
+    :raises HTTPException: 404 for unknown names, and names leaving directory
+    """
+
+    path = os.path.realpath(os.path.join(directory, name))
+    if not path.startswith(os.path.realpath(directory) + os.sep) or path.endswith(".gz") or not os.path.isfile(path):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    headers: Dict[str, str] = {"Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if path.endswith(COMPRESSIBLE):
+        headers["Vary"] = "Accept-Encoding"
+        if accepts_gzip(accept_encoding) and os.path.isfile(path + ".gz"):
+            headers["Content-Encoding"] = "gzip"
+            return FileResponse(path + ".gz", media_type=media_type, headers=headers)
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
+def precompress(directory: str = STATIC_DIR) -> List[str]:
+    """Writes .gz next to compressible assets that lack an up-to-date one, returns their paths"""
+
+    written: List[str] = []
+    for root, _, files in os.walk(directory):
+        for file in files:
+            if not file.endswith(COMPRESSIBLE):
+                continue
+            path = os.path.join(root, file)
+            target = path + ".gz"
+            if os.path.isfile(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+                continue
+            with open(path, "rb") as source:
+                data = source.read()
+            # no timestamp in the header, same input gives the same bytes
+            packed = gzip.compress(data, compresslevel=9, mtime=0)
+            with open(target, "wb") as out:
+                out.write(packed)
+            logger.debug("%s, %d -> %d bytes", target, len(data), len(packed))
+            written.append(target)
+    return written
+
+
+if __name__ == "__main__":
+    for written_path in precompress(sys.argv[1] if len(sys.argv) > 1 else STATIC_DIR):
+        print(f"{written_path}\t{os.path.getsize(written_path)} bytes")
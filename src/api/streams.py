@@ -0,0 +1,155 @@
+"""
+Generations running in the background, streamed as server sent events.
+Clients reconnecting with Last-Event-ID resume from the ring of recent chunks,
+while the upstream generation keeps running through short disconnects.
+"""
+import asyncio
+import collections
+import json
+import logging
+import secrets
+import time
+from logging import Logger
+from typing import AsyncGenerator, Coroutine, Deque, Dict, List, Optional, Tuple
+
+logger: Logger = logging.getLogger(__name__)
+
+# comment line sent while waiting, keeps proxies from closing idle streams
+KEEPALIVE: float = 15
+# milliseconds browsers wait before reconnecting
+RETRY_MS: int = 1000
+
+
+def event(data: str, event_id: Optional[int] = None, name: Optional[str] = None) -> bytes:
+    """One server sent event, data is json so newlines in tokens survive"""
+
+    lines = [] if name is None else [f"event: {name}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data)}")
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+class Generation:
+    """Chunks of one generation, the latest ring_size of them can be replayed"""
+
+    def __init__(self, ring_size: int, prefix: str = "") -> None:
+        self.id: str = prefix + secrets.token_urlsafe(12)
+        self.ring: Deque[Tuple[int, str]] = collections.deque(maxlen=ring_size)
+        # whole text so far, it gets stored anyway
+        self.parts: List[str] = []
+        self.seq: int = 0
+        self.record_id: Optional[int] = None
+        self.error: Optional[str] = None
+        self.done: bool = False
+        self.subscribers: int = 0
+        self.idle_since: float = time.monotonic()
+        self.task: Optional[asyncio.Task] = None
+        self._updated = asyncio.Event()
+
+    def text(self) -> str:
+        return "".join(self.parts)
+
+    def _notify(self) -> None:
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    def push(self, chunk: str) -> None:
+        self.parts.append(chunk)
+        if chunk == "":
+            return
+        self.seq += 1
+        self.ring.append((self.seq, chunk))
+        self._notify()
+
+    def finish(self, record_id: int) -> None:
+        self.record_id = record_id
+        self.done = True
+        self._notify()
+
+    def fail(self, error: str) -> None:
+        self.error = error
+        self.done = True
+        self._notify()
+
+    async def events(self, last_event_id: int = 0) -> AsyncGenerator[bytes, None]:
+        """
+        Chunks after last_event_id as they arrive, then done with the stored record id,
+        or failed with the error. Replays the whole text at once if the ring moved past last_event_id.
+        """
+
+        self.subscribers += 1
+        try:
+            yield f"retry: {RETRY_MS}\n\n".encode("utf-8")
+            after = last_event_id
+            while True:
+                if self.ring and after < self.ring[0][0] - 1:
+                    logger.debug("generation %s resumed after %d, past the ring, sending it whole", self.id, after)
+                    after = self.seq
+                    yield event(self.text(), event_id=after, name="snapshot")
+                # copied, the ring moves on while events are sent
+                for seq, chunk in [item for item in self.ring if item[0] > after]:
+                    after = seq
+                    yield event(chunk, event_id=seq)
+                if self.done:
+                    if self.error is None:
+                        yield event(str(self.record_id), name="done")
+                    else:
+                        yield event(self.error, name="failed")
+                    return
+                try:
+                    await asyncio.wait_for(self._updated.wait(), KEEPALIVE)
+                except TimeoutError:
+                    yield b": keepalive\n\n"
+        finally:
+            self.subscribers -= 1
+            self.idle_since = time.monotonic()
+
+
+# active and recently finished generations, by id
+generations: Dict[str, Generation] = {}
+
+
+def get(generation_id: str) -> Optional[Generation]:
+    return generations.get(generation_id)
+
+
+def running() -> List[asyncio.Task]:
+    """Tasks of generations still producing, they store their answer once done"""
+
+    tasks = (generation.task for generation in generations.values())
+    return [task for task in tasks if task is not None and not task.done()]
+
+
+def start(generation: Generation, producer: Coroutine, grace: float) -> None:
+    """
+    Runs producer in the background, it pushes chunks and finishes the generation.
+    Without subscribers for grace seconds, the generation is cancelled.
+    Finished generations stay reachable for grace seconds, for late reconnects.
+    """
+
+    async def run() -> None:
+        try:
+            await producer
+        except asyncio.CancelledError:
+            generation.fail("generation abandoned")
+        except Exception as e:
+            logger.error("generation %s failed, %s", generation.id, e)
+            generation.fail(str(e))
+        finally:
+            loop.call_later(grace, generations.pop, generation.id, None)
+
+    def reap() -> None:
+        if generation.done:
+            return
+        idle = time.monotonic() - generation.idle_since
+        if generation.subscribers == 0 and idle >= grace:
+            logger.info("generation %s has no listeners for %.0fs, cancelling", generation.id, idle)
+            generation.task.cancel()
+            return
+        loop.call_later(grace, reap)
+
+    loop = asyncio.get_running_loop()
+    generations[generation.id] = generation
+    generation.task = loop.create_task(run())
+    loop.call_later(grace, reap)
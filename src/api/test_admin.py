@@ -0,0 +1,38 @@
+from unittest import main, TestCase
+
+from fastapi import HTTPException
+
+from src.api import admin
+from src.db.generation_record import GenerationRecord
+
+
+class TestAdmin(TestCase):
+
+    def setUp(self):
+        self.token = admin.runtime_config.admin_token
+
+    def tearDown(self):
+        admin.runtime_config.admin_token = self.token
+
+    def test_bearer_token(self):
+        admin.runtime_config.admin_token = ""
+        with self.assertRaises(HTTPException) as raised:
+            admin.require_admin("Bearer anything")
+        self.assertEqual(404, raised.exception.status_code)
+
+        admin.runtime_config.admin_token = "s3cret"
+        admin.require_admin("Bearer s3cret")
+        for header in (None, "s3cret", "Bearer wrong", "Basic s3cret"):
+            with self.assertRaises(HTTPException) as raised:
+                admin.require_admin(header)
+            self.assertEqual(401, raised.exception.status_code)
+
+    def test_record_bytes_as_stored(self):
+        record = GenerationRecord(query_text="why is the sky blue?", response_text="rayleigh scattering")
+        self.assertEqual(20 + 19, admin.record_bytes(record))
+        record = GenerationRecord(query_text="tell me a story", response_text="once upon a time " * 100)
+        self.assertEqual(15 + len(record.response_zlib), admin.record_bytes(record))
+
+
+if __name__ == "__main__":
+    main()
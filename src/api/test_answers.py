@@ -0,0 +1,102 @@
+import datetime
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase, main, TestCase
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import src.api.generate as llm_api_generate
+from src.api import answers
+from src.db import generation_record, retention
+from src.db.generation_record import GenerationRecord
+from src.llm.cascade import Cascade
+
+MONTH: datetime.timedelta = datetime.timedelta(days=30)
+
+
+class TestSuperseded(TestCase):
+
+    def setUp(self):
+        self.cascade = llm_api_generate.cascade
+        llm_api_generate.cascade = Cascade("deepseek-r1:1.5b", "qwen2.5:0.5b", max_queue=2, min_tps=0, max_prompt_len=64)
+
+    def tearDown(self):
+        llm_api_generate.cascade = self.cascade
+
+    def test_fallback_answers_only_while_loaded(self):
+        cascade = llm_api_generate.cascade
+        fallback = GenerationRecord(query_text="why is the sky blue?", model=cascade.fallback)
+        main_model = GenerationRecord(query_text="why is the sky blue?", model=cascade.primary)
+        follow_up = GenerationRecord(query_text="and then what?", model=cascade.fallback, parent_id=1)
+        with cascade.track(cascade.primary), cascade.track(cascade.primary):
+            self.assertFalse(answers.superseded(fallback))
+        self.assertTrue(answers.superseded(fallback))
+        self.assertFalse(answers.superseded(main_model))
+        self.assertFalse(answers.superseded(follow_up))
+
+    def test_without_cascade(self):
+        llm_api_generate.cascade = None
+        self.assertFalse(answers.superseded(GenerationRecord(query_text="why is the sky blue?", model="qwen2.5:0.5b")))
+
+
+class TestCacheAccess(IsolatedAsyncioTestCase):
+    """Runs against fully migrated db, retention needs incremental vacuum"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{self.tmp.name}/main.db"
+        alembic_cfg = Config(f"{os.getcwd()}/alembic.ini")
+        alembic_cfg.set_main_option("sqlalchemy.url", url)
+        command.upgrade(alembic_cfg, "head")
+        self.engine = create_engine(url)
+        self.db = sessionmaker(bind=self.engine)()
+        self.archive = f"{self.tmp.name}/archive.db"
+
+    def tearDown(self):
+        answers.query_cache.remove_prefix("")
+        self.db.close()
+        self.engine.dispose()
+        for engine in retention._archive_engines.values():
+            engine.dispose()
+        retention._archive_engines.clear()
+        self.tmp.cleanup()
+
+    def old_record(self, query: str) -> GenerationRecord:
+        record = generation_record.create_query_log(self.db, query, "rayleigh scattering")
+        record.created_at = generation_record.utcnow() - MONTH * 2
+        self.db.commit()
+        answers.query_cache.put(query, record)
+        return record
+
+    async def test_cache_hits_keep_records_from_archive(self):
+        served = self.old_record("why is the sky blue?")
+        unserved_id = self.old_record("what is rust?").id
+        found = await answers.lookup(self.db, "why is the sky blue?")
+        self.assertEqual("cache", found.source)
+        accessed = served.updated_at
+        self.assertIsNotNone(accessed)
+        # written once per interval, later hits do not touch the db
+        await answers.lookup(self.db, "why is the sky blue?")
+        self.assertEqual(accessed, served.updated_at)
+        served_id = served.id
+        self.db.commit()
+
+        report = retention.archive_stale(self.engine, self.archive, MONTH, batch=16)
+        self.assertEqual(1, report.archived)
+        self.assertIsNotNone(retention.get_archived_log(unserved_id, self.archive))
+        self.assertIsNone(retention.get_archived_log(served_id, self.archive))
+
+    async def test_batch_hits_keep_records_from_archive(self):
+        served = self.old_record("why is the sky blue?")
+        found, misses = answers.lookup_many(self.db, ["why is the sky blue?", "what is rust?"])
+        self.assertEqual("cache", found["why is the sky blue?"][1])
+        self.assertEqual(["what is rust?"], misses)
+        self.assertEqual(0, retention.archive_stale(self.engine, self.archive, MONTH, batch=16).archived)
+        self.assertIsNone(retention.get_archived_log(served.id, self.archive))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import datetime
+from unittest import main, TestCase
+
+from fastapi import Request
+
+import src.api.conditional as conditional
+
+CREATED_AT = datetime.datetime(2025, 2, 20, 22, 1, 10, 664459)
+
+
+def make_request(**headers: str) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "headers": [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()],
+    })
+
+
+class TestConditional(TestCase):
+
+    def test_entity_tag_is_strong_and_stable(self):
+        etag = conditional.entity_tag(7, CREATED_AT)
+        self.assertTrue(etag.startswith('"7-'))
+        self.assertEqual(etag, conditional.entity_tag(7, CREATED_AT))
+        self.assertNotEqual(etag, conditional.entity_tag(8, CREATED_AT))
+
+    def test_validator_headers(self):
+        headers = conditional.validator_headers(7, CREATED_AT)
+        self.assertEqual("Thu, 20 Feb 2025 22:01:10 GMT", headers["Last-Modified"])
+
+    def test_if_none_match(self):
+        etag = conditional.entity_tag(7, CREATED_AT)
+        self.assertTrue(conditional.is_not_modified(make_request(if_none_match=etag), 7, CREATED_AT))
+        self.assertTrue(conditional.is_not_modified(
+            make_request(if_none_match=f'"other", W/{etag}'), 7, CREATED_AT))
+        self.assertFalse(conditional.is_not_modified(make_request(if_none_match='"other"'), 7, CREATED_AT))
+
+    def test_if_none_match_takes_precedence(self):
+        request = make_request(
+            if_none_match='"other"',
+            if_modified_since="Thu, 20 Feb 2025 22:01:10 GMT",
+        )
+        self.assertFalse(conditional.is_not_modified(request, 7, CREATED_AT))
+
+    def test_if_modified_since(self):
+        not_modified = make_request(if_modified_since="Thu, 20 Feb 2025 22:01:10 GMT")
+        self.assertTrue(conditional.is_not_modified(not_modified, 7, CREATED_AT))
+        modified = make_request(if_modified_since="Thu, 20 Feb 2025 22:01:09 GMT")
+        self.assertFalse(conditional.is_not_modified(modified, 7, CREATED_AT))
+        malformed = make_request(if_modified_since="yesterday")
+        self.assertFalse(conditional.is_not_modified(malformed, 7, CREATED_AT))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+import os
+import tracemalloc
+from unittest import IsolatedAsyncioTestCase, main
+
+from src.api import diagnostics
+
+
+class TestDiagnostics(IsolatedAsyncioTestCase):
+
+    async def test_process_stats(self):
+        stats = diagnostics.process_stats(top=5)
+        self.assertEqual(os.getpid(), stats.pid)
+        self.assertGreater(stats.rss, 0)
+        self.assertGreater(stats.fds, 0)
+        self.assertEqual(0, stats.pool_checked_out)
+        # the test itself runs as a task
+        self.assertGreaterEqual(stats.tasks, 1)
+        self.assertIsNone(stats.traced)
+        self.assertEqual([], stats.top)
+
+    def test_allocation_sites_while_tracing(self):
+        tracemalloc.start(1)
+        try:
+            held = [bytearray(1024) for _ in range(1000)]
+            sites = diagnostics.allocation_sites(top=3)
+        finally:
+            tracemalloc.stop()
+        self.assertLessEqual(len(sites), 3)
+        self.assertIn("test_diagnostics.py:", sites[0].site)
+        self.assertGreaterEqual(sites[0].size, len(held) * 1024)
+
+
+if __name__ == "__main__":
+    main()
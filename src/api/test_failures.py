@@ -0,0 +1,51 @@
+from unittest import main, TestCase
+
+from fastapi import HTTPException
+
+from src.api import failures
+
+
+class TestFailures(TestCase):
+
+    def setUp(self):
+        self.backoff = failures.runtime_config.failure_backoff, failures.runtime_config.failure_backoff_max
+        failures.runtime_config.failure_backoff = 10
+        failures.runtime_config.failure_backoff_max = 60
+
+    def tearDown(self):
+        failures.runtime_config.failure_backoff, failures.runtime_config.failure_backoff_max = self.backoff
+        failures.failed.clear()
+
+    def test_repeat_failures_back_off_exponentially(self):
+        self.assertEqual(0, failures.record("why is the sky blue?", now=0))
+        self.assertEqual(0, failures.remaining("why is the sky blue?", now=0))
+        self.assertEqual([10, 20, 40, 60], [failures.record("why is the sky blue?", now=1) for _ in range(4)])
+        self.assertEqual(55, failures.remaining("why is the sky blue?", now=6))
+        self.assertEqual(0, failures.remaining("tell me a story", now=6))
+
+    def test_success_and_time_forget_failures(self):
+        failures.record("why is the sky blue?", now=0)
+        failures.record("why is the sky blue?", now=0)
+        failures.clear("why is the sky blue?")
+        self.assertEqual(0, failures.record("why is the sky blue?", now=0))
+        # long after the last backoff ended, counting starts over
+        self.assertEqual(0, failures.record("why is the sky blue?", now=1000))
+
+    def test_check_refuses_with_retry_after(self):
+        failures.check("why is the sky blue?")
+        for _ in range(3):
+            failures.record("why is the sky blue?")
+        with self.assertRaises(HTTPException) as raised:
+            failures.check("why is the sky blue?")
+        self.assertEqual(503, raised.exception.status_code)
+        self.assertEqual("20", raised.exception.headers["Retry-After"])
+
+    def test_turned_off(self):
+        failures.runtime_config.failure_backoff = 0
+        for _ in range(3):
+            self.assertEqual(0, failures.record("why is the sky blue?"))
+        failures.check("why is the sky blue?")
+
+
+if __name__ == "__main__":
+    main()
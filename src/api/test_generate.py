@@ -0,0 +1,126 @@
+import asyncio
+import datetime
+import json
+import os
+import subprocess
+import tempfile
+from typing import AsyncIterator, List
+from unittest import IsolatedAsyncioTestCase, main, TestCase
+
+import src.api.peers as peers
+from src.api.generate import GenerationOutcome, Traffic
+from src.llm.models import GenerationResponseComplete
+from src.llm.ollama import read_chunks
+from src.llm.resilience import Deadlines
+
+
+def complete(done_reason: str) -> GenerationResponseComplete:
+    return GenerationResponseComplete(
+        model="deepseek-r1:1.5b",
+        created_at=datetime.datetime.now(datetime.UTC),
+        response="",
+        done=True,
+        done_reason=done_reason,
+        context=[1, 2, 3],
+        total_duration=0,
+        load_duration=0,
+        prompt_eval_count=1,
+        prompt_eval_duration=0,
+        eval_count=1,
+        eval_duration=0,
+    )
+
+
+class TestGenerationOutcome(TestCase):
+
+    def test_status(self):
+        self.assertEqual("complete", GenerationOutcome(complete=complete("stop"), answer_len=9).status)
+        self.assertEqual("truncated", GenerationOutcome(complete=complete("length"), answer_len=9).status)
+        self.assertEqual("truncated", GenerationOutcome(answer_len=10000, cut_short=True).status)
+
+    def test_errored(self):
+        # stream ended without its final line, nothing answered, or stopped for another reason
+        self.assertEqual("errored", GenerationOutcome(answer_len=9).status)
+        self.assertEqual("errored", GenerationOutcome(complete=complete("stop")).status)
+        self.assertEqual("errored", GenerationOutcome(complete=complete("length")).status)
+        self.assertEqual("errored", GenerationOutcome(complete=complete("unload"), answer_len=9).status)
+
+
+async def streamed(lines: List[str]) -> AsyncIterator[str]:
+    for line in lines:
+        yield line
+
+
+class TestStream(IsolatedAsyncioTestCase):
+
+    async def test_garbled_chunk_is_never_complete(self):
+        line = {"model": "deepseek-r1:1.5b", "created_at": "2026-10-19T12:00:00Z", "response": "forty ", "done": False}
+        durations = dict.fromkeys(("total_duration", "load_duration", "prompt_eval_duration", "eval_duration"), 1000)
+        lines = [
+            json.dumps(line),
+            '{"model": "deepseek-r1:1.5b", "response": "tw',
+            json.dumps({
+                **line, "response": "", "done": True, "done_reason": "stop", "context": [1, 2, 3],
+                "prompt_eval_count": 1, "eval_count": 1, **durations,
+            }),
+        ]
+        outcome = GenerationOutcome()
+        async for part in read_chunks(streamed(lines), Deadlines(1, 1, 1, 5), outcome.skip):
+            outcome.answer_len += len(part.response)
+            if isinstance(part, GenerationResponseComplete):
+                outcome.complete = part
+        self.assertEqual(1, outcome.skipped)
+        self.assertEqual("stop", outcome.complete.done_reason)
+        self.assertEqual("errored", outcome.status)
+
+
+class TestTraffic(IsolatedAsyncioTestCase):
+
+    async def test_arrival_and_idle(self):
+        traffic = Traffic()
+        self.assertEqual(float("inf"), traffic.idle_for())
+        arrival = asyncio.create_task(traffic.arrival())
+        await asyncio.sleep(0)
+        with traffic.track():
+            self.assertEqual(0, traffic.idle_for())
+            await asyncio.wait_for(arrival, 1)
+        self.assertLess(traffic.idle_for(), 1)
+        self.assertEqual(0, traffic.in_flight)
+
+    async def test_announced_by_other_workers(self):
+        traffic = Traffic()
+        gone = subprocess.Popen(["true"])
+        gone.wait()
+        arrival = asyncio.create_task(traffic.arrival())
+        await asyncio.sleep(0)
+        traffic.announced(os.getppid(), 1)
+        await asyncio.wait_for(arrival, 1)
+        traffic.announced(gone.pid, 2)
+        self.assertEqual(0, traffic.idle_for())
+        # the worker that announced them exited since
+        self.assertEqual(1, traffic.running())
+        traffic.announced(os.getppid(), 0)
+        self.assertEqual(0, traffic.running())
+        self.assertLess(traffic.idle_for(), 1)
+
+    async def test_announcements_reach_the_first_worker(self):
+        traffic = Traffic()
+        with tempfile.TemporaryDirectory() as socket_dir:
+            peers.configure(0, socket_dir)
+            listening = asyncio.create_task(peers.listen_traffic(traffic.announced))
+            await asyncio.sleep(0.05)
+            arrival = asyncio.create_task(traffic.arrival())
+            peers.configure(1, socket_dir)
+            try:
+                with Traffic(announce=True).track():
+                    await asyncio.wait_for(arrival, 1)
+                    self.assertEqual({os.getpid(): 1}, traffic.remote)
+                await asyncio.sleep(0.05)
+                self.assertEqual(0, traffic.running())
+            finally:
+                listening.cancel()
+                peers.slot, peers.directory = None, None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase, main
+
+from fastapi import HTTPException
+
+from src.api import lifecycle, peers, streams
+
+
+class TestLifecycle(IsolatedAsyncioTestCase):
+
+    def tearDown(self):
+        lifecycle.state = lifecycle.STARTING
+        lifecycle._deadline = None
+        streams.generations.clear()
+        peers.slot = None
+
+    def start(self, delay: float) -> streams.Generation:
+        generation = streams.Generation(ring_size=8)
+
+        async def produce():
+            await asyncio.sleep(delay)
+            generation.finish(1)
+        streams.start(generation, produce(), grace=30)
+        return generation
+
+    async def test_drain_finishes_quick_generations_and_cancels_slow_ones(self):
+        lifecycle.ready()
+        quick, slow = self.start(0.01), self.start(10)
+        lifecycle.begin_drain(0.2)
+        with self.assertRaises(HTTPException):
+            lifecycle.check_accepting()
+        self.assertEqual(1, await lifecycle.drain())
+        self.assertEqual(1, quick.record_id)
+        self.assertEqual("generation abandoned", slow.error)
+
+    async def test_drain_waits_for_generations_outside_streams(self):
+        stored = []
+
+        async def answer(delay: float):
+            with lifecycle.generating():
+                await asyncio.sleep(delay)
+            stored.append(delay)
+        tasks = [asyncio.create_task(answer(0.01)), asyncio.create_task(answer(10))]
+        await asyncio.sleep(0)
+        self.assertEqual(2, len(lifecycle.running()))
+        lifecycle.begin_drain(0.2)
+        self.assertEqual(1, await lifecycle.drain())
+        self.assertEqual([0.01], stored)
+        self.assertTrue(tasks[1].cancelled())
+        self.assertEqual([], lifecycle.running())
+
+    def test_owner_of_generation(self):
+        self.assertIsNone(peers.owner("1.abc"))
+        peers.configure(0, "/tmp")
+        self.assertTrue(streams.Generation(8, prefix=peers.prefix()).id.startswith("0."))
+        self.assertEqual(1, peers.owner("1.abc"))
+        self.assertIsNone(peers.owner("0.abc"))
+        self.assertIsNone(peers.owner("abc"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+from unittest import main, TestCase
+
+from src.api import failures, pregen
+
+
+class TestPregen(TestCase):
+
+    def setUp(self):
+        self.daily = pregen.runtime_config.pregen_daily
+        pregen.runtime_config.pregen_daily = 10
+
+    def tearDown(self):
+        pregen.runtime_config.pregen_daily = self.daily
+        pregen.demand.clear()
+        pregen.added.clear()
+        failures.failed.clear()
+
+    def test_rising_demand_first(self):
+        for client in ("10.0.0.1", "10.0.0.2", "10.0.0.3"):
+            pregen.note("why is the sky blue?", client, now=0)
+        for client in ("10.0.0.1", "10.0.0.2"):
+            pregen.note("tell me a story", client, now=0)
+            pregen.note("and then what?", client, parent_id=42, now=pregen.HALF_LIFE)
+        # asked by three, but that was long ago
+        self.assertEqual(
+            [("and then what?", 42), ("why is the sky blue?", None), ("tell me a story", None)],
+            pregen.rising(now=pregen.HALF_LIFE * 2),
+        )
+
+    def test_failing_queries_are_left_out(self):
+        for client in ("10.0.0.1", "10.0.0.2"):
+            pregen.note("why is the sky blue?", client, now=0)
+            pregen.note("and then what?", client, parent_id=42, now=0)
+        for _ in range(failures.REPEATS):
+            failures.record("42>and then what?")
+        self.assertEqual([("why is the sky blue?", None)], pregen.rising(now=0))
+
+    def test_single_client_can_not_drive_demand(self):
+        for n in range(pregen.MAX_PER_CLIENT * 2):
+            pregen.note(f"junk {n}", "10.0.0.1", now=0)
+            pregen.note("junk 0", "10.0.0.1", now=0)
+        # asked over and over, but by one client only
+        self.assertEqual([], pregen.rising(now=0))
+        self.assertEqual(pregen.MAX_PER_CLIENT, len(pregen.demand))
+        self.assertEqual(1, pregen.demand["junk 0"].score)
+
+        pregen.note("why is the sky blue?", "10.0.0.2", now=0)
+        pregen.note("why is the sky blue?", "10.0.0.1", now=0)
+        self.assertEqual([("why is the sky blue?", None)], pregen.rising(now=0))
+        # answered meanwhile, room for another one of the first client
+        pregen.forget("junk 0")
+        pregen.note("junk more", "10.0.0.1", now=0)
+        self.assertIn("junk more", pregen.demand)
+
+    def test_nothing_noted_while_off(self):
+        pregen.runtime_config.pregen_daily = 0
+        pregen.note("why is the sky blue?", "10.0.0.1")
+        pregen.note("why is the sky blue?", "10.0.0.2")
+        self.assertEqual([], pregen.rising())
+
+
+if __name__ == "__main__":
+    main()
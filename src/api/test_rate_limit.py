@@ -0,0 +1,50 @@
+from unittest import main, TestCase
+
+from src.api.middleware.rate_limit import Budget, HITS, MISSES, RateLimiter
+
+
+def make_limiter(max_clients: int = 10) -> RateLimiter:
+    # hits refill one per second, misses one every 6 seconds
+    return RateLimiter(Budget(60, 3), Budget(10, 2), max_clients)
+
+
+class TestRateLimiter(TestCase):
+
+    def test_take_and_refill(self):
+        limiter = make_limiter()
+        client = limiter.client("a", now=0)
+        self.assertEqual(2, limiter.take(client, MISSES, 5))
+        self.assertEqual(0, limiter.take(client, MISSES))
+        self.assertEqual(6, limiter.retry_after(client, MISSES))
+        # hit budget is separate
+        self.assertEqual(1, limiter.take(client, HITS))
+        client = limiter.client("a", now=6)
+        self.assertEqual(1, limiter.take(client, MISSES))
+        self.assertEqual(3, int(client.tokens[HITS]))
+
+    def test_evicts_least_recently_seen(self):
+        limiter = make_limiter(max_clients=2)
+        for key in ("a", "b", "c"):
+            limiter.client(key, now=0)
+        self.assertEqual(["b", "c"], list(limiter.clients))
+
+    def test_evicts_idle_clients(self):
+        limiter = make_limiter()
+        limiter.client("a", now=0)
+        # both buckets of a are full again after 12 seconds
+        limiter.client("b", now=13)
+        self.assertEqual(["b"], list(limiter.clients))
+
+    def test_headers_of_last_budget_charged(self):
+        limiter = make_limiter()
+        client = limiter.client("a", now=0)
+        limiter.take(client, MISSES)
+        headers = dict(limiter.headers(client))
+        self.assertEqual(b"2", headers[b"ratelimit-limit"])
+        self.assertEqual(b"1", headers[b"ratelimit-remaining"])
+        self.assertEqual(b"6", headers[b"ratelimit-reset"])
+        self.assertEqual(b"2;w=12", headers[b"ratelimit-policy"])
+
+
+if __name__ == "__main__":
+    main()
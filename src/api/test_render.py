@@ -0,0 +1,57 @@
+import datetime
+from unittest import main, TestCase
+
+import src.api.render as render
+from src.db.generation_record import GenerationRecord
+
+
+def make_record(record_id: int, response: str) -> GenerationRecord:
+    return GenerationRecord(
+        id=record_id,
+        query_text="why is the sky blue?",
+        response_text=response,
+        created_at=datetime.datetime(2025, 2, 20, 22, 1, 10),
+    )
+
+
+class TestRender(TestCase):
+
+    def setUp(self):
+        render.invalidate_home()
+
+    def test_entry_is_reused_for_same_version(self):
+        first = render.render_entry(make_record(7, "because of scattering"))
+        # same id and version is served as rendered before
+        second = render.render_entry(make_record(7, "something else"))
+        self.assertIs(first, second)
+        self.assertIn(b"because of scattering", second)
+
+    def test_entry_survives_access(self):
+        record = make_record(8, "because of scattering")
+        first = render.render_entry(record)
+        record.updated_at = datetime.datetime(2025, 2, 21)
+        self.assertIs(first, render.render_entry(record))
+        self.assertIs(first, render.cached_entry(8, record.created_at, record.clickable))
+
+    def test_entry_rendered_per_clickable(self):
+        record = make_record(10, "because of scattering")
+        clickable = render.render_entry(record)
+        record.clickable = False
+        self.assertNotEqual(clickable, render.render_entry(record))
+        self.assertIn(b"hx-get", clickable)
+
+    def test_home_invalidation(self):
+        self.assertIsNone(render.cached_home())
+        content = render.render_home([make_record(9, "because of scattering")])
+        self.assertIs(content, render.cached_home())
+        render.invalidate_home()
+        self.assertIsNone(render.cached_home())
+
+    def test_home_of_older_record_is_stale(self):
+        # another worker stored record 10
+        content = render.render_home([make_record(9, "because of scattering")], latest_id=9)
+        self.assertIs(content, render.cached_home(9))
+        self.assertIsNone(render.cached_home(10))
+
+if __name__ == '__main__':
+    main()
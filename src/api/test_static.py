@@ -0,0 +1,84 @@
+import gzip
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase, TestCase, main
+
+from fastapi import HTTPException
+
+from src.api import static
+from src.api.middleware.gzip import GZipMiddleware
+
+PAGE: bytes = b"<div>the sky is blue</div>" * 100
+
+
+def respond(content_type: bytes, chunks: list[bytes], headers: tuple = ()):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", content_type), *headers]})
+        for i, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+    return app
+
+
+async def call(app, accept_encoding: bytes = b"gzip, deflate") -> list[dict]:
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+    scope = {"type": "http", "headers": [(b"accept-encoding", accept_encoding)]}
+    await GZipMiddleware(app, min_size=500)(scope, None, send)
+    return sent
+
+
+class TestStatic(TestCase):
+
+    def test_accepts_gzip(self):
+        self.assertTrue(static.accepts_gzip("gzip, deflate, br"))
+        self.assertTrue(static.accepts_gzip("br;q=1.0, *;q=0.5"))
+        self.assertFalse(static.accepts_gzip("gzip;q=0, br"))
+        self.assertFalse(static.accepts_gzip(None))
+
+    def test_precompressed_variant(self):
+        with tempfile.TemporaryDirectory() as directory:
+            os.mkdir(os.path.join(directory, "vendor"))
+            with open(os.path.join(directory, "vendor", "lib-1.0.js"), "wb") as file:
+                file.write(PAGE)
+            self.assertEqual(1, len(static.precompress(directory)))
+            # up to date
+            self.assertEqual([], static.precompress(directory))
+
+            response = static.static_response("vendor/lib-1.0.js", "gzip", directory)
+            self.assertTrue(response.path.endswith(".gz"))
+            self.assertEqual("gzip", response.headers["content-encoding"])
+            self.assertEqual(static.IMMUTABLE_CACHE_CONTROL, response.headers["cache-control"])
+            self.assertEqual("Accept-Encoding", response.headers["vary"])
+            self.assertNotIn("content-encoding", static.static_response("vendor/lib-1.0.js", "br", directory).headers)
+            for name in ("../secret", "vendor/lib-1.0.js.gz", "vendor/missing.js"):
+                with self.assertRaises(HTTPException):
+                    static.static_response(name, "gzip", directory)
+
+
+class TestGZipMiddleware(IsolatedAsyncioTestCase):
+
+    async def test_compresses_single_body(self):
+        start, body = await call(respond(b"text/html; charset=utf-8", [PAGE], ((b"etag", b'"7-1a"'),)))
+        headers = dict(start["headers"])
+        self.assertEqual(b"gzip", headers[b"content-encoding"])
+        self.assertEqual(b'W/"7-1a"', headers[b"etag"])
+        self.assertEqual(str(len(body["body"])).encode(), headers[b"content-length"])
+        self.assertEqual(PAGE, gzip.decompress(body["body"]))
+
+    async def test_leaves_small_and_unaccepted_alone(self):
+        _, body = await call(respond(b"text/html", [b"<div>short</div>"]))
+        self.assertEqual(b"<div>short</div>", body["body"])
+        _, body = await call(respond(b"text/html", [PAGE]), accept_encoding=b"identity")
+        self.assertEqual(PAGE, body["body"])
+
+    async def test_streams_pass_chunk_by_chunk(self):
+        for content_type in (b"text/event-stream", b"application/x-ndjson", b"text/html"):
+            sent = await call(respond(content_type, [PAGE, PAGE, b""]))
+            self.assertNotIn(b"content-encoding", dict(sent[0]["headers"]))
+            self.assertEqual([PAGE, PAGE, b""], [message["body"] for message in sent[1:]])
+
+
+if __name__ == "__main__":
+    main()
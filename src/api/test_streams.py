@@ -0,0 +1,58 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase, main
+
+from src.api import streams
+
+
+async def collect(generation: streams.Generation, last_event_id: int = 0) -> list[bytes]:
+    return [chunk async for chunk in generation.events(last_event_id)]
+
+
+class TestStreams(IsolatedAsyncioTestCase):
+
+    async def test_resumes_after_last_event_id(self):
+        generation = streams.Generation(ring_size=8)
+        for word in ["the ", "sky ", "is ", "blue"]:
+            generation.push(word)
+        generation.finish(42)
+        events = await collect(generation, last_event_id=2)
+        self.assertEqual(streams.event("is ", event_id=3), events[1])
+        self.assertEqual(streams.event("blue", event_id=4), events[2])
+        self.assertEqual(streams.event("42", name="done"), events[-1])
+
+    async def test_snapshot_once_ring_moved_past(self):
+        generation = streams.Generation(ring_size=2)
+        for word in ["the ", "sky ", "is ", "blue"]:
+            generation.push(word)
+        generation.fail("model went away")
+        events = await collect(generation, last_event_id=1)
+        self.assertEqual(streams.event("the sky is blue", event_id=4, name="snapshot"), events[1])
+        self.assertEqual(streams.event("model went away", name="failed"), events[-1])
+        self.assertEqual(3, len(events))
+
+    async def test_generation_runs_through_disconnects(self):
+        generation = streams.Generation(ring_size=8)
+        release = asyncio.Event()
+
+        async def produce():
+            generation.push("first ")
+            await release.wait()
+            generation.push("second")
+            generation.finish(7)
+
+        streams.start(generation, produce(), grace=60)
+        listener = generation.events()
+        self.assertTrue((await anext(listener)).startswith(b"retry:"))
+        self.assertEqual(streams.event("first ", event_id=1), await anext(listener))
+        await listener.aclose()
+        self.assertEqual(0, generation.subscribers)
+
+        release.set()
+        await generation.task
+        events = await collect(streams.get(generation.id), last_event_id=1)
+        self.assertEqual(streams.event("second", event_id=2), events[1])
+        self.assertEqual("first second", generation.text())
+
+
+if __name__ == '__main__':
+    main()
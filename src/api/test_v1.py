@@ -0,0 +1,42 @@
+import json
+from typing import AsyncGenerator, List
+from unittest import IsolatedAsyncioTestCase, main
+
+from src.api import answers, failures, v1
+from src.api.generate import GenerationOutcome
+from src.llm.resilience import GenerationTimeout
+
+
+async def tokens(parts: List[str], error: Exception | None = None) -> AsyncGenerator[str, None]:
+    for part in parts:
+        yield part
+    if error is not None:
+        raise error
+
+
+async def lines(stream: AsyncGenerator[bytes, None]) -> List[dict]:
+    return [json.loads(line) async for line in stream]
+
+
+class TestStreamGenerated(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.found = answers.Lookup("why is the sky blue?", None)
+
+    def tearDown(self):
+        failures.clear(self.found.cache_key)
+
+    async def test_unusable_answer_ends_with_error_line(self):
+        # no final stats, the outcome errored and nothing is stored
+        sent = await lines(v1.stream_generated(self.found, tokens(["rayleigh ", "scat"]), GenerationOutcome()))
+        self.assertEqual([{"response": "rayleigh "}, {"response": "scat"}], sent[:2])
+        self.assertEqual({"error": "model returned no usable answer"}, sent[-1])
+
+    async def test_upstream_failure_ends_with_error_line(self):
+        error = GenerationTimeout("no next token from ollama in time")
+        sent = await lines(v1.stream_generated(self.found, tokens(["rayleigh "], error), GenerationOutcome()))
+        self.assertEqual([{"response": "rayleigh "}, {"error": "no next token from ollama in time"}], sent)
+
+
+if __name__ == "__main__":
+    main()
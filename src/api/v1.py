@@ -0,0 +1,198 @@
+"""Versioned JSON API for programmatic clients, shares answer tiers with the html routes"""
+import logging
+from logging import Logger
+from typing import AsyncGenerator, List
+
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+import src.api.answers as answers
+import src.api.conditional as conditional
+import src.api.failures as failures
+import src.api.generate as llm_api_generate
+import src.api.lifecycle as lifecycle
+import src.api.middleware.db_session as db_middleware
+import src.api.middleware.rate_limit as rate_limit
+import src.api.pregen as pregen
+import src.db.database as db
+from src.db import generation_record, retention
+from src.db.generation_record import GenerationRecord
+from src.llm import keep_alive, ollama
+from src.llm.resilience import OllamaUnavailable
+from src.schemas.gen_req import ApiGenerationRequest
+from src.schemas.generation_response import (
+    GenerationChunk,
+    GenerationError,
+    GenerationLog,
+    GenerationReasoning,
+    GenerationResponse,
+)
+from src.schemas.model_status import BreakerStatus, ModelStatus
+from src.utils.env_config import read_env, EnvConfig
+
+runtime_config: EnvConfig = read_env()
+
+logger: Logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/v1", tags=["api"])
+
+
+def to_response(record: GenerationRecord, source: str | None = None) -> GenerationResponse:
+    """Record as returned by the API"""
+
+    return GenerationResponse(
+        id=record.id,
+        response=record.response_text,
+        timestamp=record.created_at,
+        query=record.query_text,
+        parent_id=record.parent_id,
+        source=source,
+        model=record.model,
+        reasoning_len=record.reasoning_len,
+        outcome=record.outcome,
+    )
+
+
+def json_response(model: BaseModel, headers: dict[str, str] | None = None) -> Response:
+    """Serializes straight from pydantic core, skipping the generic jsonable_encoder pass"""
+
+    return Response(model.model_dump_json(), media_type="application/json", headers=headers)
+
+
+def ndjson_line(model: BaseModel) -> bytes:
+    return model.model_dump_json().encode("utf-8") + b"\n"
+
+
+async def stream_generated(
+        found: answers.Lookup,
+        generation: AsyncGenerator[str, None],
+        outcome: llm_api_generate.GenerationOutcome,
+) -> AsyncGenerator[bytes, None]:
+    """
+    NDJSON lines of generated tokens, then the stored record.
+    Headers are sent with the first line, failures after it end the stream with an error line, as the failed event does.
+    """
+
+    parts: List[str] = []
+    try:
+        async for part in generation:
+            parts.append(part)
+            if part == "":
+                continue
+            yield ndjson_line(GenerationChunk(response=part))
+        # request session is already closed once streaming starts
+        with db.SessionLocal() as session:
+            record = await answers.store(session, found, "".join(parts), outcome)
+    except (answers.UnusableAnswer, OllamaUnavailable, httpx.HTTPError) as e:
+        logger.error("streamed generation failed for '%s', %s", found.query, e)
+        yield ndjson_line(GenerationError(error=str(e)))
+        return
+    yield ndjson_line(to_response(record, "generated"))
+
+
+@router.post("/query", response_model=GenerationResponse)
+async def query(
+    request: Request,
+    body: ApiGenerationRequest,
+    db_session: Session = Depends(db_middleware.get_db),
+) -> Response:
+    """
+    Answers a query from cache, stored or similar answers, or generates it.
+    With stream set, generated tokens are sent as NDJSON lines as they arrive,
+    followed by the stored record.
+    """
+
+    logger.info("Received api query from %s: %s", request.client, body.query)
+    found = await answers.lookup(db_session, body.query, parent_id=body.parent_id)
+    if found.record is not None:
+        response = to_response(found.record, found.source)
+        if body.stream:
+            return StreamingResponse(iter([ndjson_line(response)]), media_type="application/x-ndjson")
+        return json_response(response)
+
+    failures.check(found.cache_key)
+    try:
+        lifecycle.check_accepting()
+        rate_limit.charge_miss(request)
+    except HTTPException:
+        # answered ahead of the next ask, once there is capacity
+        pregen.note(found.query, rate_limit.client_key(request), found.parent_id)
+        raise
+    outcome = llm_api_generate.GenerationOutcome()
+    generation = llm_api_generate.generate(body.query, context=found.context, outcome=outcome, model=found.model)
+    if not body.stream:
+        parts = [part async for part in generation]
+        record = await answers.store(db_session, found, "".join(parts), outcome)
+        return json_response(to_response(record, "generated"))
+
+    return StreamingResponse(stream_generated(found, generation, outcome), media_type="application/x-ndjson")
+
+
+@router.get("/log/{query_id}", response_model=GenerationResponse)
+async def read_log(
+    request: Request,
+    query_id: int,
+    db_session: Session = Depends(db_middleware.get_db),
+) -> Response:
+    """One record, with the same validators as the html route"""
+
+    version = generation_record.get_query_log_version(db_session, query_id=query_id)
+    if version is None:
+        archived = retention.get_archived_log(query_id)
+        if archived is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Query not found")
+        return json_response(to_response(archived, "archived"))
+
+    headers = conditional.validator_headers(version.id, version.created_at)
+    headers["Cache-Control"] = conditional.RECORD_CACHE_CONTROL
+    if conditional.is_not_modified(request, version.id, version.created_at):
+        return conditional.not_modified(headers)
+
+    record = generation_record.get_query_log(db_session, query_id=query_id)
+    return json_response(to_response(record), headers=headers)
+
+
+@router.get("/log/{query_id}/reasoning", response_model=GenerationReasoning)
+async def read_reasoning(
+    query_id: int,
+    db_session: Session = Depends(db_middleware.get_db),
+) -> Response:
+    """Reasoning the model did before answering, left out of records to keep them lean"""
+
+    reasoning = generation_record.get_reasoning(db_session, query_id)
+    if reasoning is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reasoning not found")
+    return json_response(
+        GenerationReasoning(id=query_id, reasoning=reasoning),
+        headers={"Cache-Control": conditional.RECORD_CACHE_CONTROL},
+    )
+
+
+@router.get("/logs", response_model=GenerationLog)
+async def read_logs(
+    db_session: Session = Depends(db_middleware.get_db),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+) -> Response:
+    """Latest records first, texts cut down to previews"""
+
+    logs = generation_record.get_query_logs(db_session, offset=offset, limit=limit)
+    return json_response(GenerationLog(logs=[to_response(log) for log in logs]))
+
+
+@router.get("/model", response_model=ModelStatus)
+async def model_status() -> Response:
+    """Cold and warm model loads since start, and whether ollama is failing"""
+
+    stats = keep_alive.stats
+    return json_response(ModelStatus(
+        model=runtime_config.model_name,
+        keep_alive=runtime_config.keep_alive,
+        cold_loads=stats.cold,
+        warm_loads=stats.warm,
+        last_load=None if stats.last_load is None else stats.last_load.total_seconds(),
+        breaker=BreakerStatus(**ollama.circuit_breaker().snapshot()),
+    ))
@@ -0,0 +1,45 @@
+"""Response texts stored zlib compressed, decompressed transparently on access"""
+import logging
+import zlib
+from typing import Optional, Tuple
+
+from src.utils.env_config import read_env
+
+logger = logging.getLogger(__name__)
+
+# zlib default, higher levels cost a lot more time for a few percent
+LEVEL: int = 6
+
+
+def compress(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), LEVEL)
+
+
+def decompress(packed: bytes) -> str:
+    return zlib.decompress(packed).decode("utf-8")
+
+
+def pack_response(text: Optional[str], min_len: Optional[int] = None) -> Tuple[Optional[str], Optional[bytes]]:
+    """
+    Plain text and compressed text columns for a response, one of them is set.
+    Responses shorter than min_len stay plain, they hardly shrink.
+
+    :param text: response text
+    :param min_len: chars from which responses get compressed, 0 never, defaults to COMPRESS_MIN_LEN
+    """
+
+    # config is read on first use, importing the codec does not need .env
+    min_len = read_env().compress_min_len if min_len is None else min_len
+    if text is None or min_len == 0 or len(text) < min_len:
+        return text, None
+    packed = compress(text)
+    # incompressible text is not worth a decompression on every read
+    if len(packed) >= len(text.encode("utf-8")):
+        return text, None
+    return None, packed
+
+
+def unpack_response(plain: Optional[str], packed: Optional[bytes]) -> Optional[str]:
+    """Response text from its plain or compressed column"""
+
+    return plain if packed is None else decompress(packed)
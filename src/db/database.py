@@ -1,25 +1,43 @@
 """Connector class that also sets up the DB"""
+import logging
 import os
 
-from alembic import command
-from alembic.config import Config
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy_utils import database_exists, create_database
+from sqlalchemy.pool import NullPool
 
 from src.utils.env_config import read_env, EnvConfig
 
 runtime_config: EnvConfig = read_env()
 assert runtime_config.db_conn_str.startswith("sqlite:///")
+logger = logging.getLogger(__name__)
 
 # "sqlite:///./test.db"
 SQLALCHEMY_DATABASE_URL = runtime_config.db_conn_str
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-def run_migrations():
+def run_migrations() -> bool:
+    """Upgrades the schema to head, returns False when it was there already"""
+
+    # alembic and sqlalchemy_utils are only needed here, not on every import
+    from alembic import command
+    from alembic.config import Config
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+    from sqlalchemy_utils import database_exists, create_database
+
     if not database_exists(engine.url):
         create_database(engine.url)
 
     alembic_cfg = Config(f"{os.getcwd()}/alembic.ini")
-    command.upgrade(alembic_cfg, "head")
\ No newline at end of file
+    heads = set(ScriptDirectory.from_config(alembic_cfg).get_heads())
+    # the db alembic upgrades, as configured in alembic.ini
+    migrated = create_engine(alembic_cfg.get_main_option("sqlalchemy.url"), poolclass=NullPool)
+    with migrated.connect() as connection:
+        current = set(MigrationContext.configure(connection).get_current_heads())
+    if current == heads:
+        logger.info("schema at head %s, no migrations to run", ", ".join(sorted(heads)))
+        return False
+    command.upgrade(alembic_cfg, "head")
+    return True
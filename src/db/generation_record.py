@@ -1,30 +1,104 @@
 """Operation that can be performed in the DB"""
+import hashlib
 import logging
-from typing import cast, List
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from typing import cast, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import DDL, Row, func, insert, or_, text, update
+from sqlalchemy.orm import Session, deferred
 
 import datetime
-from sqlalchemy import event, Column, Integer, Text, DateTime
+from sqlalchemy import event, Boolean, Column, Index, Integer, LargeBinary, String, Text, DateTime
 from sqlalchemy.ext.declarative import declarative_base
 
+from src.db.compression import compress, decompress, pack_response, unpack_response
+
 logger = logging.getLogger(__name__)
 
 Base = declarative_base()
 
+# listing shows this many leading chars of query and response
+PREVIEW_LEN: int = 60
+# search snippets wrap matched terms in these, so they survive html escaping
+MATCH_START: str = "\x02"
+MATCH_END: str = "\x03"
+# how a generation ended, errored answers are never stored, truncated ones are stored but not served
+COMPLETE: str = "complete"
+TRUNCATED: str = "truncated"
+ERRORED: str = "errored"
+
+def query_digest(query: str) -> int:
+    """
+    Stable hash of query text for history lookup, unlike builtin hash
+    it does not change between processes. Fits signed 64bit column.
+    """
+
+    digest = hashlib.blake2b(query.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+def preview(text: str | None) -> str | None:
+    """Cuts text down to the listing preview length"""
+
+    if text is None:
+        return None
+    return text[:PREVIEW_LEN]
+
+def utcnow() -> datetime.datetime:
+    """Naive UTC, as created_at and updated_at are stored"""
+
+    return datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+
 class GenerationRecord(Base):
     """Represents request-response pair"""
 
     __tablename__ = "generation_record"
 
     id = Column(Integer, primary_key=True, index=True)
-    hash = Column(Integer, index=True) # for history lookup
+    hash = Column(Integer, index=True) # query_digest, for history lookup
     query_text = Column(Text, nullable=False)
-    response_text = Column(Text)
-    created_at = Column(DateTime, index=True, default=datetime.datetime.now(datetime.UTC))
+    # short responses stay plain, longer ones are compressed, read both through response_text
+    response_plain = Column("response_text", Text)
+    response_zlib = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime, index=True, default=utcnow)
     updated_at = Column(DateTime, index=True, nullable=True)
+    # narrow copies for the listing, filled at insert time
+    query_preview = Column(String(PREVIEW_LEN), nullable=True)
+    response_preview = Column(String(PREVIEW_LEN), nullable=True)
+    # conversation thread, both empty for standalone queries
+    parent_id = Column(Integer, index=True, nullable=True)
+    conversation_id = Column(Integer, index=True, nullable=True)
+    # packed model context after this turn, to continue from, loaded on access only
+    context = deferred(Column(LargeBinary, nullable=True))
+    # model that answered, unknown for records older than the cascade
+    model = Column(String(50), nullable=True)
+    # reasoning block of thinking models, compressed and loaded on request only, its length tells if there is one
+    reasoning_zlib = deferred(Column(LargeBinary, nullable=True))
+    reasoning_len = Column(Integer, nullable=True)
+    # COMPLETE or TRUNCATED, unknown for records older than it, those were all served
+    outcome = Column(String(16), nullable=True)
+    # generated ahead of demand while the model was idle, empty for answers users waited for
+    pregenerated = Column(Boolean, nullable=True)
     clickable = True
 
+    __table_args__ = (
+        # covering index, listing is served from it without touching full texts
+        Index(
+            "ix_generation_record_listing",
+            "created_at", "id", "hash", "updated_at", "query_preview", "response_preview", "parent_id",
+        ),
+    )
+
+    @property
+    def response_text(self) -> str | None:
+        return unpack_response(self.response_plain, self.response_zlib)
+
+    @response_text.setter
+    def response_text(self, value: str | None) -> None:
+        self.response_plain, self.response_zlib = pack_response(value)
+
+    @property
+    def servable(self) -> bool:
+        """Whether the answer may be served for its query again"""
+        return self.outcome is None or self.outcome == COMPLETE
+
     def to_dict(self):
         return {c.name: getattr(self, c.name) for c in self.__table__.columns}
 
@@ -35,29 +109,162 @@ class GenerationRecord(Base):
 def receive_load(target, _):
     target.clickable = True
 
+# full text index, as migrations create it, also for tables made by create_all.
+# It keeps its own copy of the texts, triggers index the plain columns and index_responses
+# the compressed responses, so any sqlite client can write the table.
+FULL_TEXT_INDEX: List[str] = [
+    """
+    CREATE VIRTUAL TABLE generation_record_fts USING fts5(
+        query_text,
+        response_text,
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER generation_record_fts_insert AFTER INSERT ON generation_record BEGIN
+        INSERT INTO generation_record_fts (rowid, query_text, response_text)
+        VALUES (new.id, new.query_text, new.response_text);
+    END
+    """,
+    """
+    CREATE TRIGGER generation_record_fts_delete AFTER DELETE ON generation_record BEGIN
+        DELETE FROM generation_record_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER generation_record_fts_update
+    AFTER UPDATE OF query_text, response_text, response_zlib ON generation_record BEGIN
+        UPDATE generation_record_fts SET query_text = new.query_text
+        WHERE rowid = new.id AND new.query_text IS NOT old.query_text;
+        UPDATE generation_record_fts SET response_text = new.response_text
+        WHERE rowid = new.id AND (new.response_text IS NOT old.response_text OR new.response_zlib IS NOT old.response_zlib);
+    END
+    """,
+]
+for statement in FULL_TEXT_INDEX:
+    event.listen(GenerationRecord.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
 def create_query_log(
     db: Session,
     query: str,
-    response_text: str = None
+    response_text: str = None,
+    parent: GenerationRecord | None = None,
+    context: bytes | None = None,
+    model: str | None = None,
+    reasoning: str | None = None,
+    outcome: str | None = None,
+    pregenerated: bool = False,
 ) -> GenerationRecord:
-    """Creates new table entry and returns it"""
+    """
+    Creates new table entry and returns it
+
+    :param db: db connection for the current user session
+    :param query: user query
+    :param response_text: generated response
+    :param parent: previous turn, when following up in a conversation
+    :param context: packed model context after this turn
+    :param model: model that answered
+    :param reasoning: reasoning block before the answer
+    :param outcome: how the generation ended, COMPLETE or TRUNCATED
+    :param pregenerated: generated while idle, before anyone asked
+    """
 
     db_log = GenerationRecord(
-        hash=hash(query),
+        hash=query_digest(query),
         query_text=query,
-        response_text=response_text)
+        response_text=response_text,
+        query_preview=preview(query),
+        response_preview=preview(response_text),
+        parent_id=None if parent is None else parent.id,
+        conversation_id=None if parent is None else parent.conversation_id or parent.id,
+        context=context,
+        model=model,
+        outcome=outcome,
+        pregenerated=pregenerated or None,
+        **pack_reasoning(reasoning))
     db.add(db_log)
+    if db_log.response_zlib is not None:
+        db.flush()
+        index_responses(db, {db_log.id: response_text})
     db.commit()
     db.refresh(db_log)
     return db_log
 
 
+def index_responses(db: Session, responses: Dict[int, str]) -> None:
+    """
+    Puts responses stored compressed into the full text index, by record id.
+    Its triggers index the plain column only, so any sqlite client can write the table.
+    """
+
+    if len(responses) == 0:
+        return
+    db.execute(
+        text("UPDATE generation_record_fts SET response_text = :text WHERE rowid = :id"),
+        [{"id": record_id, "text": response} for record_id, response in responses.items()],
+    )
+
+
+def pack_reasoning(reasoning: str | None) -> Dict[str, object]:
+    """Reasoning columns, always compressed, reasoning is long and rarely read"""
+
+    if reasoning is None:
+        return {"reasoning_zlib": None, "reasoning_len": None}
+    return {"reasoning_zlib": compress(reasoning), "reasoning_len": len(reasoning)}
+
+
+def record_row(
+        query: str,
+        response_text: str | None,
+        model: str | None,
+        reasoning: str | None = None,
+        outcome: str | None = None,
+) -> Dict[str, object]:
+    """Column values of a standalone record, for bulk inserts and updates"""
+
+    plain, packed = pack_response(response_text)
+    return {
+        "hash": query_digest(query),
+        "query_text": query,
+        "response_plain": plain,
+        "response_zlib": packed,
+        "query_preview": preview(query),
+        "response_preview": preview(response_text),
+        "model": model,
+        "outcome": outcome,
+        **pack_reasoning(reasoning),
+    }
+
+
+def create_query_logs(
+        db: Session,
+        answers: Iterable[Tuple[str, str, Optional[str], Optional[str], Optional[str]]],
+) -> List[GenerationRecord]:
+    """
+    Creates many standalone entries with a single bulk insert and commit
+
+    :param db: db connection for the current user session
+    :param answers: query, response text, model that answered, its reasoning and how the generation ended
+    """
+
+    rows = [record_row(*answer) for answer in answers]
+    if len(rows) == 0:
+        return []
+    records = list(db.scalars(insert(GenerationRecord).returning(GenerationRecord), rows))
+    index_responses(db, {record.id: record.response_text for record in records if record.response_zlib is not None})
+    # detach while loaded from RETURNING, commit would expire them
+    for record in records:
+        db.expunge(record)
+    db.commit()
+    return records
+
+
 def get_query_log(db: Session, query_id: int) -> GenerationRecord | None:
     """
     Retrieves specific log by id
 
     :param db: db connection for the current user session
-    :param query_id can be either id or hash value
+    :param query_id: record id
     """
 
     one = db.query(GenerationRecord).filter(GenerationRecord.id == query_id).first()
@@ -65,10 +272,136 @@ def get_query_log(db: Session, query_id: int) -> GenerationRecord | None:
     return one
 
 
+def is_servable():
+    """Filter of records whose answer may be served again, see GenerationRecord.servable"""
+
+    return or_(GenerationRecord.outcome.is_(None), GenerationRecord.outcome == COMPLETE)
+
+
+def find_query_logs(
+        db: Session,
+        queries: Iterable[str],
+        parent_id: Optional[int] = None,
+) -> Dict[str, GenerationRecord]:
+    """
+    Retrieves latest servable answers to the exact queries, with a single IN lookup by digest
+
+    :param db: db connection for the current user session
+    :param queries: query texts
+    :param parent_id: conversation turn the queries follow up, none for standalone
+    """
+
+    by_digest = {query_digest(query): query for query in queries}
+    if len(by_digest) == 0:
+        return {}
+    found: Dict[str, GenerationRecord] = {}
+    records = db.query(GenerationRecord).filter(
+        GenerationRecord.hash.in_(by_digest.keys()),
+        GenerationRecord.parent_id.is_(None) if parent_id is None else GenerationRecord.parent_id == parent_id,
+        is_servable(),
+    ).order_by(GenerationRecord.id)
+    for record in records:
+        # digest collisions are possible, text decides
+        if by_digest.get(record.hash) == record.query_text:
+            found[record.query_text] = record
+    return found
+
+
+def find_query_log(db: Session, query: str, parent_id: Optional[int] = None) -> GenerationRecord | None:
+    """Latest answer to the exact query, see find_query_logs"""
+
+    return find_query_logs(db, [query], parent_id=parent_id).get(query)
+
+
+def get_reasoning(db: Session, query_id: int) -> str | None:
+    """
+    Reads only the reasoning of a record, none if it has none or is not stored
+
+    :param db: db connection for the current user session
+    :param query_id: record id
+    """
+
+    packed = db.query(GenerationRecord.reasoning_zlib).filter(GenerationRecord.id == query_id).scalar()
+    return None if packed is None else decompress(packed)
+
+
+def get_query_log_version(db: Session, query_id: int) -> Row | None:
+    """
+    Retrieves only id and creation time of a record, leaving the texts unread
+
+    :param db: db connection for the current user session
+    :param query_id: record id
+    """
+
+    return db.query(
+        GenerationRecord.id,
+        GenerationRecord.created_at,
+    ).filter(GenerationRecord.id == query_id).first()
+
+
+def latest_id(db: Session) -> Optional[int]:
+    """Id of the newest record, changes with every insert, None while there are none"""
+
+    return db.query(func.max(GenerationRecord.id)).scalar()
+
+
+def latest_demand(db: Session) -> Optional[datetime.datetime]:
+    """Creation time of the newest answer a user waited for, in UTC, None while there are none"""
+
+    # walks the created_at index from the newest, pregenerated ones are few
+    return db.query(GenerationRecord.created_at).filter(
+        GenerationRecord.pregenerated.is_(None),
+    ).order_by(GenerationRecord.created_at.desc()).limit(1).scalar()
+
+
+def count_pregenerated(db: Session, since: datetime.datetime) -> int:
+    """Answers generated ahead of demand since the UTC time"""
+
+    return db.query(func.count(GenerationRecord.id)).filter(
+        GenerationRecord.pregenerated.is_(True),
+        GenerationRecord.created_at >= since,
+    ).scalar()
+
+
+def recurring_follow_ups(db: Session, since: datetime.datetime, limit: int = 5) -> List[str]:
+    """
+    Follow up queries asked in at least two conversations since the UTC time, most common first,
+    like "explain it simpler", they are likely to be asked after other answers too
+
+    :param db: db connection for the current user session
+    :param since: oldest follow ups considered
+    :param limit: max count of queries to return
+    """
+
+    conversations = func.count(func.distinct(GenerationRecord.conversation_id))
+    rows = db.query(GenerationRecord.query_text).filter(
+        GenerationRecord.parent_id.is_not(None),
+        GenerationRecord.created_at >= since,
+    ).group_by(GenerationRecord.query_text).having(conversations >= 2).order_by(conversations.desc()).limit(limit)
+    return [row.query_text for row in rows]
+
+
+def recently_served(db: Session, limit: int = 5) -> List[GenerationRecord]:
+    """
+    Standalone servable answers with a model context, latest served from storage first
+
+    :param db: db connection for the current user session
+    :param limit: max count of entries to return
+    """
+
+    return db.query(GenerationRecord).filter(
+        GenerationRecord.parent_id.is_(None),
+        GenerationRecord.updated_at.is_not(None),
+        GenerationRecord.context.is_not(None),
+        is_servable(),
+    ).order_by(GenerationRecord.updated_at.desc()).limit(limit).all()
+
+
 def get_query_logs(db: Session, offset: int = 0, limit: int = 20) -> List[GenerationRecord]:
     """
     Retrieves last entries, with optional offset and default limit of 20 with DESC order.
-    Request and response fields are limited to 60 chars.
+    Request and response fields are limited to PREVIEW_LEN chars,
+    read from the precomputed previews via covering index.
 
     :param db: db connection for the current user session
     :param offset: skip over a number of elements
@@ -79,15 +412,60 @@ def get_query_logs(db: Session, offset: int = 0, limit: int = 20) -> List[Genera
     rows = db.query(
         GenerationRecord.id,
         GenerationRecord.hash,
-        func.substr(GenerationRecord.query_text, 1, 60).label("query_text"),
-        func.substr(GenerationRecord.response_text, 1, 60).label("response_text"),
+        GenerationRecord.query_preview.label("query_text"),
+        GenerationRecord.response_preview.label("response_text"),
         GenerationRecord.created_at,
         GenerationRecord.updated_at,
+        GenerationRecord.parent_id,
     ).order_by(GenerationRecord.created_at.desc()).offset(offset).limit(limit).all()
     logs = [GenerationRecord(**dict(row._mapping)) for row in rows]
     return logs
 
 
+def to_match_expression(search: str) -> str:
+    """
+    Turns free user input into FTS5 query, each word is quoted
+    so operators and punctuation are matched literally.
+    Prefix queries are not used, short prefixes expand into thousands of terms
+    and have to score most of the table, stemming covers word forms instead.
+    """
+
+    words = [word.replace('"', '""') for word in search.split()]
+    return " ".join(f'"{word}"' for word in words)
+
+
+def search_query_logs(db: Session, search: str, limit: int = 10) -> List[Row]:
+    """
+    Full text search over queries and responses, best matches first.
+    Returns id, created_at and snippets of both texts with matches wrapped
+    in MATCH_START and MATCH_END.
+
+    :param db: db connection for the current user session
+    :param search: free text, as entered by user
+    :param limit: max count of entries to return
+    """
+
+    limit = 100 if limit > 100 else limit
+    expression = to_match_expression(search)
+    if expression == "":
+        return []
+    return db.execute(
+        text(
+            """
+            SELECT r.id, r.created_at,
+                snippet(generation_record_fts, 0, :start, :end, '…', 12) AS query_snippet,
+                snippet(generation_record_fts, 1, :start, :end, '…', 24) AS response_snippet
+            FROM generation_record_fts
+            JOIN generation_record AS r ON r.id = generation_record_fts.rowid
+            WHERE generation_record_fts MATCH :expression
+            ORDER BY generation_record_fts.rank
+            LIMIT :limit
+            """
+        ),
+        {"expression": expression, "start": MATCH_START, "end": MATCH_END, "limit": limit},
+    ).all()
+
+
 def update_query_record(db: Session, record: GenerationRecord):
     """
     Synchronizes instance values with corresponding db record.
@@ -97,8 +475,21 @@ def update_query_record(db: Session, record: GenerationRecord):
     :param record: request-response pair
     """
 
-    record.updated_at = datetime.datetime.now()
+    record.updated_at = utcnow()
     db.merge(record)
     db.commit()
     db.refresh(record)
-    return record
\ No newline at end of file
+    return record
+
+
+def touch_query_records(db: Session, record_ids: List[int], now: datetime.datetime) -> None:
+    """
+    Sets `updated_at` of records served without loading them from db, from cache for instance
+
+    :param db: db connection for the current user session
+    :param record_ids: records served
+    :param now: access time, naive UTC
+    """
+
+    db.execute(update(GenerationRecord).where(GenerationRecord.id.in_(record_ids)).values(updated_at=now))
+    db.commit()
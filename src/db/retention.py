@@ -0,0 +1,166 @@
+"""
+Retention of generation records: the ones not accessed for a while move to a cold archive db,
+in bounded batches, and the pages they used are handed back to the file system by incremental vacuum.
+Archived records stay readable by id.
+"""
+import asyncio
+import datetime
+import logging
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from sqlalchemy import Connection, Engine, and_, bindparam, create_engine, exists, inspect, or_, select, text
+from sqlalchemy.orm import aliased
+
+from src.db.generation_record import GenerationRecord, utcnow
+from src.utils.env_config import read_env, EnvConfig
+
+logger = logging.getLogger(__name__)
+
+runtime_config: EnvConfig = read_env()
+
+TABLE: str = GenerationRecord.__tablename__
+
+_archive_engines: Dict[str, Engine] = {}
+
+
+@dataclass
+class RetentionReport:
+    """What a retention run did"""
+
+    archived: int = 0
+    batches: int = 0
+    reclaimed_bytes: int = 0
+
+
+def stale_ids(connection: Connection, cutoff: datetime.datetime, batch: int) -> List[int]:
+    """
+    Records last accessed before cutoff, never accessed ones count from their creation.
+    Turns other records follow up on are kept, conversations are archived from their latest turn back.
+    """
+
+    child = aliased(GenerationRecord)
+    return list(connection.scalars(
+        select(GenerationRecord.id)
+        .where(or_(
+            GenerationRecord.updated_at < cutoff,
+            and_(GenerationRecord.updated_at.is_(None), GenerationRecord.created_at < cutoff),
+        ))
+        .where(~exists().where(child.parent_id == GenerationRecord.id))
+        .order_by(GenerationRecord.id)
+        .limit(batch)
+    ))
+
+
+def prepare_archive(connection: Connection) -> List[str]:
+    """
+    Creates the archive table on first use, and adds columns migrations added since.
+    Returns the columns to copy.
+    """
+
+    connection.execute(text(f"CREATE TABLE IF NOT EXISTS archive.{TABLE} AS SELECT * FROM main.{TABLE} WHERE 0"))
+    connection.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS archive.ix_{TABLE}_id ON {TABLE} (id)"))
+    archived = {row[1] for row in connection.execute(text(f"PRAGMA archive.table_info({TABLE})"))}
+    columns = [row[1] for row in connection.execute(text(f"PRAGMA main.table_info({TABLE})"))]
+    for column in columns:
+        if column not in archived:
+            connection.execute(text(f"ALTER TABLE archive.{TABLE} ADD COLUMN {column}"))
+    return columns
+
+
+def free_pages(connection: Connection) -> int:
+    """Hands free pages back to the file system, returns the bytes reclaimed"""
+
+    before = connection.execute(text("PRAGMA main.page_count")).scalar()
+    # frees one page per step, while execute steps once, executescript runs it through
+    connection.connection.driver_connection.executescript("PRAGMA main.incremental_vacuum")
+    after = connection.execute(text("PRAGMA main.page_count")).scalar()
+    return (before - after) * connection.execute(text("PRAGMA main.page_size")).scalar()
+
+
+def archive_stale(
+        engine: Engine,
+        archive_path: str,
+        max_age: datetime.timedelta,
+        batch: int,
+        now: Optional[datetime.datetime] = None,
+) -> RetentionReport:
+    """
+    Moves records not accessed for max_age into the archive db, batch records per transaction,
+    and vacuums freed pages after each batch. The archive is attached, so copy and delete commit together.
+
+    :param engine: engine of the main db
+    :param archive_path: file of the archive db, created when missing
+    :param max_age: records accessed more recently are kept
+    :param batch: records moved per transaction
+    :param now: current time in naive UTC, for tests
+    """
+
+    cutoff = (utcnow() if now is None else now) - max_age
+    report = RetentionReport()
+    with engine.connect() as connection:
+        connection.execute(text("ATTACH DATABASE :path AS archive"), {"path": archive_path})
+        try:
+            columns = ", ".join(prepare_archive(connection))
+            connection.commit()
+            copy = text(
+                f"INSERT OR REPLACE INTO archive.{TABLE} ({columns}) SELECT {columns} FROM main.{TABLE} WHERE id IN :ids"
+            ).bindparams(bindparam("ids", expanding=True))
+            delete = text(f"DELETE FROM main.{TABLE} WHERE id IN :ids").bindparams(bindparam("ids", expanding=True))
+            while True:
+                ids = stale_ids(connection, cutoff, batch)
+                if len(ids) == 0:
+                    break
+                connection.execute(copy, {"ids": ids})
+                connection.execute(delete, {"ids": ids})
+                connection.commit()
+                report.archived += len(ids)
+                report.batches += 1
+                report.reclaimed_bytes += free_pages(connection)
+        finally:
+            connection.rollback()
+            connection.execute(text("DETACH DATABASE archive"))
+    logger.info(
+        "archived %d records not accessed since %s in %d batches, reclaimed %d bytes",
+        report.archived, cutoff, report.batches, report.reclaimed_bytes,
+    )
+    return report
+
+
+def get_archived_log(query_id: int, archive_path: Optional[str] = None) -> GenerationRecord | None:
+    """
+    Reads one archived record, not bound to any session. Archives are only brought up to date
+    by the next retention run, columns migrations added since are left empty.
+
+    :param query_id: record id
+    :param archive_path: archive db, ARCHIVE_DB by default
+    """
+
+    archive_path = runtime_config.archive_db if archive_path is None else archive_path
+    if not os.path.exists(archive_path):
+        return None
+    engine = _archive_engines.get(archive_path)
+    if engine is None:
+        engine = _archive_engines[archive_path] = create_engine(f"sqlite:///{archive_path}")
+    with engine.connect() as connection:
+        archived = {row[1] for row in connection.execute(text(f"PRAGMA table_info({TABLE})"))}
+        columns = [column for column in GenerationRecord.__table__.columns if column.name in archived]
+        if len(columns) == 0:
+            return None
+        row = connection.execute(select(*columns).where(GenerationRecord.id == query_id)).first()
+    if row is None:
+        return None
+    mapper = inspect(GenerationRecord)
+    return GenerationRecord(**{mapper.get_property_by_column(column).key: value for column, value in zip(columns, row)})
+
+
+async def retain(engine: Engine, archive_path: str, max_age: datetime.timedelta, batch: int, interval: float) -> None:
+    """Archives stale records every interval seconds, off the event loop"""
+
+    while True:
+        try:
+            await asyncio.to_thread(archive_stale, engine, archive_path, max_age, batch)
+        except Exception as e:
+            logger.error("retention run failed, %s", e)
+        await asyncio.sleep(interval)
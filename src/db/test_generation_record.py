@@ -0,0 +1,211 @@
+import contextlib
+import datetime
+import os
+import sqlite3
+import tempfile
+from typing import List
+from unittest import main, TestCase
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from src.db import generation_record
+from src.db.generation_record import Base, PREVIEW_LEN
+
+LONG_RESPONSE: str = "reasoning goes on and on, " * 400
+
+
+class TestGenerationRecord(TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+
+    def tearDown(self):
+        self.db.close()
+        self.engine.dispose()
+
+    def test_create_fills_previews(self):
+        record = generation_record.create_query_log(self.db, "why is the sky blue?", LONG_RESPONSE)
+        self.assertEqual("why is the sky blue?", record.query_preview)
+        self.assertEqual(LONG_RESPONSE[:PREVIEW_LEN], record.response_preview)
+        self.assertEqual(LONG_RESPONSE, record.response_text)
+
+    def test_long_responses_are_compressed(self):
+        record = generation_record.create_query_log(self.db, "why is the sky blue?", LONG_RESPONSE)
+        short = generation_record.create_query_log(self.db, "and then what?", "they lived")
+        self.db.expire_all()
+        record = generation_record.get_query_log(self.db, record.id)
+        self.assertIsNone(record.response_plain)
+        self.assertLess(len(record.response_zlib), len(LONG_RESPONSE) // 10)
+        self.assertEqual(LONG_RESPONSE, record.response_text)
+        self.assertEqual("they lived", generation_record.get_query_log(self.db, short.id).response_plain)
+
+    def test_create_without_response(self):
+        record = generation_record.create_query_log(self.db, "why is the sky blue?")
+        self.assertIsNone(record.response_preview)
+
+    def test_follow_ups_share_conversation(self):
+        first = generation_record.create_query_log(self.db, "tell me a story", "once upon a time", context=b"ctx")
+        second = generation_record.create_query_log(self.db, "and then what?", "they lived", parent=first)
+        third = generation_record.create_query_log(self.db, "and then what?", "happily", parent=second)
+        self.assertIsNone(first.conversation_id)
+        self.assertEqual(first.id, second.parent_id)
+        self.assertEqual(first.id, second.conversation_id)
+        self.assertEqual(first.id, third.conversation_id)
+        self.assertEqual(b"ctx", generation_record.get_query_log(self.db, first.id).context)
+
+    def test_query_digest_is_stable(self):
+        self.assertEqual(4168926092802846289, generation_record.query_digest("why is the sky blue?"))
+
+    def test_find_by_exact_query(self):
+        generation_record.create_query_log(self.db, "why is the sky blue?", "older")
+        latest = generation_record.create_query_log(self.db, "why is the sky blue?", "newer")
+        generation_record.create_query_log(self.db, "and then what?", "follow up", parent=latest)
+        found = generation_record.find_query_logs(self.db, ["why is the sky blue?", "and then what?", "unknown"])
+        self.assertEqual({"why is the sky blue?"}, set(found.keys()))
+        self.assertEqual("newer", found["why is the sky blue?"].response_text)
+        follow_up = generation_record.find_query_log(self.db, "and then what?", parent_id=latest.id)
+        self.assertEqual("follow up", follow_up.response_text)
+
+    def test_truncated_answers_are_not_found(self):
+        complete = generation_record.create_query_log(self.db, "why is the sky blue?", "rayleigh", outcome="complete")
+        generation_record.create_query_log(self.db, "why is the sky blue?", "rayleigh scat", outcome="truncated")
+        generation_record.create_query_log(self.db, "tell me a story", "once upon", outcome="truncated")
+        found = generation_record.find_query_logs(self.db, ["why is the sky blue?", "tell me a story"])
+        self.assertEqual({"why is the sky blue?": complete.id}, {query: record.id for query, record in found.items()})
+        self.assertTrue(complete.servable)
+
+    def test_mining_for_pregeneration(self):
+        since = datetime.datetime(2000, 1, 1)
+        first = generation_record.create_query_log(self.db, "tell me a story", "once upon", context=b"ctx")
+        second = generation_record.create_query_log(self.db, "why is the sky blue?", "rayleigh")
+        for parent in (first, second):
+            generation_record.create_query_log(self.db, "explain it simpler", "sure", parent=parent)
+        generation_record.create_query_log(self.db, "and then what?", "they lived", parent=first)
+        self.assertEqual(["explain it simpler"], generation_record.recurring_follow_ups(self.db, since))
+        # served from storage lately, with a context to follow up from
+        self.assertEqual([], generation_record.recently_served(self.db))
+        generation_record.update_query_record(self.db, first)
+        generation_record.update_query_record(self.db, second)
+        self.assertEqual([first.id], [record.id for record in generation_record.recently_served(self.db)])
+
+        latest = generation_record.latest_demand(self.db)
+        generation_record.create_query_log(self.db, "tell me a joke", "knock knock", pregenerated=True)
+        self.assertEqual(latest, generation_record.latest_demand(self.db))
+        self.assertEqual(1, generation_record.count_pregenerated(self.db, since))
+
+    def test_bulk_create(self):
+        records = generation_record.create_query_logs(
+            self.db,
+            [("first query", "one", "small-model:1b", None), ("second query", LONG_RESPONSE, None, "hmm, let me think")],
+        )
+        self.assertEqual(2, len(records))
+        self.assertEqual(17, records[1].reasoning_len)
+        self.assertEqual("hmm, let me think", generation_record.get_reasoning(self.db, records[1].id))
+        self.assertIsNone(generation_record.get_reasoning(self.db, records[0].id))
+        self.assertEqual("small-model:1b", records[0].model)
+        self.assertEqual(LONG_RESPONSE[:PREVIEW_LEN], records[1].response_preview)
+        self.assertIsNotNone(records[0].created_at)
+        self.assertEqual(records[1].id, generation_record.find_query_log(self.db, "second query").id)
+        self.assertEqual([], generation_record.create_query_logs(self.db, []))
+
+    def test_get_logs_returns_previews(self):
+        for n in range(3):
+            generation_record.create_query_log(self.db, f"query number {n}", LONG_RESPONSE)
+        logs = generation_record.get_query_logs(self.db, offset=0, limit=2)
+        self.assertEqual(2, len(logs))
+        for log in logs:
+            self.assertEqual(PREVIEW_LEN, len(log.response_text))
+
+    def test_listing_uses_covering_index(self):
+        statements = []
+
+        def emitted(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        event.listen(self.engine, "before_cursor_execute", emitted)
+        generation_record.get_query_logs(self.db, offset=0, limit=10)
+        event.remove(self.engine, "before_cursor_execute", emitted)
+        statement, parameters = statements[0]
+        plan = [row[-1] for row in self.db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+        self.assertIn("COVERING INDEX ix_generation_record_listing", "\n".join(plan))
+
+
+class TestSearch(TestCase):
+    """Runs against fully migrated db, full text index is created by migration"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{self.tmp.name}/search.db"
+        alembic_cfg = Config(f"{os.getcwd()}/alembic.ini")
+        alembic_cfg.set_main_option("sqlalchemy.url", url)
+        command.upgrade(alembic_cfg, "head")
+        self.engine = create_engine(url)
+        self.db = sessionmaker(bind=self.engine)()
+
+    def tearDown(self):
+        self.db.close()
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def search(self, terms: str) -> List[int]:
+        return [hit.id for hit in generation_record.search_query_logs(self.db, terms)]
+
+    def test_match_expression(self):
+        self.assertEqual('"sky" "blue"', generation_record.to_match_expression(" sky  blue "))
+        self.assertEqual('"a""b" "OR"', generation_record.to_match_expression('a"b OR'))
+        self.assertEqual("", generation_record.to_match_expression("   "))
+
+    def test_search_ranks_and_highlights(self):
+        generation_record.create_query_log(self.db, "why is the sky blue?", "rayleigh scattering")
+        generation_record.create_query_log(self.db, "what is rust?", "iron oxide, or a language")
+        hits = generation_record.search_query_logs(self.db, "scatter")
+        self.assertEqual(1, len(hits))
+        self.assertIn(f"{generation_record.MATCH_START}scattering", hits[0].response_snippet)
+
+    def test_search_compressed_responses(self):
+        generation_record.create_query_log(self.db, "why is the sky blue?", "rayleigh scattering " + LONG_RESPONSE)
+        hits = generation_record.search_query_logs(self.db, "rayleigh")
+        self.assertEqual(1, len(hits))
+        self.assertIn(f"{generation_record.MATCH_START}rayleigh", hits[0].response_snippet)
+
+    def test_search_follows_deletes(self):
+        record = generation_record.create_query_log(self.db, "why is the sky blue?", "rayleigh scattering")
+        self.db.delete(record)
+        self.db.commit()
+        self.assertEqual([], generation_record.search_query_logs(self.db, "sky"))
+
+    def test_search_bulk_compressed_responses(self):
+        records = generation_record.create_query_logs(self.db, [
+            ("why is the sky blue?", "rayleigh scattering " + LONG_RESPONSE, None, None, None),
+            ("what is rust?", "iron oxide", None, None, None),
+        ])
+        self.assertEqual([records[0].id], self.search("rayleigh"))
+        self.assertEqual([records[1].id], self.search("oxide"))
+
+    def test_plain_sqlite_clients_can_write(self):
+        record = generation_record.create_query_log(self.db, "why is the sky blue?", "rayleigh scattering " + LONG_RESPONSE)
+        short = generation_record.create_query_log(self.db, "what is rust?", "iron oxide")
+        # no functions of the app registered on this connection
+        with contextlib.closing(sqlite3.connect(f"{self.tmp.name}/search.db")) as plain:
+            plain.execute("INSERT INTO generation_record (query_text, response_text) VALUES ('tell me a story', 'once')")
+            plain.execute("UPDATE generation_record SET query_text = 'why is the sea blue?' WHERE id = ?", (record.id,))
+            plain.execute("DELETE FROM generation_record WHERE id = ?", (short.id,))
+            plain.commit()
+        self.assertEqual(1, len(self.search("story")))
+        self.assertEqual([record.id], self.search("sea"))
+        # compressed response indexed by the app is kept
+        self.assertEqual([record.id], self.search("rayleigh"))
+        self.assertEqual([], self.search("sky"))
+        self.assertEqual([], self.search("oxide"))
+
+    def test_search_operators_are_literal(self):
+        generation_record.create_query_log(self.db, "why is the sky blue?", "rayleigh scattering")
+        self.assertEqual([], generation_record.search_query_logs(self.db, 'sky" OR (blue'))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+import contextlib
+import datetime
+import os
+import tempfile
+import time
+from unittest import main, TestCase
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from src.db import generation_record, retention
+
+LONG_RESPONSE: str = "reasoning goes on and on, " * 400
+MONTH: datetime.timedelta = datetime.timedelta(days=30)
+
+
+@contextlib.contextmanager
+def local_time_zone(zone: str):
+    before = os.environ.get("TZ")
+    os.environ["TZ"] = zone
+    time.tzset()
+    try:
+        yield
+    finally:
+        if before is None:
+            del os.environ["TZ"]
+        else:
+            os.environ["TZ"] = before
+        time.tzset()
+
+
+class TestRetention(TestCase):
+    """Runs against fully migrated db, incremental vacuum and full text index come from migrations"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{self.tmp.name}/main.db"
+        alembic_cfg = Config(f"{os.getcwd()}/alembic.ini")
+        alembic_cfg.set_main_option("sqlalchemy.url", url)
+        command.upgrade(alembic_cfg, "head")
+        self.engine = create_engine(url)
+        self.db = sessionmaker(bind=self.engine)()
+        self.archive = f"{self.tmp.name}/archive.db"
+
+    def tearDown(self):
+        self.db.close()
+        self.engine.dispose()
+        for engine in retention._archive_engines.values():
+            engine.dispose()
+        retention._archive_engines.clear()
+        self.tmp.cleanup()
+
+    def test_archives_stale_records(self):
+        stale = [generation_record.create_query_log(self.db, f"old query {n}", LONG_RESPONSE).id for n in range(40)]
+        accessed = generation_record.create_query_log(self.db, "why is the sky blue?", "rayleigh scattering")
+        later = generation_record.utcnow() + MONTH * 2
+        accessed.updated_at = later - datetime.timedelta(days=1)
+        self.db.commit()
+
+        report = retention.archive_stale(self.engine, self.archive, MONTH, batch=16, now=later)
+        self.assertEqual(40, report.archived)
+        self.assertEqual(3, report.batches)
+        self.assertGreater(report.reclaimed_bytes, 0)
+
+        self.db.expire_all()
+        self.assertIsNone(generation_record.get_query_log(self.db, stale[0]))
+        self.assertIsNotNone(generation_record.get_query_log(self.db, accessed.id))
+        self.assertEqual([], generation_record.search_query_logs(self.db, "reasoning"))
+        archived = retention.get_archived_log(stale[0], self.archive)
+        self.assertEqual("old query 0", archived.query_text)
+        self.assertEqual(LONG_RESPONSE, archived.response_text)
+        self.assertIsNone(retention.get_archived_log(accessed.id, self.archive))
+
+    def test_keeps_turns_followed_up(self):
+        first = generation_record.create_query_log(self.db, "tell me a story", "once upon a time")
+        second = generation_record.create_query_log(self.db, "and then what?", "they lived", parent=first)
+        first_id, second_id = first.id, second.id
+        later = generation_record.utcnow() + MONTH * 2
+        second.updated_at = later
+        self.db.commit()
+
+        self.assertEqual(0, retention.archive_stale(self.engine, self.archive, MONTH, batch=16, now=later).archived)
+        # once the latest turn goes stale too, the whole conversation goes
+        report = retention.archive_stale(self.engine, self.archive, MONTH, batch=16, now=later + MONTH * 2)
+        self.assertEqual(2, report.archived)
+        self.assertIsNotNone(retention.get_archived_log(first_id, self.archive))
+        self.assertIsNotNone(retention.get_archived_log(second_id, self.archive))
+
+    def test_recent_records_are_kept_in_any_time_zone(self):
+        # posix zone names are inverted, these are 9 hours ahead of and behind utc
+        for zone in ("Etc/GMT-9", "Etc/GMT+9"):
+            with self.subTest(zone=zone), local_time_zone(zone):
+                created = generation_record.create_query_log(self.db, f"created in {zone}", "just now")
+                accessed = generation_record.create_query_log(self.db, f"accessed in {zone}", "just now")
+                generation_record.update_query_record(self.db, accessed)
+                report = retention.archive_stale(self.engine, self.archive, datetime.timedelta(hours=1), batch=16)
+                self.assertEqual(0, report.archived)
+                self.assertIsNotNone(generation_record.get_query_log(self.db, created.id))
+
+    def test_reads_archive_older_than_migrations(self):
+        stale = generation_record.create_query_log(self.db, "old query", LONG_RESPONSE, model="deepseek-r1:1.5b").id
+        retention.archive_stale(self.engine, self.archive, MONTH, batch=16, now=generation_record.utcnow() + MONTH * 2)
+        # as archived before the outcome column was added
+        old = create_engine(f"sqlite:///{self.archive}")
+        with old.begin() as connection:
+            connection.exec_driver_sql("ALTER TABLE generation_record DROP COLUMN outcome")
+        old.dispose()
+
+        archived = retention.get_archived_log(stale, self.archive)
+        self.assertEqual(LONG_RESPONSE, archived.response_text)
+        self.assertEqual("deepseek-r1:1.5b", archived.model)
+        self.assertIsNone(archived.outcome)
+        self.assertTrue(archived.servable)
+
+    def test_stale_ids_look_up_children_by_index(self):
+        statements = []
+
+        def emitted(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        with self.engine.connect() as connection:
+            event.listen(connection, "before_cursor_execute", emitted)
+            retention.stale_ids(connection, generation_record.utcnow(), batch=16)
+            event.remove(connection, "before_cursor_execute", emitted)
+            statement, parameters = statements[0]
+            plan = [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+        self.assertIn("SEARCH generation_record_1 USING INDEX ix_generation_record_parent_id (parent_id=?)", "\n".join(plan))
+        self.assertNotIn("SCAN generation_record_1", "\n".join(plan))
+
+    def test_missing_archive(self):
+        self.assertIsNone(retention.get_archived_log(1, self.archive))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import datetime
+import io
+from unittest import main, TestCase
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.db import generation_record, transfer
+from src.db.generation_record import Base
+
+LONG_RESPONSE: str = "reasoning goes on and on, " * 400
+
+
+def make_db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)()
+
+
+class TestTransfer(TestCase):
+
+    def setUp(self):
+        self.source = make_db()
+        self.target = make_db()
+
+    def tearDown(self):
+        self.source.close()
+        self.target.close()
+
+    def export(self, **kwargs) -> bytes:
+        out = io.StringIO()
+        transfer.export_history(self.source, out, **kwargs)
+        return out.getvalue().encode("utf-8")
+
+    def test_round_trip_leaves_out_follow_ups(self):
+        first = generation_record.create_query_log(self.source, "tell me a story", LONG_RESPONSE, context=b"ctx")
+        generation_record.create_query_log(self.source, "and then what?", "they lived", parent=first)
+        generation_record.create_query_log(
+            self.source, "what is rust?", "iron oxide", model="small-model:1b", reasoning="metal or language?")
+
+        report = transfer.import_history(self.target, io.BytesIO(self.export()))
+        self.assertEqual(2, report.inserted)
+        story = generation_record.find_query_log(self.target, "tell me a story")
+        self.assertEqual(LONG_RESPONSE, story.response_text)
+        self.assertEqual(first.created_at, story.created_at)
+        self.assertIsNone(story.context)
+        rust = generation_record.find_query_log(self.target, "what is rust?")
+        self.assertEqual("small-model:1b", rust.model)
+        self.assertEqual("metal or language?", generation_record.get_reasoning(self.target, rust.id))
+        self.assertIsNone(generation_record.find_query_log(self.target, "and then what?"))
+
+        report = transfer.import_history(self.target, io.BytesIO(self.export(with_context=True)), on_conflict="replace")
+        self.assertEqual(2, report.replaced)
+        self.assertEqual(b"ctx", generation_record.find_query_log(self.target, "tell me a story").context)
+        # compressed on import, still found by full text search
+        self.assertEqual([story.id], [hit.id for hit in generation_record.search_query_logs(self.target, "reasoning")])
+
+    def test_conflicts_on_stored_queries(self):
+        generation_record.create_query_log(self.source, "why is the sky blue?", "rayleigh scattering")
+        generation_record.create_query_log(self.target, "why is the sky blue?", "no idea")
+        lines = self.export()
+
+        self.assertEqual(1, transfer.import_history(self.target, io.BytesIO(lines)).skipped)
+        self.assertEqual("no idea", generation_record.find_query_log(self.target, "why is the sky blue?").response_text)
+        # stored after the exported one
+        self.assertEqual(1, transfer.import_history(self.target, io.BytesIO(lines), on_conflict="newer").skipped)
+        self.assertEqual(1, transfer.import_history(self.target, io.BytesIO(lines), on_conflict="replace").replaced)
+        self.target.expire_all()
+        self.assertEqual(
+            "rayleigh scattering",
+            generation_record.find_query_log(self.target, "why is the sky blue?").response_text,
+        )
+
+    def test_repeated_and_invalid_lines(self):
+        older = datetime.datetime(2026, 1, 1)
+        lines = [
+            b'{"query": "what is rust?", "response": "a language", "created_at": "2026-02-01T00:00:00"}\n',
+            b"not json\n",
+            b"\n",
+            f'{{"query": "what is rust?", "response": "iron oxide", "created_at": "{older.isoformat()}"}}\n'.encode(),
+        ]
+        report = transfer.import_history(self.target, lines)
+        self.assertEqual((1, 1, 1), (report.inserted, report.skipped, report.invalid))
+        self.assertEqual("a language", generation_record.find_query_log(self.target, "what is rust?").response_text)
+
+    def test_aware_timestamps(self):
+        generation_record.create_query_log(self.target, "what is rust?", "a language")
+        lines = [
+            b'{"query": "what is rust?", "response": "iron oxide", "created_at": "2000-02-01T09:00:00+09:00"}\n',
+            b'{"query": "tell me a story", "response": "once", "created_at": "2026-02-01T00:00:00Z"}\n',
+            b'{"query": "tell me a story", "response": "twice", "created_at": "2026-02-01T08:00:00+09:00"}\n',
+        ]
+        report = transfer.import_history(self.target, lines, on_conflict="newer")
+        self.assertEqual((1, 2), (report.inserted, report.skipped))
+        story = generation_record.find_query_log(self.target, "tell me a story")
+        self.assertEqual(("once", datetime.datetime(2026, 2, 1)), (story.response_text, story.created_at))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Standalone answers moved between environments as NDJSON, streamed both ways in constant memory.
+Conversation turns are left out, they only make sense with the model context of their thread,
+and so are truncated answers, they are never served.
+Usage:
+    python -m src.db.transfer export history.ndjson [--context]
+    python -m src.db.transfer import history.ndjson [--on-conflict skip|newer|replace]
+"-" reads from stdin or writes to stdout.
+"""
+import argparse
+import contextlib
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import BinaryIO, Callable, Dict, Iterable, List, Optional, TextIO
+
+from pydantic import ValidationError
+from sqlalchemy import Row, insert, select, update
+from sqlalchemy.orm import Session
+
+from src.db.compression import decompress, unpack_response
+from src.db.generation_record import GenerationRecord, index_responses, is_servable, query_digest, record_row
+from src.schemas.history import HistoryRecord
+
+logger = logging.getLogger(__name__)
+
+# keep the answer already stored, overwrite it if the imported one is newer, or always
+CONFLICT_POLICIES = ("skip", "newer", "replace")
+# records fetched and inserted per round trip
+BATCH: int = 1000
+
+
+@dataclass
+class ImportReport:
+    """What an import did, invalid lines are skipped"""
+
+    inserted: int = 0
+    replaced: int = 0
+    skipped: int = 0
+    invalid: int = 0
+
+
+class Progress:
+    """Counts records, reported to stderr at most once a second"""
+
+    def __init__(self, verb: str, total_bytes: Optional[int] = None, out: TextIO = sys.stderr) -> None:
+        self.verb = verb
+        self.total_bytes = total_bytes
+        self.out = out
+        self.records = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+        self.reported = self.started
+
+    def advance(self, records: int, size: int) -> None:
+        self.records += records
+        self.bytes += size
+        now = time.monotonic()
+        if now - self.reported >= 1:
+            self.reported = now
+            self.report(now)
+
+    def report(self, now: Optional[float] = None) -> None:
+        elapsed = max((time.monotonic() if now is None else now) - self.started, 1e-9)
+        done = "" if not self.total_bytes else f", {self.bytes / self.total_bytes:.0%}"
+        self.out.write(
+            f"{self.verb} {self.records} records, {self.bytes / 2 ** 20:.1f} MiB{done}, {self.records / elapsed:.0f}/s\n"
+        )
+        self.out.flush()
+
+
+def export_history(
+        db: Session,
+        out: TextIO,
+        with_context: bool = False,
+        progress: Optional[Progress] = None,
+) -> int:
+    """
+    Writes standalone records as NDJSON, oldest first, returns how many
+
+    :param db: db connection
+    :param out: text stream lines are written to
+    :param with_context: include packed model contexts, they are large
+    :param progress: reporter of records written
+    """
+
+    columns = [
+        GenerationRecord.query_text,
+        GenerationRecord.response_plain,
+        GenerationRecord.response_zlib,
+        GenerationRecord.created_at,
+        GenerationRecord.updated_at,
+        GenerationRecord.model,
+        GenerationRecord.reasoning_zlib,
+    ]
+    if with_context:
+        columns.append(GenerationRecord.context)
+    rows = db.execute(
+        select(*columns)
+        .where(GenerationRecord.parent_id.is_(None), is_servable())
+        .order_by(GenerationRecord.id)
+        .execution_options(yield_per=BATCH)
+    )
+    count = 0
+    for row in rows:
+        line = HistoryRecord(
+            query=row.query_text,
+            response=unpack_response(row.response_plain, row.response_zlib),
+            created_at=row.created_at,
+            updated_at=row.updated_at,
+            model=row.model,
+            reasoning=None if row.reasoning_zlib is None else decompress(row.reasoning_zlib),
+            context=row.context if with_context else None,
+        ).model_dump_json(exclude_none=True) + "\n"
+        out.write(line)
+        count += 1
+        if progress is not None:
+            progress.advance(1, len(line))
+    return count
+
+
+def import_batch(db: Session, batch: Dict[str, HistoryRecord], on_conflict: str, report: ImportReport) -> None:
+    """Inserts records of new queries, and resolves the others by on_conflict, in one transaction"""
+
+    stored: Dict[str, Row] = {}
+    existing = db.execute(
+        select(GenerationRecord.id, GenerationRecord.hash, GenerationRecord.query_text, GenerationRecord.created_at)
+        .where(
+            GenerationRecord.hash.in_({query_digest(query) for query in batch}),
+            GenerationRecord.parent_id.is_(None),
+        )
+        .order_by(GenerationRecord.id)
+    )
+    for row in existing:
+        # digest collisions are possible, text decides, latest answer wins as in lookups
+        if row.query_text in batch:
+            stored[row.query_text] = row
+
+    inserts: List[dict] = []
+    updates: List[dict] = []
+    # compressed responses by query, the full text index gets them from here
+    packed: Dict[str, str] = {}
+    for query, record in batch.items():
+        values = record_row(query, record.response, record.model, record.reasoning)
+        values.update(created_at=record.created_at, updated_at=record.updated_at)
+        # exports without contexts do not wipe the stored ones
+        if record.context is not None:
+            values["context"] = record.context
+        if values["response_zlib"] is not None:
+            packed[query] = record.response
+        current = stored.get(query)
+        if current is None:
+            inserts.append(values)
+        elif on_conflict == "replace" or (on_conflict == "newer" and record.created_at > current.created_at):
+            updates.append({"id": current.id, **values})
+        else:
+            report.skipped += 1
+    ids: Dict[str, int] = {query: row.id for query, row in stored.items()}
+    if len(inserts) > 0:
+        inserted = db.execute(insert(GenerationRecord).returning(GenerationRecord.id, sort_by_parameter_order=True), inserts)
+        ids.update(zip((values["query_text"] for values in inserts), inserted.scalars()))
+    if len(updates) > 0:
+        # executemany by primary key
+        db.execute(update(GenerationRecord), updates)
+    index_responses(db, {
+        ids[values["query_text"]]: packed[values["query_text"]]
+        for values in inserts + updates if values["query_text"] in packed
+    })
+    db.commit()
+    report.inserted += len(inserts)
+    report.replaced += len(updates)
+
+
+def import_history(
+        db: Session,
+        lines: Iterable[bytes],
+        on_conflict: str = "skip",
+        progress: Optional[Progress] = None,
+) -> ImportReport:
+    """
+    Reads NDJSON records and stores them BATCH at a time.
+    A query stored already is a conflict, a query repeated in the input keeps its latest answer.
+
+    :param db: db connection
+    :param lines: raw lines, as read from a binary file
+    :param on_conflict: one of CONFLICT_POLICIES
+    :param progress: reporter of lines read
+    """
+
+    assert on_conflict in CONFLICT_POLICIES
+    report = ImportReport()
+    batch: Dict[str, HistoryRecord] = {}
+    for number, line in enumerate(lines, 1):
+        if progress is not None:
+            progress.advance(1, len(line))
+        if line.strip() == b"":
+            continue
+        try:
+            record = HistoryRecord.model_validate_json(line)
+        except ValidationError as e:
+            logger.error("line %d is not a history record, skipped, %s", number, e)
+            report.invalid += 1
+            continue
+        previous = batch.get(record.query)
+        if previous is not None:
+            report.skipped += 1
+            if previous.created_at > record.created_at:
+                continue
+        batch[record.query] = record
+        if len(batch) >= BATCH:
+            import_batch(db, batch, on_conflict, report)
+            batch = {}
+    if len(batch) > 0:
+        import_batch(db, batch, on_conflict, report)
+    return report
+
+
+def open_input(path: str) -> contextlib.AbstractContextManager[BinaryIO]:
+    return contextlib.nullcontext(sys.stdin.buffer) if path == "-" else open(path, "rb")
+
+
+def open_output(path: str) -> contextlib.AbstractContextManager[TextIO]:
+    return contextlib.nullcontext(sys.stdout) if path == "-" else open(path, "w", encoding="utf-8")
+
+
+def main(argv: Optional[List[str]] = None, session_factory: Optional[Callable[[], Session]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m src.db.transfer", description=__doc__.split("\n")[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+    exporting = commands.add_parser("export", help="write standalone answers as NDJSON")
+    exporting.add_argument("path", help="file to write, - for stdout")
+    exporting.add_argument("--context", action="store_true", help="include packed model contexts")
+    importing = commands.add_parser("import", help="store answers read from NDJSON")
+    importing.add_argument("path", help="file to read, - for stdin")
+    importing.add_argument("--on-conflict", choices=CONFLICT_POLICIES, default="skip")
+    args = parser.parse_args(argv)
+
+    if session_factory is None:
+        # migrated first, a new node is seeded before it ever ran
+        import src.db.database as database
+        database.run_migrations()
+        session_factory = database.SessionLocal
+
+    with session_factory() as db:
+        if args.command == "export":
+            progress = Progress("exported")
+            with open_output(args.path) as out:
+                export_history(db, out, with_context=args.context, progress=progress)
+        else:
+            size = None if args.path == "-" else os.path.getsize(args.path)
+            progress = Progress("read", total_bytes=size)
+            with open_input(args.path) as lines:
+                report = import_history(db, lines, on_conflict=args.on_conflict, progress=progress)
+            sys.stderr.write(
+                f"inserted {report.inserted}, replaced {report.replaced}, "
+                f"skipped {report.skipped}, invalid {report.invalid}\n"
+            )
+        progress.report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Routes short prompts to a smaller, faster model while the main one is backed up"""
+import contextlib
+import logging
+from logging import Logger
+from typing import Iterator, Optional
+
+from src.llm.models import GenerationResponseComplete
+
+logger: Logger = logging.getLogger(__name__)
+
+# weight of the latest generation in the tokens/sec average
+TPS_WEIGHT: float = 0.3
+
+
+class Cascade:
+    """
+    Decides which model answers, from generations in flight on the main model, its recent
+    tokens/sec and prompt length. Degrades once the queue reaches max_queue or speed drops
+    below min_tps, and upgrades back once the queue is down to half and speed recovered,
+    so it does not flap around the limits. Long prompts always go to the main model.
+    """
+
+    def __init__(self, primary: str, fallback: str, max_queue: int, min_tps: float, max_prompt_len: int) -> None:
+        self.primary = primary
+        self.fallback = fallback
+        self.max_queue = max_queue
+        self.min_tps = min_tps
+        self.max_prompt_len = max_prompt_len
+        self.in_flight: int = 0
+        # moving average of the main model, none until it answers once
+        self.tps: Optional[float] = None
+        self.degraded: bool = False
+        self.routed: dict[str, int] = {primary: 0, fallback: 0}
+
+    def slow(self) -> bool:
+        return self.min_tps > 0 and self.tps is not None and self.tps < self.min_tps
+
+    def degrading(self) -> bool:
+        """Whether short prompts go to the fallback model under current load"""
+
+        if not self.degraded and (self.in_flight >= self.max_queue or self.slow()):
+            logger.warning("degrading to %s, %d in flight, %.1f tokens/s", self.fallback, self.in_flight, self.tps or 0)
+            self.degraded = True
+        # an idle main model is worth a try, its next answer refreshes the speed
+        elif self.degraded and self.in_flight <= self.max_queue // 2 and (not self.slow() or self.in_flight == 0):
+            logger.info("upgrading back to %s, %d in flight", self.primary, self.in_flight)
+            self.degraded = False
+        return self.degraded
+
+    def choose(self, prompt: str) -> str:
+        """Model to answer the prompt with, under current load"""
+
+        model = self.fallback if self.degrading() and len(prompt) <= self.max_prompt_len else self.primary
+        self.routed[model] += 1
+        return model
+
+    def record(self, complete: GenerationResponseComplete) -> None:
+        """Updates speed of the main model from the final stats of its generation"""
+
+        seconds = complete.eval_duration.total_seconds()
+        if complete.model != self.primary or seconds <= 0:
+            return
+        tps = complete.eval_count / seconds
+        self.tps = tps if self.tps is None else TPS_WEIGHT * tps + (1 - TPS_WEIGHT) * self.tps
+
+    @contextlib.contextmanager
+    def track(self, model: str) -> Iterator[None]:
+        """Counts a generation on the main model in flight, for its whole duration"""
+
+        queued = 1 if model == self.primary else 0
+        self.in_flight += queued
+        try:
+            yield
+        finally:
+            self.in_flight -= queued
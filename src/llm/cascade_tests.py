@@ -0,0 +1,55 @@
+import datetime
+import unittest
+
+from src.llm.cascade import Cascade
+from src.llm.models import GenerationResponseComplete
+
+SHORT = "why is the sky blue?"
+LONG = "compare rayleigh and mie scattering, and explain which one colours sunsets and which one clouds"
+
+
+def complete(model: str, eval_count: int, seconds: float) -> GenerationResponseComplete:
+    return GenerationResponseComplete(
+        model=model, created_at=datetime.datetime.now(), response="", done=True, done_reason="stop",
+        context=[1], total_duration=1, load_duration=1, prompt_eval_count=1, prompt_eval_duration=1,
+        eval_count=eval_count, eval_duration=int(seconds * 1e9),
+    )
+
+
+class TestCascade(unittest.TestCase):
+
+    def setUp(self):
+        self.cascade = Cascade("deepseek-r1:1.5b", "qwen2.5:0.5b", max_queue=2, min_tps=10, max_prompt_len=64)
+
+    def test_degrades_under_queue_and_upgrades_once_drained(self):
+        cascade = self.cascade
+        self.assertEqual(cascade.primary, cascade.choose(SHORT))
+        with cascade.track(cascade.primary), cascade.track(cascade.primary):
+            self.assertEqual(cascade.fallback, cascade.choose(SHORT))
+            self.assertEqual(cascade.primary, cascade.choose(LONG))
+            with cascade.track(cascade.fallback):
+                self.assertEqual(2, cascade.in_flight)
+        self.assertEqual(0, cascade.in_flight)
+        self.assertEqual(cascade.primary, cascade.choose(SHORT))
+        self.assertEqual({cascade.primary: 3, cascade.fallback: 1}, cascade.routed)
+
+    def test_degrades_while_main_model_is_slow(self):
+        cascade = self.cascade
+        cascade.record(complete(cascade.fallback, 5, 1))
+        self.assertIsNone(cascade.tps)
+        cascade.record(complete(cascade.primary, 5, 1))
+        with cascade.track(cascade.primary):
+            self.assertEqual(cascade.fallback, cascade.choose(SHORT))
+        # idle main model gets another chance
+        self.assertEqual(cascade.primary, cascade.choose(SHORT))
+
+    def test_recovery_is_noticed_without_choosing(self):
+        cascade = self.cascade
+        with cascade.track(cascade.primary), cascade.track(cascade.primary):
+            self.assertTrue(cascade.degrading())
+        self.assertFalse(cascade.degrading())
+        self.assertEqual({cascade.primary: 0, cascade.fallback: 0}, cascade.routed)
+
+
+if __name__ == "__main__":
+    unittest.main()
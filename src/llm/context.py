@@ -0,0 +1,60 @@
+"""Model context of a conversation turn, packed to keep it small"""
+import logging
+import zlib
+from array import array
+from collections import OrderedDict
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def pack_context(context: Optional[List[int]]) -> Optional[bytes]:
+    """Token ids as compressed 32bit array, several times smaller than a list of ints"""
+
+    if not context:
+        return None
+    return zlib.compress(array("I", context).tobytes())
+
+
+def unpack_context(packed: Optional[bytes]) -> Optional[List[int]]:
+    if not packed:
+        return None
+    tokens = array("I")
+    tokens.frombytes(zlib.decompress(packed))
+    return tokens.tolist()
+
+
+class ContextStore:
+    """
+    Recently used packed contexts by record id.
+    Least recently used are evicted once total size goes over budget,
+    evicted contexts are still loaded from the db on demand.
+    """
+
+    def __init__(self, budget: int) -> None:
+        assert budget > 0
+        self.budget = budget
+        self.used = 0
+        self.contexts: OrderedDict[int, bytes] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.contexts)
+
+    def get(self, record_id: int) -> Optional[bytes]:
+        packed = self.contexts.get(record_id)
+        if packed is not None:
+            self.contexts.move_to_end(record_id)
+        return packed
+
+    def put(self, record_id: int, packed: Optional[bytes]) -> None:
+        if packed is None or len(packed) > self.budget:
+            return
+        previous = self.contexts.pop(record_id, None)
+        if previous is not None:
+            self.used -= len(previous)
+        self.contexts[record_id] = packed
+        self.used += len(packed)
+        while self.used > self.budget:
+            _, evicted = self.contexts.popitem(last=False)
+            self.used -= len(evicted)
+            logger.debug("evicted context of %d bytes, %d in use", len(evicted), self.used)
@@ -0,0 +1,43 @@
+import unittest
+
+from src.llm.context import ContextStore, pack_context, unpack_context
+
+CONTEXT = [151644, 10234, 374, 279, 12884, 6303, 30, 151645] * 64
+
+
+class TestContext(unittest.TestCase):
+
+    def test_pack_roundtrip(self):
+        packed = pack_context(CONTEXT)
+        self.assertEqual(CONTEXT, unpack_context(packed))
+        self.assertLess(len(packed), len(CONTEXT) * 4)
+
+    def test_pack_empty(self):
+        self.assertIsNone(pack_context([]))
+        self.assertIsNone(pack_context(None))
+        self.assertIsNone(unpack_context(None))
+
+    def test_store_evicts_least_recent_over_budget(self):
+        store = ContextStore(budget=25)
+        store.put(1, b"a" * 10)
+        store.put(2, b"b" * 10)
+        store.get(1)
+        store.put(3, b"c" * 10)
+        self.assertEqual(2, len(store))
+        self.assertIsNone(store.get(2))
+        self.assertEqual(b"a" * 10, store.get(1))
+        self.assertEqual(20, store.used)
+
+    def test_store_skips_oversized(self):
+        store = ContextStore(budget=5)
+        store.put(1, b"a" * 10)
+        self.assertEqual(0, len(store))
+
+    def test_store_replaces(self):
+        store = ContextStore(budget=25)
+        store.put(1, b"a" * 10)
+        store.put(1, b"b" * 5)
+        self.assertEqual(5, store.used)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+"""Text embeddings, from Ollama, and a deterministic local stand-in for tests"""
+import hashlib
+import logging
+import re
+from typing import List
+
+import numpy as np
+
+from src.llm import ollama
+
+logger = logging.getLogger(__name__)
+
+LOCAL_DIM: int = 256
+WORD_RE = re.compile(r"\w+")
+
+
+def _bucket(feature: str) -> tuple[int, float]:
+    """stable across processes, unlike builtin hash"""
+    digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+    value = int.from_bytes(digest, "little")
+    return value % LOCAL_DIM, 1.0 if value >> 63 else -1.0
+
+
+def local_embedding(text: str) -> List[float]:
+    """
+    Hashed bag of words and character trigrams, for tests only, it does not capture meaning.
+    Ignores case, punctuation and word order, tolerates small typos.
+    """
+
+    vector = np.zeros(LOCAL_DIM, dtype=np.float32)
+    for word in WORD_RE.findall(text.lower()):
+        bucket, sign = _bucket(word)
+        vector[bucket] += sign
+        padded = f"#{word}#"
+        for i in range(len(padded) - 2):
+            bucket, sign = _bucket(padded[i:i + 3])
+            vector[bucket] += sign * 0.5
+    norm = float(np.linalg.norm(vector))
+    if norm > 0:
+        vector /= norm
+    return vector.tolist()
+
+
+async def embed(text: str) -> List[float]:
+    """Embeds with the configured model"""
+
+    return await ollama.embed(text)
@@ -0,0 +1,32 @@
+import unittest
+
+import numpy as np
+
+from src.llm.embedding import local_embedding, LOCAL_DIM
+
+
+def similarity(a: str, b: str) -> float:
+    return float(np.dot(local_embedding(a), local_embedding(b)))
+
+
+class TestLocalEmbedding(unittest.TestCase):
+
+    def test_deterministic_unit_vector(self):
+        vector = local_embedding("Why is the sky blue?")
+        self.assertEqual(LOCAL_DIM, len(vector))
+        self.assertEqual(vector, local_embedding("Why is the sky blue?"))
+        self.assertAlmostEqual(1.0, float(np.linalg.norm(vector)), places=5)
+
+    def test_ignores_case_punctuation_and_order(self):
+        self.assertAlmostEqual(1.0, similarity("Why is the sky blue?", "why IS the sky blue"), places=5)
+        self.assertAlmostEqual(1.0, similarity("Why is the sky blue?", "the sky, why is blue"), places=5)
+
+    def test_different_queries_are_apart(self):
+        self.assertGreater(similarity("Why is the sky blue?", "why is the skye blue"), 0.8)
+        self.assertLess(similarity("Why is the sky blue?", "How do magnets work?"), 0.5)
+
+    def test_empty_text(self):
+        self.assertEqual(0.0, float(np.linalg.norm(local_embedding("?!"))))
+
+if __name__ == '__main__':
+    unittest.main()
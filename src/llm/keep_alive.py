@@ -0,0 +1,100 @@
+"""Keeps the model loaded, so users do not wait for it to load after quiet periods"""
+import asyncio
+import datetime
+import logging
+import time
+from logging import Logger
+from typing import Optional, Tuple
+
+import httpx
+
+from src.llm import ollama
+
+logger: Logger = logging.getLogger(__name__)
+
+# warm models report load durations in milliseconds, loading from disk takes seconds
+COLD_LOAD: datetime.timedelta = datetime.timedelta(milliseconds=500)
+
+
+class LoadStats:
+    """Counts generations that found the model loaded, and ones that had to wait for it"""
+
+    def __init__(self) -> None:
+        self.cold: int = 0
+        self.warm: int = 0
+        self.last_load: Optional[datetime.timedelta] = None
+        # monotonic time of the last generation or heartbeat
+        self.last_used: Optional[float] = None
+
+    def record(self, load_duration: datetime.timedelta) -> None:
+        if load_duration >= COLD_LOAD:
+            self.cold += 1
+            logger.warning("model was not loaded, generation waited %.1fs", load_duration.total_seconds())
+        else:
+            self.warm += 1
+        self.last_load = load_duration
+        self.touch()
+
+    def touch(self) -> None:
+        self.last_used = time.monotonic()
+
+    def idle_for(self) -> float:
+        """Seconds since the model was last used, infinite if never"""
+
+        return float("inf") if self.last_used is None else time.monotonic() - self.last_used
+
+
+stats = LoadStats()
+
+
+def parse_hours(hours: str) -> Optional[Tuple[int, int]]:
+    """
+    Parses "start-end" local hours, end excluded, may wrap over midnight like 22-6.
+    Empty means all day.
+
+    :raises ValueError: if hours are not within 0-24
+    """
+
+    if hours.strip() == "":
+        return None
+    start, end = (int(hour) for hour in hours.split("-", 1))
+    if not (0 <= start <= 24 and 0 <= end <= 24):
+        raise ValueError(f"hours must be within 0-24, not {hours}")
+    return start, end
+
+
+def in_hours(hours: Optional[Tuple[int, int]], now: datetime.datetime) -> bool:
+    if hours is None:
+        return True
+    start, end = hours
+    if start <= end:
+        return start <= now.hour < end
+    return now.hour >= start or now.hour < end
+
+
+async def preload() -> bool:
+    """Loads the model ahead of the first user, false if ollama could not be reached"""
+
+    started = time.perf_counter()
+    try:
+        loaded = await ollama.preload()
+    except (httpx.HTTPError, ValueError) as e:
+        logger.error("failed to preload model, %s", e)
+        return False
+    stats.touch()
+    logger.info("model %s loaded in %.2fs", loaded.model, time.perf_counter() - started)
+    return True
+
+
+async def heartbeat(interval: int, hours: Optional[Tuple[int, int]]) -> None:
+    """
+    Preloads the model every interval seconds within hours, unless it was used meanwhile,
+    so keep_alive never runs out while users are expected. Runs until cancelled.
+    """
+
+    while True:
+        await asyncio.sleep(interval)
+        if stats.idle_for() < interval or not in_hours(hours, datetime.datetime.now()):
+            continue
+        logger.debug("model idle for %.0fs, heartbeat", stats.idle_for())
+        await preload()
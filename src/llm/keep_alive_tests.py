@@ -0,0 +1,34 @@
+import datetime
+import unittest
+
+from src.llm.keep_alive import COLD_LOAD, LoadStats, in_hours, parse_hours
+
+
+class TestKeepAlive(unittest.TestCase):
+
+    def test_counts_cold_and_warm_loads(self):
+        stats = LoadStats()
+        self.assertEqual(float("inf"), stats.idle_for())
+        stats.record(datetime.timedelta(milliseconds=20))
+        stats.record(COLD_LOAD * 4)
+        stats.record(datetime.timedelta(milliseconds=10))
+        self.assertEqual(1, stats.cold)
+        self.assertEqual(2, stats.warm)
+        self.assertLess(stats.idle_for(), 1)
+
+    def test_hours(self):
+        self.assertIsNone(parse_hours(""))
+        business = parse_hours("8-18")
+        self.assertEqual((8, 18), business)
+        self.assertTrue(in_hours(business, datetime.datetime(2026, 1, 5, 8, 0)))
+        self.assertFalse(in_hours(business, datetime.datetime(2026, 1, 5, 18, 0)))
+        overnight = parse_hours("22-6")
+        self.assertTrue(in_hours(overnight, datetime.datetime(2026, 1, 5, 23, 30)))
+        self.assertTrue(in_hours(overnight, datetime.datetime(2026, 1, 5, 5, 59)))
+        self.assertFalse(in_hours(overnight, datetime.datetime(2026, 1, 5, 12, 0)))
+        with self.assertRaises(ValueError):
+            parse_hours("8-25")
+
+
+if __name__ == "__main__":
+    unittest.main()
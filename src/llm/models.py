@@ -1,5 +1,5 @@
 from datetime import datetime, timedelta
-from typing import List
+from typing import List, Optional
 
 from pydantic import BaseModel, Field, field_validator
 
@@ -10,6 +10,35 @@ from pydantic import BaseModel, Field, field_validator
 class GenerationRequest(BaseModel):
     model: str = Field(..., min_length=9, max_length=50)
     prompt: str = Field(str, min_length=9, max_length=1024)
+    # context returned by the previous turn, continues the conversation
+    context: Optional[List[int]] = None
+    # how long the model stays loaded after this request, duration like "30m", or seconds
+    keep_alive: Optional[str | int] = None
+
+# curl http://localhost:11434/api/generate -d '{
+#   "model": "deepseek-r1:1.5b",
+#   "keep_alive": "30m"
+# }'
+class PreloadRequest(BaseModel):
+    model: str = Field(..., min_length=9, max_length=50)
+    keep_alive: Optional[str | int] = None
+
+# {
+#   "model":"deepseek-r1:1.5b",
+#   "created_at":"2025-02-20T22:01:10.664459Z",
+#   "response":"",
+#   "done":true,
+#   "done_reason":"load"
+# }
+class PreloadResponse(BaseModel):
+    model: str
+    done: bool
+    done_reason: Optional[str] = None
+    load_duration: Optional[timedelta] = None
+
+    @field_validator('load_duration', mode='before')
+    def convert_nanoseconds_to_timedelta(cls, value: Optional[int]):
+        return None if value is None else timedelta(seconds=float(value) / 1e9)
 
 # {
 #   "model":"deepseek-r1:1.5b",
@@ -60,4 +89,23 @@ class GenerationResponseComplete(GenerationResponse):
 
     @field_validator('total_duration', 'load_duration', 'prompt_eval_duration', 'eval_duration', mode='before')
     def convert_nanoseconds_to_timedelta(cls, value: int):
-        return timedelta(seconds=float(value) / 1e9)
\ No newline at end of file
+        return timedelta(seconds=float(value) / 1e9)
+
+# curl http://localhost:11434/api/embed -d '{
+#   "model": "nomic-embed-text",
+#   "input": "Why is the sky blue?"
+# }'
+class EmbeddingRequest(BaseModel):
+    model: str = Field(..., min_length=1, max_length=50)
+    input: str = Field(..., min_length=1, max_length=1024)
+
+# {
+#   "model":"nomic-embed-text",
+#   "embeddings":[[0.010071029, -0.0017594862, 0.05007221, 0.04692972, ...]],
+#   "total_duration":14143917,
+#   "load_duration":1019500,
+#   "prompt_eval_count":8
+# }
+class EmbeddingResponse(BaseModel):
+    model: str
+    embeddings: List[List[float]] = Field(..., min_length=1)
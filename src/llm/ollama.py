@@ -1,12 +1,28 @@
+import asyncio
 import json
 import logging
 from json import JSONDecodeError
-from typing import Optional, AsyncGenerator
+from typing import AsyncGenerator, AsyncIterator, Callable, List, Optional
 
 import httpx
 from pydantic import ValidationError
 
-from src.llm.models import GenerationRequest, GenerationResponse, GenerationResponseComplete
+from src.llm.models import (
+    EmbeddingRequest,
+    EmbeddingResponse,
+    GenerationRequest,
+    GenerationResponse,
+    GenerationResponseComplete,
+    PreloadRequest,
+    PreloadResponse,
+)
+from src.llm.resilience import (
+    CircuitBreaker,
+    Deadlines,
+    GenerationTimeout,
+    OllamaUnavailable,
+    backoff,
+)
 from src.utils.env_config import read_env, EnvConfig
 
 logger = logging.getLogger(__name__)
@@ -27,30 +43,149 @@ def parse_generation_line(line: str) -> GenerationResponse:
     except ValidationError as e:
         raise ValueError("Validation failed for response data") from e
 
-async def generate(prompt: str) -> AsyncGenerator[Optional[GenerationResponse | ValueError], None]:
+_breaker: Optional[CircuitBreaker] = None
+
+def circuit_breaker() -> CircuitBreaker:
+    """Shared by all generations, configured on first use"""
+    global _breaker
+    if _breaker is None:
+        conf: EnvConfig = read_env()
+        _breaker = CircuitBreaker(conf.breaker_threshold, conf.breaker_window, conf.breaker_cooldown)
+    return _breaker
+
+def retryable(error: Exception) -> bool:
+    """Failures worth another try, as long as nothing was streamed yet"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return isinstance(error, (httpx.TransportError, GenerationTimeout))
+
+async def read_chunks(
+        lines: AsyncIterator[str],
+        deadlines: Deadlines,
+        on_skip: Optional[Callable[[str], None]] = None,
+) -> AsyncGenerator[GenerationResponse, None]:
     """
-    Asynchronously yields generated responses chunk by chunk
+    Parses streamed lines, each awaited within its token deadline.
+    Lines that fail to parse are skipped and passed to on_skip, their text is lost.
 
-    :raises ValueError: if json parsing or validation fails
+    :raises GenerationTimeout: if a deadline runs out
+    """
+    streaming = False
+    while True:
+        try:
+            raw_line = await asyncio.wait_for(anext(lines), deadlines.next_token(first=not streaming))
+        except StopAsyncIteration:
+            return
+        except TimeoutError as e:
+            phase = "next" if streaming else "first"
+            raise GenerationTimeout(f"no {phase} token from ollama in time") from e
+        line = raw_line.strip()
+        if not line:
+            continue
+        try:
+            parsed_response = parse_generation_line(line)
+        except ValueError as e:
+            logger.error("Failed to parse response chunk: %s, %s", line, e)
+            if on_skip is not None:
+                on_skip(line)
+            continue
+        streaming = True
+        yield parsed_response
+
+async def generate(
+        prompt: str,
+        context: Optional[List[int]] = None,
+        model: Optional[str] = None,
+        on_skip: Optional[Callable[[str], None]] = None,
+) -> AsyncGenerator[GenerationResponse, None]:
+    """
+    Asynchronously yields generated responses chunk by chunk.
+    Connecting and waiting for the first token are retried with backoff,
+    once streaming, failures are raised. Lines that fail to parse are skipped.
+
+    :param prompt: user query
+    :param context: returned by previous turn, lets the model skip re-evaluating it
+    :param model: to generate with, the configured one by default
+    :param on_skip: called with each line skipped
+    :raises CircuitOpenError: without calling ollama, while it keeps failing
+    :raises GenerationTimeout: if a deadline runs out
+    :raises httpx.HTTPError: if the request fails
     """
     conf: EnvConfig = read_env()
-    async with httpx.AsyncClient() as client:
-        async with client.stream(
-            "POST",
-            f"{conf.model_url}api/generate",
-            json=GenerationRequest(model=conf.model_name, prompt=prompt).model_dump()
-        ) as response:
-            ##
-            content = await response.aread()
-            print("Raw llm response:", content)
-            ##
-            async for raw_line in response.aiter_lines():
-                line = raw_line.strip()
-                if not line:
-                    continue
+    request = GenerationRequest(
+        model=model or conf.model_name,
+        prompt=prompt,
+        context=context,
+        keep_alive=conf.keep_alive,
+    )
+    breaker = circuit_breaker()
+    breaker.allow()
+    deadlines = Deadlines(conf.connect_timeout, conf.first_token_timeout, conf.inter_token_timeout, conf.total_timeout)
+    # socket reads are bounded by the token deadlines below
+    timeout = httpx.Timeout(deadlines.total, connect=deadlines.connect)
+    streaming = False
+    try:
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            for attempt in range(conf.retries + 1):
                 try:
-                    parsed_response = parse_generation_line(line)
-                    yield parsed_response
-                except ValueError as e:
-                    logger.error("Failed to parse response chunk: %s, %s", line, e)
-                    yield e
\ No newline at end of file
+                    async with client.stream(
+                        "POST",
+                        f"{conf.model_url}api/generate",
+                        json=request.model_dump(exclude_none=True)
+                    ) as response:
+                        response.raise_for_status()
+                        chunks = read_chunks(response.aiter_lines(), deadlines, on_skip)
+                        async for parsed_response in chunks:
+                            streaming = True
+                            yield parsed_response
+                    breaker.record(success=True)
+                    return
+                except (httpx.HTTPError, GenerationTimeout) as e:
+                    if streaming or attempt == conf.retries or not retryable(e):
+                        raise
+                    delay = backoff(attempt)
+                    logger.warning("generation attempt %d failed, retrying in %.2fs, %s", attempt + 1, delay, e)
+                    await asyncio.sleep(delay)
+    except (httpx.HTTPError, OllamaUnavailable):
+        breaker.record(success=False)
+        raise
+    finally:
+        # consumer went away, or the request was cancelled
+        breaker.abandon()
+
+async def preload() -> PreloadResponse:
+    """
+    Loads the configured model without generating, and keeps it loaded for keep_alive
+
+    :raises ValueError: if the response is not valid
+    :raises httpx.HTTPError: if the request fails
+    """
+    conf: EnvConfig = read_env()
+    request = PreloadRequest(model=conf.model_name, keep_alive=conf.keep_alive)
+    # loading from disk may take a while on a cold start
+    async with httpx.AsyncClient(timeout=120) as client:
+        response = await client.post(f"{conf.model_url}api/generate", json=request.model_dump(exclude_none=True))
+        response.raise_for_status()
+    try:
+        return PreloadResponse.model_validate_json(response.content)
+    except ValidationError as e:
+        raise ValueError("Validation failed for preload response") from e
+
+async def embed(text: str) -> List[float]:
+    """
+    Computes embedding of the text with the configured embedding model
+
+    :raises ValueError: if the response is not a valid embedding
+    :raises httpx.HTTPError: if the request fails
+    """
+    conf: EnvConfig = read_env()
+    async with httpx.AsyncClient() as client:
+        response = await client.post(
+            f"{conf.model_url}api/embed",
+            json=EmbeddingRequest(model=conf.embed_model, input=text).model_dump(),
+        )
+        response.raise_for_status()
+    try:
+        return EmbeddingResponse.model_validate_json(response.content).embeddings[0]
+    except ValidationError as e:
+        raise ValueError("Validation failed for embedding data") from e
@@ -0,0 +1,89 @@
+"""Reasoning of thinking models, split from the answer while tokens stream in"""
+import logging
+from logging import Logger
+from typing import Tuple
+
+logger: Logger = logging.getLogger(__name__)
+
+OPEN: str = "<think>"
+CLOSE: str = "</think>"
+
+# before any text, inside the reasoning block, between block and answer, in the answer
+START, THINKING, AFTER, ANSWER = range(4)
+
+
+def partial_tag(text: str, tag: str) -> int:
+    """Length of the longest end of text that starts tag, which the next chunk may complete"""
+
+    for length in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:length]):
+            return length
+    return 0
+
+
+class ThinkSplitter:
+    """
+    Splits a streamed response into reasoning and answer. Only a block opening the response counts,
+    answers mentioning the tags are left alone. Text that may be the start of a tag is held back
+    until the next chunk decides, so tags may be split across chunks anyhow.
+    """
+
+    def __init__(self) -> None:
+        self.state: int = START
+        self.pending: str = ""
+
+    def feed(self, chunk: str) -> Tuple[str, str]:
+        """Reasoning and answer text that can be passed on so far"""
+
+        text = self.pending + chunk
+        self.pending = ""
+        reasoning = ""
+        if self.state == START:
+            stripped = text.lstrip()
+            if stripped.startswith(OPEN):
+                self.state = THINKING
+                text = stripped[len(OPEN):]
+            elif OPEN.startswith(stripped):
+                # blank so far, or the beginning of the tag
+                self.pending = text
+                return "", ""
+            else:
+                self.state = ANSWER
+        if self.state == THINKING:
+            end = text.find(CLOSE)
+            if end < 0:
+                held = partial_tag(text, CLOSE)
+                self.pending = text[len(text) - held:] if held > 0 else ""
+                return text[:len(text) - held], ""
+            reasoning = text[:end]
+            text = text[end + len(CLOSE):]
+            self.state = AFTER
+        if self.state == AFTER:
+            # blank lines models put after the block
+            text = text.lstrip()
+            if text == "":
+                return reasoning, ""
+            self.state = ANSWER
+        return reasoning, text
+
+    def close(self) -> Tuple[str, str]:
+        """Text held back when the stream ends, an unclosed block is all reasoning"""
+
+        text = self.pending
+        self.pending = ""
+        if self.state == THINKING:
+            logger.debug("response ended inside the reasoning block")
+            return text, ""
+        if self.state == AFTER:
+            return "", ""
+        self.state = ANSWER
+        return "", text
+
+
+def split(response: str) -> Tuple[str, str]:
+    """Reasoning and answer of a whole response"""
+
+    splitter = ThinkSplitter()
+    reasoning, answer = splitter.feed(response)
+    rest_reasoning, rest_answer = splitter.close()
+    return reasoning + rest_reasoning, answer + rest_answer
@@ -0,0 +1,47 @@
+import unittest
+from typing import List, Tuple
+
+from src.llm.reasoning import ThinkSplitter, split
+
+RESPONSE = "<think>\nokay, the user asks about the sky\n</think>\n\nRayleigh scattering."
+
+
+def feed_all(chunks: List[str]) -> Tuple[str, str]:
+    splitter = ThinkSplitter()
+    reasoning, answer = "", ""
+    for chunk in chunks + [None]:
+        part = splitter.close() if chunk is None else splitter.feed(chunk)
+        reasoning += part[0]
+        answer += part[1]
+    return reasoning, answer
+
+
+class TestThinkSplitter(unittest.TestCase):
+
+    def test_whole_response(self):
+        self.assertEqual(("\nokay, the user asks about the sky\n", "Rayleigh scattering."), split(RESPONSE))
+
+    def test_tags_split_at_every_position(self):
+        for size in range(1, 10):
+            chunks = [RESPONSE[i:i + size] for i in range(0, len(RESPONSE), size)]
+            self.assertEqual(split(RESPONSE), feed_all(chunks), f"chunks of {size}")
+
+    def test_answer_is_passed_on_as_it_comes(self):
+        splitter = ThinkSplitter()
+        self.assertEqual(("", ""), splitter.feed("<thi"))
+        self.assertEqual(("hmm", ""), splitter.feed("nk>hmm</"))
+        self.assertEqual(("", "Blue"), splitter.feed("think>\n\nBlue"))
+        self.assertEqual(("", " sky"), splitter.feed(" sky"))
+
+    def test_without_reasoning(self):
+        self.assertEqual(("", "just an answer"), feed_all(["just ", "an answer"]))
+        # tags later in the answer are text
+        self.assertEqual(("", "use <think> tags"), split("use <think> tags"))
+        self.assertEqual(("", "<thinking>"), feed_all(["<th", "inking>"]))
+
+    def test_unclosed_block_is_reasoning(self):
+        self.assertEqual(("cut short</thi", ""), feed_all(["<think>cut short</thi"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+"""Failure handling for ollama calls: circuit breaker, retry backoff and errors surfaced to routes"""
+import collections
+import logging
+import random
+import time
+from logging import Logger
+from typing import Callable, Deque
+
+logger: Logger = logging.getLogger(__name__)
+
+# first retry waits up to BACKOFF_BASE seconds, doubling up to BACKOFF_CAP
+BACKOFF_BASE: float = 0.2
+BACKOFF_CAP: float = 2.0
+# failure rate is not judged on fewer calls
+MIN_CALLS: int = 5
+
+
+class OllamaUnavailable(Exception):
+    """Ollama could not answer, routes turn it into 503"""
+
+    def __init__(self, message: str, retry_after: int = 1) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(OllamaUnavailable):
+    """Failing fast, recent calls mostly failed"""
+
+
+class GenerationTimeout(OllamaUnavailable):
+    """A deadline of the generation ran out"""
+
+
+def backoff(attempt: int, rng: random.Random = random) -> float:
+    """Full jitter, so retries of many requests failing at once do not arrive together"""
+
+    return rng.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Opens once the failure rate over the last window calls reaches threshold,
+    and fails calls fast for cooldown seconds. Then lets a single trial call through,
+    which closes it on success and opens it again on failure.
+    """
+
+    CLOSED: str = "closed"
+    OPEN: str = "open"
+    HALF_OPEN: str = "half_open"
+
+    def __init__(
+            self,
+            threshold: float,
+            window: int,
+            cooldown: float,
+            clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state: str = self.CLOSED
+        # True for failures
+        self.outcomes: Deque[bool] = collections.deque(maxlen=window)
+        self.opened_at: float = 0
+        self.trial: bool = False
+        self.opened: int = 0
+        self.rejected: int = 0
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.cooldown - self.clock())
+
+    def failure_rate(self) -> float:
+        return 0 if len(self.outcomes) == 0 else sum(self.outcomes) / len(self.outcomes)
+
+    def allow(self) -> None:
+        """
+        Admits a call, which has to be followed by record or abandon
+
+        :raises CircuitOpenError: while open, or while the trial call runs
+        """
+
+        if self.state == self.OPEN and self.retry_after() <= 0:
+            logger.info("circuit half open, trying ollama again")
+            self.state = self.HALF_OPEN
+        if self.state == self.CLOSED:
+            return
+        if self.state == self.HALF_OPEN and not self.trial:
+            self.trial = True
+            return
+        self.rejected += 1
+        raise CircuitOpenError("ollama is failing, not calling it for now", retry_after=int(self.retry_after()) + 1)
+
+    def record(self, success: bool) -> None:
+        if self.state == self.HALF_OPEN:
+            self.trial = False
+            if success:
+                logger.info("circuit closed, ollama answers again")
+                self.state = self.CLOSED
+                self.outcomes.clear()
+            else:
+                self._open()
+            return
+        self.outcomes.append(not success)
+        if (
+                self.state == self.CLOSED
+                and len(self.outcomes) >= MIN_CALLS
+                and self.failure_rate() >= self.threshold
+        ):
+            self._open()
+
+    def abandon(self) -> None:
+        """Call ended without telling if ollama is fine, like a client going away"""
+
+        if self.state == self.HALF_OPEN:
+            self.trial = False
+
+    def _open(self) -> None:
+        logger.error("circuit open, failure rate %.2f, failing fast for %.0fs", self.failure_rate(), self.cooldown)
+        self.state = self.OPEN
+        self.opened_at = self.clock()
+        self.opened += 1
+
+    def snapshot(self) -> dict:
+        """State for monitoring"""
+
+        return {
+            "state": self.state,
+            "failure_rate": self.failure_rate(),
+            "calls": len(self.outcomes),
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "retry_after": self.retry_after() if self.state == self.OPEN else None,
+        }
+
+
+class Deadlines:
+    """Seconds each phase of a generation may take"""
+
+    def __init__(self, connect: float, first_token: float, inter_token: float, total: float) -> None:
+        self.connect = connect
+        self.first_token = first_token
+        self.inter_token = inter_token
+        self.total = total
+        self.started: float = time.monotonic()
+
+    def remaining(self) -> float:
+        return self.total - (time.monotonic() - self.started)
+
+    def next_token(self, first: bool) -> float:
+        """
+        Time to wait for the next line
+
+        :raises GenerationTimeout: if the total deadline ran out
+        """
+
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise GenerationTimeout(f"generation took over {self.total}s")
+        return min(self.first_token if first else self.inter_token, remaining)
+
@@ -0,0 +1,77 @@
+import random
+import unittest
+
+from src.llm.resilience import BACKOFF_CAP, CircuitBreaker, CircuitOpenError, Deadlines, GenerationTimeout, backoff
+
+
+class Clock:
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.breaker = CircuitBreaker(threshold=0.5, window=10, cooldown=30, clock=self.clock)
+
+    def fail(self, times: int) -> None:
+        for _ in range(times):
+            self.breaker.allow()
+            self.breaker.record(success=False)
+
+    def test_opens_over_threshold_and_fails_fast(self):
+        self.breaker.allow()
+        self.breaker.record(success=True)
+        self.fail(3)
+        self.assertEqual(CircuitBreaker.CLOSED, self.breaker.state)
+        self.fail(1)
+        self.assertEqual(CircuitBreaker.OPEN, self.breaker.state)
+        with self.assertRaises(CircuitOpenError) as raised:
+            self.breaker.allow()
+        self.assertEqual(31, raised.exception.retry_after)
+        self.assertEqual(1, self.breaker.snapshot()["rejected"])
+
+    def test_single_trial_after_cooldown(self):
+        self.fail(5)
+        self.clock.now = 31
+        self.breaker.allow()
+        self.assertEqual(CircuitBreaker.HALF_OPEN, self.breaker.state)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.allow()
+        self.breaker.record(success=False)
+        self.assertEqual(CircuitBreaker.OPEN, self.breaker.state)
+
+        self.clock.now = 62
+        self.breaker.allow()
+        self.breaker.abandon()
+        self.breaker.allow()
+        self.breaker.record(success=True)
+        self.assertEqual(CircuitBreaker.CLOSED, self.breaker.state)
+        self.assertEqual(0, self.breaker.failure_rate())
+        self.assertEqual(2, self.breaker.opened)
+
+
+class TestRetries(unittest.TestCase):
+
+    def test_backoff_is_jittered_and_capped(self):
+        rng = random.Random(1)
+        delays = [backoff(attempt, rng) for attempt in range(10)]
+        self.assertTrue(all(0 <= delay <= BACKOFF_CAP for delay in delays))
+        self.assertGreater(len(set(delays)), 1)
+
+    def test_deadlines(self):
+        deadlines = Deadlines(connect=1, first_token=60, inter_token=5, total=30)
+        self.assertLessEqual(deadlines.next_token(first=True), 30)
+        self.assertEqual(5, deadlines.next_token(first=False))
+        deadlines.started -= 31
+        with self.assertRaises(GenerationTimeout):
+            deadlines.next_token(first=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+"""Batch request and its streamed results"""
+from typing import List, Optional
+
+from pydantic import BaseModel, Field, field_validator
+
+
+class BatchRequest(BaseModel):
+    """Many standalone queries at once"""
+
+    queries: List[str] = Field(..., min_length=1, max_length=256)
+
+    @field_validator("queries")
+    @classmethod
+    def queries_must_be_valid(cls, queries: List[str]) -> List[str]:
+        """Same limits as a single query"""
+
+        for query in queries:
+            if len(query) < 5 or len(query) > 128 or not query.strip():
+                raise ValueError(f"query must be 5 to 128 chars, not blank: '{query[:128]}'")
+        return queries
+
+
+class BatchResult(BaseModel):
+    """One NDJSON line per query, id is missing until generated answers are stored"""
+
+    query: str
+    response: Optional[str] = None
+    id: Optional[int] = None
+    # cache, stored, generated, failed, backoff while the query keeps failing, or limited by the client's generation budget
+    source: str
+    # that answered, unknown for older records
+    model: Optional[str] = None
+    # of generated answers, complete or truncated, those are stored but not served again
+    outcome: Optional[str] = None
+
+
+class BatchStored(BaseModel):
+    """Last NDJSON line, ids of generated answers after the bulk insert"""
+
+    stored: dict[str, int]
@@ -0,0 +1,41 @@
+"""Answer cache as reported and controlled by the admin API"""
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class CacheKey(BaseModel):
+    key: str
+    hits: int
+
+
+class CacheStats(BaseModel):
+    """Of the worker process that answered, each one has a cache of its own"""
+
+    pid: int
+    # capacity, and entries held
+    size: int
+    entries: int
+    # of cached queries and responses, as stored
+    bytes: int
+    hits: int
+    misses: int
+    hit_ratio: Optional[float] = None
+    top: List[CacheKey]
+
+
+class CacheEvicted(BaseModel):
+    evicted: int
+
+
+class CacheResize(BaseModel):
+    size: int = Field(..., ge=1, le=1023)
+
+
+class CachePreload(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=1000)
+
+
+class CachePreloaded(BaseModel):
+    loaded: List[int]
+    missing: List[int]
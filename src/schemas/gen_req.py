@@ -1,5 +1,7 @@
 """Request format accepted by the API"""
 
+from typing import Optional
+
 from pydantic import BaseModel, field_validator, Field
 
 
@@ -7,6 +9,8 @@ class GenerationRequest(BaseModel):
     """Request format accepted by the API"""
 
     query: str = Field(..., min_length=5, max_length=128)
+    # record being followed up, none for a new conversation
+    parent_id: Optional[int] = Field(None, ge=1)
 
     @classmethod
     @field_validator("query")
@@ -16,3 +20,9 @@ class GenerationRequest(BaseModel):
         if value is None or not value or not value.strip():
             raise ValueError("query is empty")
         return value
+
+
+class ApiGenerationRequest(GenerationRequest):
+    """JSON API query, optionally streamed token by token as NDJSON"""
+
+    stream: bool = False
@@ -1,4 +1,7 @@
+"""Response format returned from the JSON API"""
 from datetime import datetime
+from typing import List, Optional
+
 from pydantic import BaseModel
 
 
@@ -8,3 +11,39 @@ class GenerationResponse(BaseModel):
     id: int
     response: str = None
     timestamp: datetime
+    query: Optional[str] = None
+    # record followed up, none for standalone queries
+    parent_id: Optional[int] = None
+    # cache, stored, similar or generated, none when fetched by id, archived when read from the archive
+    source: Optional[str] = None
+    # that answered, unknown for older records
+    model: Optional[str] = None
+    # chars of reasoning before the answer, fetched separately, none if the model did not think aloud
+    reasoning_len: Optional[int] = None
+    # complete or truncated, those are stored but not served again, unknown for older records
+    outcome: Optional[str] = None
+
+
+class GenerationReasoning(BaseModel):
+    """Reasoning of one record, only sent when asked for"""
+
+    id: int
+    reasoning: str
+
+
+class GenerationChunk(BaseModel):
+    """One NDJSON line per generated token, the full GenerationResponse is the last line, or a GenerationError"""
+
+    response: str
+
+
+class GenerationError(BaseModel):
+    """Last NDJSON line of a generation that failed once streaming, nothing was stored"""
+
+    error: str
+
+
+class GenerationLog(BaseModel):
+    """Page of history, texts are cut down to previews"""
+
+    logs: List[GenerationResponse]
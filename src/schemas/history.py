@@ -0,0 +1,30 @@
+"""Exported answer history, one NDJSON line per standalone record"""
+from datetime import datetime, timezone
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict, field_validator
+
+
+class HistoryRecord(BaseModel):
+    """Answer as moved between environments, ids are not kept"""
+
+    # packed model contexts are binary
+    model_config = ConfigDict(ser_json_bytes="base64", val_json_bytes="base64")
+
+    query: str
+    response: Optional[str] = None
+    created_at: datetime
+    # last access, none if never served again
+    updated_at: Optional[datetime] = None
+    model: Optional[str] = None
+    # reasoning block before the answer, for thinking models
+    reasoning: Optional[str] = None
+    # packed model context, only exported on request
+    context: Optional[bytes] = None
+
+    @field_validator("created_at", "updated_at")
+    def to_naive_utc(cls, value: Optional[datetime]) -> Optional[datetime]:
+        """Stored times are naive UTC, aware ones are converted, naive ones taken as UTC"""
+        if value is None or value.tzinfo is None:
+            return value
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
@@ -0,0 +1,30 @@
+"""Model residency and health, as reported by the JSON API"""
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class BreakerStatus(BaseModel):
+    """Circuit breaker guarding generations, open while ollama keeps failing"""
+
+    state: str
+    # over the recent calls
+    failure_rate: float
+    calls: int
+    # times it opened, and calls refused while open, since start
+    opened: int
+    rejected: int
+    # seconds until the next trial call, while open
+    retry_after: Optional[float] = None
+
+
+class ModelStatus(BaseModel):
+    """Generations that found the model loaded (warm) and ones that waited for it to load (cold)"""
+
+    model: str
+    keep_alive: str | int
+    cold_loads: int
+    warm_loads: int
+    # of the latest generation, seconds
+    last_load: Optional[float] = None
+    breaker: BreakerStatus
@@ -0,0 +1,31 @@
+"""Resource usage of a worker process, as reported by the admin API"""
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class AllocationSite(BaseModel):
+    # file:line, and bytes and blocks allocated there still alive
+    site: str
+    size: int
+    count: int
+
+
+class ProcessStats(BaseModel):
+    """Of the worker process that answered, unknown values are none"""
+
+    pid: int
+    # seconds since the process imported the app
+    uptime: float
+    # resident bytes and open file descriptors, from /proc
+    rss: Optional[int] = None
+    fds: Optional[int] = None
+    # db connections in use
+    pool_checked_out: Optional[int] = None
+    # asyncio tasks alive, generations running or kept for reconnects, and cached answers
+    tasks: int
+    generations: int
+    cache_entries: int
+    # bytes traced by tracemalloc, and the top sites holding them, only while tracing
+    traced: Optional[int] = None
+    top: List[AllocationSite] = []
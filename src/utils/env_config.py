@@ -2,9 +2,9 @@ import logging
 from pydantic import BaseModel, HttpUrl
 
 from src.utils.logmod import log_level_atoi
-from src.utils.lru_cache import LRUCache
 
-env_cache: LRUCache = LRUCache(8, 1/4)
+# built on first use, once per process
+_env: "EnvConfig | None" = None
 logger = logging.getLogger(__name__)
 
 class EnvConfig(BaseModel):
@@ -12,9 +12,87 @@ class EnvConfig(BaseModel):
     port: int  = 7654
     cache_size: int = 8
     log_level: int = logging.INFO
+    # rich console for development, json lines for production
+    log_format: str = "rich"
+    # chars kept of long logged strings, 0 keeps them whole
+    log_payload: int = 200
+    # fractions of records below WARNING kept per logger, like "uvicorn.access=0.1,src.api.answers=0.5"
+    log_sample: str = ""
     db_conn_str: str = ""
     model_name: str = ""
     model_url: HttpUrl = None
+    # ollama model embedding queries, the semantic cache needs one
+    embed_model: str = ""
+    # min cosine similarity to reuse an answer, 0 turns semantic cache off
+    semantic_threshold: float = 0
+    semantic_index: str = "./semantic_index"
+    # bytes of packed conversation contexts kept in memory
+    context_budget: int = 16 * 1024 * 1024
+    # generations run at once for a batch request
+    batch_parallelism: int = 2
+    # how long ollama keeps the model loaded after a request, duration like "30m", or seconds, -1 forever
+    keep_alive: str | int = "30m"
+    # seconds between heartbeats keeping the model loaded, 0 turns them off
+    heartbeat_interval: int = 0
+    # local hours heartbeats run in, like 8-18, empty for all day
+    warm_hours: str = ""
+    # smaller model short prompts go to under load, empty turns the cascade off
+    fallback_model: str = ""
+    # generations in flight on the main model that trigger the fallback
+    cascade_queue: int = 4
+    # tokens/sec of the main model below which the fallback is used, 0 ignores speed
+    cascade_min_tps: float = 0
+    # longer prompts always go to the main model
+    cascade_prompt_len: int = 64
+    # seconds a generation may take to connect, to the first token, between tokens and overall
+    connect_timeout: float = 5
+    first_token_timeout: float = 60
+    inter_token_timeout: float = 30
+    total_timeout: float = 600
+    # attempts after the first one, only before anything was streamed
+    retries: int = 2
+    # failure rate over the last breaker_window generations that stops calling ollama for breaker_cooldown seconds
+    breaker_threshold: float = 0.5
+    breaker_window: int = 20
+    breaker_cooldown: float = 30
+    # streamed chunks kept per generation for reconnecting clients
+    stream_ring: int = 256
+    # seconds a generation runs on without listeners, and stays reachable once done
+    stream_grace: float = 30
+    # per client query requests, and generations among them, per minute and in a burst, 0 turns limits off
+    rate_hit_per_min: float = 0
+    rate_hit_burst: int = 30
+    rate_miss_per_min: float = 6
+    rate_miss_burst: int = 3
+    # clients tracked at most, least recently seen are forgotten
+    rate_clients: int = 10000
+    # header identifying clients, like x-api-key, peer address when empty
+    rate_key_header: str = ""
+    # chars from which stored responses are zlib compressed, 0 keeps all of them plain
+    compress_min_len: int = 256
+    # days without access after which records move to the archive db, 0 keeps everything
+    retention_days: float = 0
+    # seconds between retention runs, and records moved per transaction
+    retention_interval: int = 3600
+    retention_batch: int = 500
+    archive_db: str = "./archive.db"
+    # restart on code changes, for development only
+    reload: bool = False
+    # processes launcher.py forks, and seconds running generations get to finish on SIGTERM
+    workers: int = 2
+    drain_timeout: float = 30
+    # bearer token of the admin API, empty turns it off
+    admin_token: str = ""
+    # bytes from which dynamic responses are gzipped, 0 turns compression off
+    gzip_min_size: int = 1024
+    # seconds a query failing repeatedly is refused for, doubling up to the max, 0 turns the negative cache off
+    failure_backoff: float = 10
+    failure_backoff_max: float = 600
+    # stack frames tracemalloc keeps per allocation, for leak hunting with bench/soak.py, 0 turns tracing off
+    tracemalloc: int = 0
+    # answers generated ahead of demand a day, once no user generation ran for pregen_idle seconds, 0 turns it off
+    pregen_daily: int = 0
+    pregen_idle: float = 300
 
 
     def assign_env_value(self, kv_line: str) -> None:
@@ -26,7 +104,6 @@ class EnvConfig(BaseModel):
         if config_line.startswith("#"):
             return
 
-        print(f"reading conf\t\t{config_line}")
         [key, val] = kv_line.split("=", 1)
         conf_key = key.lower()
         conf_val = val.strip().strip("\"").strip()
@@ -46,6 +123,14 @@ class EnvConfig(BaseModel):
                 assert self.cache_size <= 1024
             case "log_level":
                 self.log_level = log_level_atoi(conf_val)
+            case "log_format":
+                self.log_format = conf_val
+                assert self.log_format in ("rich", "json")
+            case "log_payload":
+                self.log_payload = int(conf_val)
+                assert self.log_payload >= 0
+            case "log_sample":
+                self.log_sample = conf_val
             case "db_str":
                 self.db_conn_str = conf_val
                 assert self.db_conn_str is not None
@@ -58,14 +143,137 @@ class EnvConfig(BaseModel):
                 self.model_name = conf_val
                 assert self.db_conn_str is not None
                 assert self.db_conn_str != ""
+            case "embed_model":
+                self.embed_model = conf_val
+            case "semantic_threshold":
+                self.semantic_threshold = float(conf_val)
+                assert 0 <= self.semantic_threshold <= 1
+            case "semantic_index":
+                self.semantic_index = conf_val
+                assert self.semantic_index != ""
+            case "context_budget":
+                self.context_budget = int(conf_val)
+                assert self.context_budget > 0
+            case "batch_parallelism":
+                self.batch_parallelism = int(conf_val)
+                assert self.batch_parallelism > 0
+            case "keep_alive":
+                self.keep_alive = int(conf_val) if conf_val.lstrip("-").isdigit() else conf_val
+                assert conf_val != ""
+            case "heartbeat_interval":
+                self.heartbeat_interval = int(conf_val)
+                assert self.heartbeat_interval >= 0
+            case "warm_hours":
+                self.warm_hours = conf_val
+            case "fallback_model":
+                self.fallback_model = conf_val
+            case "cascade_queue":
+                self.cascade_queue = int(conf_val)
+                assert self.cascade_queue > 0
+            case "cascade_min_tps":
+                self.cascade_min_tps = float(conf_val)
+                assert self.cascade_min_tps >= 0
+            case "cascade_prompt_len":
+                self.cascade_prompt_len = int(conf_val)
+                assert self.cascade_prompt_len > 0
+            case "connect_timeout":
+                self.connect_timeout = float(conf_val)
+                assert self.connect_timeout > 0
+            case "first_token_timeout":
+                self.first_token_timeout = float(conf_val)
+                assert self.first_token_timeout > 0
+            case "inter_token_timeout":
+                self.inter_token_timeout = float(conf_val)
+                assert self.inter_token_timeout > 0
+            case "total_timeout":
+                self.total_timeout = float(conf_val)
+                assert self.total_timeout > 0
+            case "retries":
+                self.retries = int(conf_val)
+                assert self.retries >= 0
+            case "breaker_threshold":
+                self.breaker_threshold = float(conf_val)
+                assert 0 < self.breaker_threshold <= 1
+            case "breaker_window":
+                self.breaker_window = int(conf_val)
+                assert self.breaker_window > 0
+            case "breaker_cooldown":
+                self.breaker_cooldown = float(conf_val)
+                assert self.breaker_cooldown > 0
+            case "stream_ring":
+                self.stream_ring = int(conf_val)
+                assert self.stream_ring > 0
+            case "stream_grace":
+                self.stream_grace = float(conf_val)
+                assert self.stream_grace > 0
+            case "rate_hit_per_min":
+                self.rate_hit_per_min = float(conf_val)
+                assert self.rate_hit_per_min >= 0
+            case "rate_hit_burst":
+                self.rate_hit_burst = int(conf_val)
+                assert self.rate_hit_burst > 0
+            case "rate_miss_per_min":
+                self.rate_miss_per_min = float(conf_val)
+                assert self.rate_miss_per_min > 0
+            case "rate_miss_burst":
+                self.rate_miss_burst = int(conf_val)
+                assert self.rate_miss_burst > 0
+            case "rate_clients":
+                self.rate_clients = int(conf_val)
+                assert self.rate_clients > 0
+            case "rate_key_header":
+                self.rate_key_header = conf_val
+            case "compress_min_len":
+                self.compress_min_len = int(conf_val)
+                assert self.compress_min_len >= 0
+            case "retention_days":
+                self.retention_days = float(conf_val)
+                assert self.retention_days >= 0
+            case "retention_interval":
+                self.retention_interval = int(conf_val)
+                assert self.retention_interval > 0
+            case "retention_batch":
+                self.retention_batch = int(conf_val)
+                assert self.retention_batch > 0
+            case "archive_db":
+                self.archive_db = conf_val
+            case "gzip_min_size":
+                self.gzip_min_size = int(conf_val)
+                assert self.gzip_min_size >= 0
+            case "reload":
+                self.reload = conf_val.lower() in ("1", "true", "yes")
+            case "workers":
+                self.workers = int(conf_val)
+                assert self.workers > 0
+            case "drain_timeout":
+                self.drain_timeout = float(conf_val)
+                assert self.drain_timeout >= 0
+            case "admin_token":
+                self.admin_token = conf_val
+            case "failure_backoff":
+                self.failure_backoff = float(conf_val)
+                assert self.failure_backoff >= 0
+            case "failure_backoff_max":
+                self.failure_backoff_max = float(conf_val)
+                assert self.failure_backoff_max > 0
+            case "tracemalloc":
+                self.tracemalloc = int(conf_val)
+                assert self.tracemalloc >= 0
+            case "pregen_daily":
+                self.pregen_daily = int(conf_val)
+                assert self.pregen_daily >= 0
+            case "pregen_idle":
+                self.pregen_idle = float(conf_val)
+                assert self.pregen_idle > 0
             case _:
-                print(f"Unsupported env config key, {key}={val}")
+                logger.warning("Unsupported env config key, %s=%s", key, val)
 
 def read_env() -> EnvConfig | None:
-    conf: EnvConfig | None = env_cache.get("envConfig")
-    if conf is not None and conf.cache_size > 0:
-        logger.info(f"env conf from cache:\t{conf}")
-        return conf
+    """Config from .env, read on the first call, every later one returns the same object"""
+
+    global _env
+    if _env is not None:
+        return _env
 
     conf = EnvConfig()
     file = open(".env", "r")
@@ -83,8 +291,10 @@ def read_env() -> EnvConfig | None:
     assert conf.host.strip() != ""
     assert conf.port > 0
     assert conf.log_level >= 0
-    env_cache.put("envConfig", conf)
+    # hashed words are no measure of meaning, answers to unrelated queries would be reused
+    assert conf.semantic_threshold == 0 or conf.embed_model != "", "SEMANTIC_THRESHOLD needs an EMBED_MODEL"
+    _env = conf
 
-    logger.info(f"env conf loaded:\t{conf}")
+    logger.info("env conf loaded:\t%s", conf)
 
     return conf
\ No newline at end of file
@@ -1,18 +1,165 @@
+import atexit
+import datetime
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from typing import Dict, Optional, TextIO
 
-from rich.logging import RichHandler
+# attributes every record has, anything else came from extra=
+RECORD_ATTRS = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "taskName"}
 
-def init(level: int) -> None:
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One json object per line, extra= fields included"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.UTC).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class PayloadCap(logging.Filter):
+    """Cuts long string arguments, like whole prompts and responses, before they are formatted"""
+
+    def __init__(self, limit: int) -> None:
+        super().__init__()
+        self.limit = limit
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if isinstance(record.args, tuple):
+            record.args = tuple(self.cap(arg) for arg in record.args)
+        if isinstance(record.msg, str):
+            record.msg = self.cap(record.msg)
+        return True
+
+    def cap(self, value):
+        if isinstance(value, str) and len(value) > self.limit:
+            return f"{value[:self.limit]}…(+{len(value) - self.limit})"
+        return value
+
+
+class Sampler(logging.Filter):
+    """Keeps a fraction of records below WARNING, per logger name prefix"""
+
+    def __init__(self, rates: Dict[str, float]) -> None:
+        super().__init__()
+        # longest prefix first, the most specific one decides
+        self.rates = sorted(rates.items(), key=lambda item: -len(item[0]))
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        for prefix, rate in self.rates:
+            if record.name == prefix or record.name.startswith(prefix + "."):
+                return random.random() < rate
+        return True
+
+
+def parse_sample(sample: str) -> Dict[str, float]:
+    """Parses "logger=rate,other.logger=rate", rates within 0-1"""
+
+    rates: Dict[str, float] = {}
+    for pair in sample.split(","):
+        if pair.strip() == "":
+            continue
+        name, rate = pair.split("=", 1)
+        rates[name.strip()] = float(rate)
+        if not 0 <= rates[name.strip()] <= 1:
+            raise ValueError(f"sample rate must be within 0-1, not {pair}")
+    return rates
+
+
+def output_handler(log_format: str, stream: Optional[TextIO] = None) -> logging.Handler:
+    """Handler doing the formatting and writing, on the listener thread, to stderr by default"""
+
+    match log_format:
+        case "rich":
+            # rich takes a while to import, json output in production goes without it
+            from rich.console import Console
+            from rich.logging import RichHandler
+            console = None if stream is None else Console(file=stream)
+            handler = RichHandler(console=console, show_time=False, show_level=False, show_path=False)
+            handler.setFormatter(logging.Formatter(
+                "%(levelname)s: %(asctime)s @%(name)s: %(message)s",
+                datefmt="[%Y-%m-%dT%H:%M:%S]",
+            ))
+            return handler
+        case "json":
+            handler = logging.StreamHandler(stream or sys.stderr)
+            handler.setFormatter(JsonFormatter())
+            return handler
+        case _:
+            raise ValueError(f"Unknown log format [{log_format}]")
+
+
+def _forget_listener() -> None:
+    """Threads do not survive fork, a forked worker starts its own listener on init"""
+
+    global _listener
+    _listener = None
+
+
+os.register_at_fork(after_in_child=_forget_listener)
+
+
+def init(level: int, log_format: str = "rich", max_payload: int = 0, sample: str = "") -> None:
+    """
+    Logs through a queue, callers only enqueue records,
+    formatting and output run on a listener thread.
+    Rich console output for development, json lines for production.
+
+    :param level: of the root logger
+    :param log_format: rich or json
+    :param max_payload: chars kept of long string arguments, 0 keeps them whole
+    :param sample: fractions of records below WARNING kept per logger, like "uvicorn.access=0.1"
+    """
+
+    global _listener
     assert level is not logging.NOTSET
-    logging.basicConfig(
-        level=level,
-        format="%(levelname)s: %(asctime)s @%(name)s: %(message)s",
-        datefmt="[%Y-%m-%dT%H:%M:%S]",
-        handlers=[
-            RichHandler(show_time=False, show_level=False, show_path=False)
-            # logging.FileHandler(f"general.log"),
-            # logging.StreamHandler(sys.stdout),
-        ])
+    root = logging.getLogger()
+    root.setLevel(level)
+    if _listener is not None:
+        return
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = logging.handlers.QueueHandler(records)
+    # sampled out records are not worth capping
+    rates = parse_sample(sample)
+    if len(rates) > 0:
+        handler.addFilter(Sampler(rates))
+    if max_payload > 0:
+        handler.addFilter(PayloadCap(max_payload))
+    for previous in root.handlers[:]:
+        root.removeHandler(previous)
+    root.addHandler(handler)
+
+    _listener = logging.handlers.QueueListener(records, output_handler(log_format), respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop)
+
+
+def stop() -> None:
+    """Writes out queued records and ends the listener, for processes leaving without atexit"""
+
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
 
 def log_level_atoi(log_level: str) -> int:
     match log_level.lower():
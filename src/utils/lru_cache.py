@@ -1,5 +1,6 @@
+import heapq
 import logging
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from pydantic import BaseModel, Field
 
 from src.utils.doubly_list import DLL, T, Node
@@ -10,6 +11,8 @@ class LRUItem(BaseModel):
     key: str
     value: T
     node: Node
+    # gets that found it
+    hits: int = 0
 
     class Config:
         json_encoders = {}
@@ -23,6 +26,9 @@ class LRUCache(BaseModel):
     stack: DLL = None
     size: int
     purge_ratio: float
+    # gets since creation
+    hits: int = 0
+    misses: int = 0
 
     # size 0 for unlimited
     # must be 0 < purge_ratio <= 1
@@ -69,27 +75,62 @@ class LRUCache(BaseModel):
         return init_len, final_len
 
     def get(self, key: str) -> Optional[T]:
-        if self.len < 1:
-            return None
-        if key not in self.dic:
-            return None
-        item = self.dic[key]
+        item = self.dic.get(key)
         if item is None:
+            self.misses += 1
             return None
+        self.hits += 1
+        item.hits += 1
         self.stack.remove(item.node)
-        item.node = self.stack.push_head(item.value)
+        item.node = self.stack.push_head(key)
         return item.value
 
+    def remove(self, key: str) -> bool:
+        """drops key, False if it was not cached"""
+        item = self.dic.pop(key, None)
+        if item is None:
+            return False
+        self.stack.remove(item.node)
+        return True
+
+    def remove_prefix(self, prefix: str) -> int:
+        """drops keys starting with prefix, returns how many"""
+        keys = [key for key in self.dic if key.startswith(prefix)]
+        for key in keys:
+            self.remove(key)
+        return len(keys)
+
+    def resize(self, size: int) -> int:
+        """changes capacity, dropping least recently used items over it, returns how many"""
+        assert 0 < size < 1024
+        self.size = size
+        self.stack.size = size
+        dropped = 0
+        while self.stack.len > size:
+            self.__pop__()
+            dropped += 1
+        return dropped
+
+    def top(self, count: int) -> List[Tuple[str, int]]:
+        """keys with the most hits, and their hits"""
+        return [(item.key, item.hits) for item in heapq.nlargest(count, self.dic.values(), key=lambda item: item.hits)]
+
+    def nbytes(self, sizer: Callable[[T], int]) -> int:
+        """size of cached values as measured by sizer, keys included"""
+        return sum(len(key.encode("utf-8")) + sizer(item.value) for key, item in self.dic.items())
+
     def put(self, key: str, value: T) -> None:
         """pushing one too many elements triggers purge"""
+        if key in self.dic:
+            item: LRUItem = self.dic[key]
+            self.stack.remove(item.node)
+            item.node = self.stack.push_head(key)
+            item.value = value
+            return
+
         if not self.__has_vacancy__():
             change = self.__purge__()
             logger.info(f"purged from {change[0]} to {change[1]}")
 
-        if key in self.dic:
-            item: LRUItem = self.dic[key]
-            self.stack.remove(item.node)
-            item.node = self.stack.push_head(value)
-        else:
-            head = self.stack.push_head(key)
-            self.dic[key] = LRUItem(key=key, value=value, node=head)
\ No newline at end of file
+        head = self.stack.push_head(key)
+        self.dic[key] = LRUItem(key=key, value=value, node=head)
\ No newline at end of file
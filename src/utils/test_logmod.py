@@ -0,0 +1,39 @@
+import json
+import logging
+from unittest import main, TestCase
+
+from src.utils.logmod import JsonFormatter, PayloadCap, Sampler, parse_sample
+
+
+def record(name: str, level: int, msg: str, *args) -> logging.LogRecord:
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+class TestLogmod(TestCase):
+
+    def test_payload_cap(self):
+        entry = record("src.api.answers", logging.INFO, "Serving %s: %s", "short", "x" * 500)
+        self.assertTrue(PayloadCap(100).filter(entry))
+        self.assertEqual("short", entry.args[0])
+        self.assertEqual("x" * 100 + "…(+400)", entry.args[1])
+
+    def test_sampler_keeps_warnings(self):
+        sampler = Sampler(parse_sample("uvicorn.access=0, src.api=1"))
+        self.assertFalse(sampler.filter(record("uvicorn.access", logging.INFO, "GET /")))
+        self.assertTrue(sampler.filter(record("uvicorn.access", logging.WARNING, "slow")))
+        self.assertTrue(sampler.filter(record("src.api.answers", logging.INFO, "hit")))
+        self.assertTrue(sampler.filter(record("uvicorn.error", logging.INFO, "started")))
+        with self.assertRaises(ValueError):
+            parse_sample("uvicorn.access=2")
+
+    def test_json_formatter(self):
+        entry = record("src.api.answers", logging.INFO, "Serving %d", 42)
+        entry.record_id = 42
+        line = json.loads(JsonFormatter().format(entry))
+        self.assertEqual("Serving 42", line["message"])
+        self.assertEqual("INFO", line["level"])
+        self.assertEqual(42, line["record_id"])
+
+
+if __name__ == '__main__':
+    main()
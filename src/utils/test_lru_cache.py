@@ -1,5 +1,5 @@
 from unittest import TestCase
-from lru_cache import LRUCache
+from src.utils.lru_cache import LRUCache
 
 class TestObj:
     some: str
@@ -35,5 +35,74 @@ class TestLRUCache(TestCase):
         self.assertIsNone(removed)
         existing = cache.get(f"k555")
         self.assertIsNotNone(existing)
-        # get should have bumped the value
-        self.assertEqual(existing.some, cache.stack.head.value.some)
\ No newline at end of file
+        # get should have bumped the key
+        self.assertEqual("k555", cache.stack.head.value)
+
+    def test_get_then_purge(self):
+        cache = LRUCache(size=4, purge_ratio=0.5)
+        for i in range(4):
+            cache.put(f"k{i}", TestObj(f"v{i}"))
+        for i in range(4):
+            cache.get(f"k{i}")
+        cache.put("k9", TestObj("v9"))
+        self.assertEqual(3, cache.len)
+        self.assertIsNone(cache.get("k0"))
+        self.assertEqual("v3", cache.get("k3").some)
+
+    def test_put_overwrites_value(self):
+        cache = LRUCache(size=4)
+        cache.put("aaa", "valulu")
+        cache.put("aaa", "valula")
+        self.assertEqual("valula", cache.get("aaa"))
+    def test_remove(self):
+        cache = LRUCache(size=4)
+        cache.put("aaa", "valulu")
+        cache.put("bbb", "valula")
+        self.assertTrue(cache.remove("aaa"))
+        self.assertFalse(cache.remove("aaa"))
+        self.assertEqual(1, cache.len)
+        self.assertIsNone(cache.get("aaa"))
+        self.assertEqual("bbb", cache.stack.tail.value)
+
+    def test_remove_prefix(self):
+        cache = LRUCache(size=8)
+        for key in ["7:aaa", "7:bbb", "17:aaa", "aaa"]:
+            cache.put(key, TestObj(key))
+        self.assertEqual(2, cache.remove_prefix("7:"))
+        self.assertEqual(0, cache.remove_prefix("7:"))
+        self.assertEqual(["17:aaa", "aaa"], sorted(cache.dic))
+        self.assertEqual(2, cache.len)
+
+    def test_resize_then_put_purges_at_new_size(self):
+        cache = LRUCache(size=8, purge_ratio=0.5)
+        for i in range(8):
+            cache.put(f"k{i}", TestObj(f"v{i}"))
+        cache.get("k0")
+        self.assertEqual(4, cache.resize(4))
+        self.assertEqual(["k0", "k5", "k6", "k7"], sorted(cache.dic))
+        # full at the new size, purges half of it
+        cache.put("k9", TestObj("v9"))
+        self.assertEqual(3, cache.len)
+        self.assertEqual(["k0", "k7", "k9"], sorted(cache.dic))
+        self.assertEqual(0, cache.resize(16))
+        for i in range(10, 20):
+            cache.put(f"k{i}", TestObj(f"v{i}"))
+        self.assertEqual(13, cache.len)
+
+    def test_top_ranks_keys_by_hits(self):
+        cache = LRUCache(size=8)
+        for key in ["aaa", "bbb", "ccc"]:
+            cache.put(key, TestObj(key))
+        for key in ["bbb", "ccc", "bbb", "bbb", "ccc", "ddd"]:
+            cache.get(key)
+        self.assertEqual([("bbb", 3), ("ccc", 2)], cache.top(2))
+        self.assertEqual(("aaa", 0), cache.top(8)[-1])
+        self.assertEqual(5, cache.hits)
+        self.assertEqual(1, cache.misses)
+
+    def test_nbytes(self):
+        cache = LRUCache(size=4)
+        self.assertEqual(0, cache.nbytes(len))
+        cache.put("aaa", "valulu")
+        cache.put("ü", "va")
+        self.assertEqual(3 + 6 + 2 + 2, cache.nbytes(len))
@@ -0,0 +1,74 @@
+import tempfile
+from unittest import main, TestCase
+
+import numpy as np
+
+from src.utils.vector_index import VectorIndex
+
+
+class TestVectorIndex(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = f"{self.tmp.name}/index"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_empty_search(self):
+        index = VectorIndex(self.path)
+        self.assertEqual([[]], index.search([[1.0, 0.0]], k=3))
+
+    def test_top_k_best_first(self):
+        index = VectorIndex(self.path)
+        index.add(10, [1.0, 0.0])
+        index.add(11, [0.0, 1.0])
+        index.add(12, [1.0, 1.0])
+        [matches] = index.search([[2.0, 0.1]], k=2)
+        self.assertEqual([10, 12], [record_id for record_id, _ in matches])
+        self.assertAlmostEqual(0.9988, matches[0][1], places=4)
+
+    def test_batched_search(self):
+        index = VectorIndex(self.path)
+        index.add(10, [1.0, 0.0])
+        index.add(11, [0.0, 1.0])
+        results = index.search([[0.0, 3.0], [5.0, 0.0]], k=1)
+        self.assertEqual(11, results[0][0][0])
+        self.assertEqual(10, results[1][0][0])
+
+    def test_grows_and_reopens(self):
+        index = VectorIndex(self.path, capacity=2)
+        rng = np.random.default_rng(7)
+        vectors = rng.normal(size=(5, 8))
+        for record_id, vector in enumerate(vectors):
+            index.add(record_id, vector)
+        index.flush()
+        reopened = VectorIndex(self.path)
+        self.assertEqual(5, reopened.count)
+        [matches] = reopened.search([vectors[3]], k=1)
+        self.assertEqual(3, matches[0][0])
+
+    def test_refresh_sees_other_writers(self):
+        first = VectorIndex(self.path, capacity=2)
+        second = VectorIndex(self.path, capacity=2)
+        first.add(10, [1.0, 0.0])
+        with second.locked():
+            second.refresh()
+            second.add(11, [0.0, 1.0])
+            # grows, replacing the files first has open
+            second.add(12, [1.0, 1.0])
+        first.refresh()
+        self.assertEqual(3, first.count)
+        [matches] = first.search([[0.0, 2.0]], k=1)
+        self.assertEqual(11, matches[0][0])
+
+    def test_dim_mismatch(self):
+        index = VectorIndex(self.path)
+        index.add(1, [1.0, 0.0])
+        with self.assertRaises(ValueError):
+            index.add(2, [1.0, 0.0, 0.0])
+        with self.assertRaises(ValueError):
+            index.search([[1.0, 0.0, 0.0]])
+
+if __name__ == '__main__':
+    main()
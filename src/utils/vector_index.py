@@ -0,0 +1,154 @@
+"""Append-only matrix of unit vectors with cosine top-k search, kept in memory-mapped files"""
+import contextlib
+import fcntl
+import logging
+import os
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# rows scored at once, bounds temporary memory regardless of index size
+SEARCH_CHUNK: int = 65536
+
+
+class VectorIndex:
+    """
+    Vectors are stored normalized in `{path}.vec.npy`, with owning ids in `{path}.ids.npy`.
+    Empty slots hold id -1, files double in capacity when full.
+    Processes sharing the files append while locked, and refresh to see what the others appended.
+    """
+
+    def __init__(self, path: str, capacity: int = 1024) -> None:
+        assert capacity > 0
+        self.path = path
+        self.initial_capacity = capacity
+        self.vectors: Optional[np.memmap] = None
+        self.ids: Optional[np.memmap] = None
+        self.count: int = 0
+        # of the ids file, growing replaces it
+        self.inode: Optional[int] = None
+        if os.path.exists(self.__ids_path__()) and os.path.exists(self.__vec_path__()):
+            self.__open__()
+
+    def __vec_path__(self) -> str:
+        return f"{self.path}.vec.npy"
+
+    def __ids_path__(self) -> str:
+        return f"{self.path}.ids.npy"
+
+    def __open__(self) -> None:
+        self.vectors = np.load(self.__vec_path__(), mmap_mode="r+")
+        self.ids = np.load(self.__ids_path__(), mmap_mode="r+")
+        self.inode = os.stat(self.__ids_path__()).st_ino
+        assert self.vectors.shape[0] == self.ids.shape[0]
+        # slots are filled in order, the first empty one ends the index
+        self.count = int(np.count_nonzero(self.ids >= 0))
+        logger.info("opened vector index %s with %d of %d", self.path, self.count, self.ids.shape[0])
+
+    def __allocate__(self, capacity: int, dim: int) -> None:
+        """creates files of given capacity, copying over existing vectors"""
+        vec_tmp = f"{self.path}.vec.tmp.npy"
+        ids_tmp = f"{self.path}.ids.tmp.npy"
+        vectors = np.lib.format.open_memmap(vec_tmp, mode="w+", dtype=np.float32, shape=(capacity, dim))
+        ids = np.lib.format.open_memmap(ids_tmp, mode="w+", dtype=np.int64, shape=(capacity,))
+        ids[:] = -1
+        if self.count > 0:
+            vectors[:self.count] = self.vectors[:self.count]
+            ids[:self.count] = self.ids[:self.count]
+        vectors.flush()
+        ids.flush()
+        del vectors, ids
+        self.vectors = None
+        self.ids = None
+        os.replace(vec_tmp, self.__vec_path__())
+        os.replace(ids_tmp, self.__ids_path__())
+        self.__open__()
+
+    @contextlib.contextmanager
+    def locked(self) -> Iterator[None]:
+        """Exclusive among processes using the index, held while appending and refreshing"""
+        with open(f"{self.path}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def refresh(self) -> None:
+        """picks up vectors appended by other processes, reopening files they replaced"""
+        if not os.path.exists(self.__ids_path__()):
+            return
+        if self.ids is None or os.stat(self.__ids_path__()).st_ino != self.inode:
+            self.__open__()
+            return
+        # shared mappings show the other writes, slots are filled in order
+        while self.count < self.ids.shape[0] and self.ids[self.count] >= 0:
+            self.count += 1
+
+    @property
+    def dim(self) -> Optional[int]:
+        return None if self.vectors is None else self.vectors.shape[1]
+
+    def add(self, record_id: int, vector: List[float] | np.ndarray) -> None:
+        """appends normalized vector, the first one fixes the dimension"""
+        assert record_id >= 0
+        row = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(row))
+        if norm == 0:
+            logger.warning("not indexing zero vector of record %d", record_id)
+            return
+        if self.vectors is None:
+            self.__allocate__(self.initial_capacity, row.shape[0])
+        if row.shape[0] != self.dim:
+            raise ValueError(f"vector of dim {row.shape[0]} does not fit index of dim {self.dim}")
+        if self.count == self.ids.shape[0]:
+            self.__allocate__(self.ids.shape[0] * 2, self.dim)
+        self.vectors[self.count] = row / norm
+        self.ids[self.count] = record_id
+        self.count += 1
+
+    def flush(self) -> None:
+        if self.vectors is not None:
+            self.vectors.flush()
+            self.ids.flush()
+
+    def search(self, queries: List[List[float]] | np.ndarray, k: int = 1) -> List[List[Tuple[int, float]]]:
+        """
+        Batched cosine similarity top-k.
+        Returns for each query up to k pairs of (record id, similarity), best first.
+        """
+        batch = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        results: List[List[Tuple[int, float]]] = [[] for _ in range(batch.shape[0])]
+        if self.count == 0 or k < 1:
+            return results
+        if batch.shape[1] != self.dim:
+            raise ValueError(f"query of dim {batch.shape[1]} does not fit index of dim {self.dim}")
+        norms = np.linalg.norm(batch, axis=1, keepdims=True)
+        batch = batch / np.where(norms == 0, 1, norms)
+
+        # running top-k over chunks, as (query, k) arrays of scores and row positions
+        best_scores = np.full((batch.shape[0], 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((batch.shape[0], 0), dtype=np.int64)
+        for start in range(0, self.count, SEARCH_CHUNK):
+            end = min(start + SEARCH_CHUNK, self.count)
+            scores = batch @ self.vectors[start:end].T
+            take = min(k, end - start)
+            top = np.argpartition(-scores, take - 1, axis=1)[:, :take]
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+            best_rows = np.concatenate([best_rows, top + start], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        for q in range(batch.shape[0]):
+            results[q] = [
+                (int(self.ids[row]), float(score))
+                for row, score in zip(best_rows[q], best_scores[q])
+            ]
+        return results